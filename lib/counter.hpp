@@ -6,26 +6,107 @@
 #include <chrono>
 #include <memory>
 #include <set>
+#include <stdexcept>
+#include <type_traits>
+
+#include <stdint.h>
+#include <string.h>
 
 #include "interference_mpi.h"
 
 typedef std::map<std::string, std::vector<std::string>> CounterMap;
 
+/**
+ * A value a counter stores in the per-rank record. Records of all
+ * ranks are gathered at once, so every field has a fixed size.
+ */
+struct Field {
+  enum Kind {
+    INT,     // int64_t
+    DOUBLE,  // double
+    STRING,  // zero padded characters
+    BLOB,    // formatted by the counter itself
+  };
+
+  std::string name;
+  Kind kind;
+  size_t size;
+  // Description of a blob for readers of the record, json
+  std::string meta;
+};
+
+typedef std::vector<Field> Fields;
+
+template<typename T>
+void store(char *record, T value)
+{
+  memcpy(record, &value, sizeof(value));
+}
+
+template<typename T>
+T load(const char *record)
+{
+  T value;
+  memcpy(&value, record, sizeof(value));
+  return value;
+}
+
+inline std::string format_field(const Field &field, const char *data)
+{
+  switch (field.kind) {
+  case Field::INT:
+    return std::to_string(load<int64_t>(data));
+  case Field::DOUBLE:
+    return std::to_string(load<double>(data));
+  case Field::STRING:
+    return std::string(data, strnlen(data, field.size));
+  default:
+    throw std::runtime_error("Can not format field " + field.name);
+  }
+}
+
 class Counter {
 protected:
   const std::string _name;
-  virtual void exchange() = 0;
 
 public:
 
   Counter(const std::string &name) : _name(name) {}
+  virtual ~Counter() {}
 
   const std::string name() { return _name; }
 
   virtual void start_accounting() = 0;
   virtual void end_accounting() = 0;
 
-  virtual CounterMap emit() = 0;
+  // Layout of the values of the counter in a record
+  virtual Fields fields() = 0;
+  // Store own values into the record
+  virtual void pack(char *record) = 0;
+
+  // Counters, which accumulate values while running, can be read in
+  // the middle of the run and are accounted per region
+  virtual bool cumulative() { return false; }
+  // Store the values accumulated so far, the counter keeps running.
+  // Called whenever a region is marked, so it should not allocate.
+  virtual void pack_current(char *record) {}
+
+  /**
+   * Convert the values of all ranks to strings.
+   * @param records values of the counter in the record of rank 0
+   * @param stride distance between records of two ranks
+   */
+  virtual CounterMap emit(const char *records, int ranks, size_t stride) {
+    CounterMap map;
+    size_t offset = 0;
+    for (const auto &f : fields()) {
+      auto &values = map[f.name];
+      for (int rank = 0; rank < ranks; rank++)
+        values.push_back(format_field(f, records + rank * stride + offset));
+      offset += f.size;
+    }
+    return map;
+  }
 };
 
 typedef std::chrono::time_point<std::chrono::system_clock> wall_time_t;
@@ -37,7 +118,6 @@ protected:
   T start, end;
 
   int _ranks;
-  std::vector<long> _values;
 
 public:
   IntervalCounter(int ranks, const std::string &name) :
@@ -51,21 +131,29 @@ public:
   }
   void end_accounting() {
     get_value(end);
-    exchange();
   }
 
-  CounterMap emit() {
-    CounterMap map;
-    std::vector<std::string> str_values;
-    for (auto v : _values) {
-      str_values.push_back(std::to_string(v));
-    }
-    map[_name] = str_values;
-    return map;
+  Fields fields() {
+    return {{_name, Field::INT, sizeof(int64_t)}};
+  }
+
+  void pack(char *record) {
+    store<int64_t>(record, value());
+  }
+
+  bool cumulative() { return true; }
+
+  void pack_current(char *record) {
+    T last = end;
+    get_value(end);
+    pack(record);
+    end = last;
   }
 
 protected:
   virtual void get_value(T &) = 0;
+  // Difference between the end and the start
+  virtual int64_t value() = 0;
 };
 
 
@@ -75,7 +163,6 @@ protected:
   T _value;
 
   int _ranks;
-  std::vector<T> _values;
 
 public:
   SingleCounter(int ranks, const std::string &name) :
@@ -84,25 +171,20 @@ public:
   {
   }
 
-  CounterMap emit() {
-    CounterMap map;
-    std::vector<std::string> str_values;
-    for (auto v : _values) {
-      str_values.push_back(std::to_string(v));
-    }
-    map[_name] = str_values;
-    return map;
-  }
-
   void start_accounting() {}
-  void end_accounting() {
-    exchange();
+  void end_accounting() {}
+
+  Fields fields() {
+    if (std::is_floating_point<T>::value)
+      return {{_name, Field::DOUBLE, sizeof(double)}};
+    return {{_name, Field::INT, sizeof(int64_t)}};
   }
 
-protected:
-  void exchange() {
-    _values.resize(_ranks);
-    gather(&_value, sizeof(long), _values.data());
+  void pack(char *record) {
+    if (std::is_floating_point<T>::value)
+      store<double>(record, _value);
+    else
+      store<int64_t>(record, _value);
   }
 };
 
@@ -110,8 +192,41 @@ class Accounter {
 protected:
   std::vector<std::unique_ptr<Counter>> _counters;
   int _ranks;
+
+  // Offset of every counter in a record
+  std::vector<size_t> _offsets;
+  size_t _record_size;
+  std::vector<char> _record;
+  std::vector<char> _records;
+
+  void layout() {
+    _offsets.clear();
+    _record_size = 0;
+    for (const auto &c : _counters) {
+      _offsets.push_back(_record_size);
+      for (const auto &f : c->fields())
+        _record_size += f.size;
+    }
+  }
+
+  // Pack own record
+  void pack() {
+    layout();
+    _record.assign(_record_size, 0);
+    for (size_t i = 0; i < _counters.size(); i++)
+      _counters[i]->pack(_record.data() + _offsets[i]);
+  }
+
+  // Collect records of all ranks on rank 0 with a single gather
+  void exchange() {
+    if (get_my_rank() == 0)
+      _records.resize(_record_size * _ranks);
+    gather(_record.data(), _record_size, _records.data());
+  }
+
 public:
   Accounter(int ranks) : _ranks(ranks) {};
+  virtual ~Accounter() {}
 
   void start_accounting() {
     for (const auto &c : _counters)
@@ -121,17 +236,20 @@ public:
   void end_accounting() {
     for (const auto &c : _counters)
       c->end_accounting();
+    pack();
   }
 
   CounterMap generate_map(const std::set<std::string> &filter) {
     CounterMap results;
 
-    for (const auto &c : _counters) {
+    for (size_t i = 0; i < _counters.size(); i++) {
+      const auto &c = _counters[i];
       // If filter non-empty and key is in filter, skip it
       if (filter.size() > 0 && filter.find(c->name()) != filter.end())
         continue;
 
-      CounterMap counter_data = c->emit();
+      CounterMap counter_data = c->emit(_records.data() + _offsets[i],
+                                        _ranks, _record_size);
 
       results.insert(counter_data.begin(), counter_data.end());
     }
@@ -160,3 +278,19 @@ static int get_indirect_param(const std::string &reference)
 
   return res;
 }
+
+/**
+ * Find a field in the contents of a /proc stat file.
+ * @param stat contents of the file, terminated by '\0'
+ * @param field number of the field counting from 1, as in proc(5)
+ * @return start of the field or nullptr
+ */
+static inline const char *stat_field(const char *stat, int field)
+{
+  // The command name may contain anything, so skip to the last ')'.
+  // It is followed by the state, which is the third field.
+  const char *p = strrchr(stat, ')');
+  for (int f = 2; f < field && p; f++)
+    p = strchr(p + 1, ' ');
+  return p ? p + 1 : nullptr;
+}
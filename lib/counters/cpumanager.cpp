@@ -2,6 +2,7 @@
 #include <regex>
 #include <iostream>
 #include <cassert>
+#include <cstring>
 
 #include <sched.h>
 #include <unistd.h>
@@ -187,5 +188,4 @@ void CpuManager::end_accounting()
   if ((_sched == "fifo_blocked") || (_sched == "fifo_cyclic")) {
     scheduler_set(0, SCHED_FIFO, 1);
   }
-  exchange();
 }
@@ -1,4 +1,5 @@
 #include <cstdlib>
+#include <cstring>
 #include <iostream>
 #include <fstream>
 #include <vector>
@@ -7,13 +8,19 @@
 #include <sstream>
 #include <iterator>
 #include <chrono>
+#include <cmath>
+#include <algorithm>
 
+#include <fcntl.h>
 #include <unistd.h>
 
 #include "interference.h"
 #include "interference_mpi.h"
 #include "counter.hpp"
 #include "perf.hpp"
+#include "sampler.hpp"
+#include "mpistats.h"
+#include "regions.hpp"
 
 #include "counters/cpumanager.hpp"
 
@@ -29,36 +36,24 @@ public:
     val = std::chrono::system_clock::now();
   }
 
-  void exchange() {
+  int64_t value() {
     auto diff = end - start;
-    long diff_long = std::chrono::duration_cast<std::chrono::milliseconds>(diff).count();
-
-    _values.resize(_ranks);
-    gather(&diff_long, sizeof(diff_long), _values.data());
+    return std::chrono::duration_cast<std::chrono::milliseconds>(diff).count();
   }
 };
 
+/**
+ * CPU time of the process from /proc/self/stat. The file stays open
+ * and is read into a preallocated buffer, so that reading a value in a
+ * region does not allocate.
+ */
 class ProcReader : public IntervalCounter<milli_time_t> {
-  std::vector<std::string> get_stat_strings()
-  {
-    std::ifstream proc("/proc/self/stat");
-
-    std::string line;
-    std::getline(proc, line);
-    std::istringstream iss(line);
-
-    std::vector<std::string> tokens;
-    std::copy(std::istream_iterator<std::string>(iss),
-              std::istream_iterator<std::string>(),
-              std::back_inserter(tokens));
-
-    return tokens;
-  }
-
   int _column;
+  int _fd;
+  char _stat[1024];
+  long _ticks;
 public:
-  using IntervalCounter<milli_time_t>::IntervalCounter;
-
+  // Fields of /proc/self/stat counting from 0
   enum StatColumn
   {
     utime = 13,
@@ -67,21 +62,35 @@ public:
 
   ProcReader(StatColumn column, int ranks, const std::string &name) :
     IntervalCounter(ranks, name),
-    _column(column)
-  {}
+    _column(column),
+    _ticks(sysconf(_SC_CLK_TCK))
+  {
+    _fd = open("/proc/self/stat", O_RDONLY);
+    if (_fd == -1)
+      throw std::runtime_error(std::string("Failed to open /proc/self/stat: ")
+                               + strerror(errno));
+  }
+
+  ~ProcReader() {
+    close(_fd);
+  }
 
   void get_value(milli_time_t &val) {
-    std::vector<std::string> tokens = get_stat_strings();
+    const char *p = nullptr;
+    auto len = pread(_fd, _stat, sizeof(_stat) - 1, 0);
+    if (len > 0) {
+      _stat[len] = '\0';
+      p = stat_field(_stat, _column + 1);
+    }
+    if (!p)
+      throw std::runtime_error("Failed to read /proc/self/stat");
 
-    val = milli_time_t((std::stol(tokens[_column]) * 1000
-                        / sysconf(_SC_CLK_TCK)));
+    val = milli_time_t(strtol(p, nullptr, 10) * 1000 / _ticks);
   }
 
-  void exchange() {
+  int64_t value() {
     auto diff = end - start;
-    long diff_long = diff.count();
-    _values.resize(_ranks);
-    gather(&diff_long, sizeof(diff_long), _values.data());
+    return diff.count();
   }
 };
 
@@ -104,7 +113,6 @@ protected:
   std::vector<char> _value;
 
   int _ranks;
-  std::vector<char> _values;
   const unsigned name_len;
 public:
   HostNameAccounter(int ranks, std::string name, unsigned name_len = 20) :
@@ -114,51 +122,227 @@ public:
   {
   }
 
-  CounterMap emit() {
-    CounterMap map;
-    std::vector<std::string> str_values;
-
-    for (int i = 0; i < _ranks; i ++) {
-      auto name = std::string(_values.data() + i * name_len);
-      str_values.push_back(name);
-    }
-
-    map[_name] = str_values;
-    return map;
+  Fields fields() {
+    return {{_name, Field::STRING, name_len}};
   }
 
-  void end_accounting() {
-    exchange();
+  void pack(char *record) {
+    memcpy(record, _value.data(), name_len);
   }
 
+  void end_accounting() {}
+
   void start_accounting() {
     // Assume no overflow happens
     _value.resize(name_len);
     gethostname(_value.data(), name_len);
     _value[name_len - 1] = '\0';
   }
+};
 
-private:
-  void exchange() {
-    _values.resize(name_len * _ranks);
-    gather_names(_value.data(), _values.data(), name_len);
+/**
+ * Iterations of the application. If INTERFERENCE_ITER_CALL names an
+ * intercepted MPI function, every INTERFERENCE_ITER_EVERY-th call of
+ * it ends an iteration. The counter reports the number of iterations
+ * and the distribution of their wall time in microseconds. Times of
+ * the first INTERFERENCE_ITER_MAX iterations are kept. Without
+ * INTERFERENCE_ITER_CALL the whole run is a single iteration.
+ */
+class IterationCounter : public Counter {
+  int _op;
+  long _every;
+  std::vector<uint64_t> _times;
+  uint64_t _count;
+
+  static long get_param(const char *name, long def) {
+    auto ptr = std::getenv(name);
+    if (!ptr)
+      return def;
+    return std::stol(ptr);
   }
 
-};
+  // Time of the iteration at the quantile of the kept iterations
+  int64_t quantile(size_t kept, double q) {
+    size_t rank = std::ceil(q * kept);
+    return _times[rank ? rank - 1 : 0] / 1000;
+  }
 
-class IterAccounter : public SingleCounter<long> {
 public:
-  using SingleCounter<long>::SingleCounter;
+  IterationCounter(const std::string &name) :
+    Counter(name),
+    _op(-1),
+    _every(get_param("INTERFERENCE_ITER_EVERY", 1)),
+    _count(1)
+  {
+    auto call = std::getenv("INTERFERENCE_ITER_CALL");
+    if (!call)
+      return;
+
+    for (int op = 0; op < MPISTATS_NOPS; op++)
+      if (std::string(mpistats_names[op]) == call)
+        _op = op;
+    if (_op == -1)
+      throw std::runtime_error("INTERFERENCE_ITER_CALL is not intercepted: " +
+                               std::string(call));
+    if (_every <= 0)
+      throw std::runtime_error("INTERFERENCE_ITER_EVERY should be positive");
+    long max = get_param("INTERFERENCE_ITER_MAX", 100000);
+    if (max <= 0)
+      throw std::runtime_error("INTERFERENCE_ITER_MAX should be positive");
+    _times.resize(max);
+  }
 
   void start_accounting() {
-    _value = 1;
+    if (_op != -1)
+      mpistats_iter_start(_op, _every, _times.data(), _times.size());
+  }
+
+  void end_accounting() {
+    if (_op == -1)
+      return;
+    _count = mpistats_iter_stop();
+    size_t kept = std::min<uint64_t>(_count, _times.size());
+    std::sort(_times.begin(), _times.begin() + kept);
+  }
+
+  Fields fields() {
+    Fields fields = {{_name, Field::INT, sizeof(int64_t)}};
+    if (_op == -1)
+      return fields;
+    for (auto stat : {"_US_MIN", "_US_P50", "_US_P99", "_US_MAX"})
+      fields.push_back({_name + stat, Field::INT, sizeof(int64_t)});
+    fields.push_back({_name + "_US_MEAN", Field::DOUBLE, sizeof(double)});
+    return fields;
+  }
+
+  void pack(char *record) {
+    store<int64_t>(record, _count);
+    if (_op == -1)
+      return;
+
+    size_t kept = std::min<uint64_t>(_count, _times.size());
+    int64_t stats[4] = {0, 0, 0, 0};
+    double mean = 0;
+    if (kept > 0) {
+      stats[0] = _times[0] / 1000;
+      stats[1] = quantile(kept, 0.5);
+      stats[2] = quantile(kept, 0.99);
+      stats[3] = _times[kept - 1] / 1000;
+      for (size_t i = 0; i < kept; i++)
+        mean += _times[i];
+      mean /= kept * 1000.;
+    }
+    for (auto value : stats) {
+      record += sizeof(int64_t);
+      store<int64_t>(record, value);
+    }
+    store<double>(record + sizeof(int64_t), mean);
   }
 };
 
+/**
+ * Time, calls and bytes of MPI calls intercepted by the wrappers. The
+ * wrappers account only between start and end, so the communication
+ * of the library itself is not included. Besides, every intercepted
+ * call has a latency histogram, histograms of all ranks are summed up
+ * at the end.
+ */
+class MpiStats : public Counter {
+  struct mpistats _total;
+  struct mpistats _current;
+
+  const char *_categories[MPISTATS_CATEGORIES] = {"P2P", "COLL", "WAIT"};
+  void pack_stats(char *record, const struct mpistats &stats) {
+    for (int c = 0; c < MPISTATS_CATEGORIES; c++) {
+      store<int64_t>(record, stats.calls[c]);
+      store<int64_t>(record + sizeof(int64_t), stats.bytes[c]);
+      store<int64_t>(record + 2 * sizeof(int64_t), stats.ns[c] / 1000);
+      record += 3 * sizeof(int64_t);
+    }
+  }
+
+public:
+  using Counter::Counter;
+
+  void start_accounting() {
+    mpistats_start();
+  }
+
+  void end_accounting() {
+    mpistats_stop(&_total);
+  }
+
+  Fields fields() {
+    Fields fields;
+    for (auto category : _categories) {
+      auto prefix = _name + "_" + category;
+      fields.push_back({prefix + "_CALLS", Field::INT, sizeof(int64_t)});
+      fields.push_back({prefix + "_BYTES", Field::INT, sizeof(int64_t)});
+      fields.push_back({prefix + "_US", Field::INT, sizeof(int64_t)});
+    }
+    return fields;
+  }
+
+  void pack(char *record) {
+    pack_stats(record, _total);
+  }
+
+  bool cumulative() { return true; }
+
+  void pack_current(char *record) {
+    mpistats_read(&_current);
+    pack_stats(record, _current);
+  }
+
+  /**
+   * Percentiles of the latency of every called MPI function over all
+   * ranks. Collective, the result is valid only on rank 0.
+   */
+  json latency() {
+    static const std::pair<const char *, double> percentiles[] = {
+      {"P50", 0.5}, {"P99", 0.99}, {"P999", 0.999}};
+
+    std::vector<uint64_t> hist(MPISTATS_NOPS * MPISTATS_BUCKETS);
+    reduce_sum(&_total.hist[0][0], hist.size(), hist.data());
+
+    json j = json::object();
+    if (get_my_rank() != 0)
+      return j;
+
+    for (int op = 0; op < MPISTATS_NOPS; op++) {
+      const uint64_t *buckets = &hist[op * MPISTATS_BUCKETS];
+      uint64_t calls = 0;
+      for (int b = 0; b < MPISTATS_BUCKETS; b++)
+        calls += buckets[b];
+      if (calls == 0)
+        continue;
+
+      std::string name = mpistats_names[op];
+      for (auto &c : name)
+        c = toupper(c);
+      for (const auto &p : percentiles) {
+        // Upper limit of the bucket containing the percentile
+        uint64_t rank = std::ceil(p.second * calls);
+        uint64_t seen = 0;
+        int b = 0;
+        while ((seen += buckets[b]) < rank)
+          b++;
+        j[name + "_" + p.first + "_US"] =
+          std::to_string(mpistats_bucket_limit(b) / 1000.0);
+      }
+    }
+    return j;
+  }
+};
 
 class InterferenceAccounter : public Accounter {
   const std::string output_format;
   std::string PREFIX;
+  // Empty, "node" or "global"
+  std::string reduce;
+  std::vector<PerfCounter *> _perf;
+  MpiStats *_mpi_stats = nullptr;
+  Regions *_regions = nullptr;
 
 private:
   typedef std::unique_ptr<Counter> counter_ptr;
@@ -179,19 +363,37 @@ private:
     std::vector<std::string> counter_list;
     counter_list = parse_perf_counters(str);
 
-    if (counter_list.size() == 0)
-      return;
-
+    // A hardware group is multiplexed or fails to count as a whole,
+    // so software events get a group of their own and keep counting
+    std::vector<std::string> hw, sw;
     for (const auto &cnt : counter_list) {
-      _counters.push_back(counter_ptr(new PerfCounter(_ranks, cnt)));
+      struct perf_event_attr attr;
+      build_perf_attr(&attr, cnt);
+      if (attr.type == PERF_TYPE_SOFTWARE)
+        sw.push_back(cnt);
+      else
+        hw.push_back(cnt);
     }
+
+    add_perf_group("PERF_HW", hw);
+    add_perf_group("PERF_SW", sw);
+  }
+
+  void add_perf_group(const std::string &name,
+                      const std::vector<std::string> &events) {
+    if (events.size() == 0)
+      return;
+
+    auto perf = new PerfCounter(_ranks, name, events);
+    _counters.push_back(counter_ptr(perf));
+    _perf.push_back(perf);
   }
 
 public:
   InterferenceAccounter(int ranks, const std::string &output_format) :
     Accounter(ranks), output_format(output_format)
   {
-    _counters.push_back(counter_ptr(new IterAccounter(ranks, "ITER")));
+    _counters.push_back(counter_ptr(new IterationCounter("ITER")));
     _counters.push_back(counter_ptr(new HostNameAccounter(ranks, "NODE")));
     _counters.push_back(counter_ptr(new LocalId(ranks, "LOCALID")));
     _counters.push_back(counter_ptr(new CpuManager(ranks, "CPU")));
@@ -212,12 +414,51 @@ public:
       if (counters) {
         parse_and_add_perf_counters(counters);
       }
+
+      // Sample the counters during the run
+      auto sample_ms = std::getenv("INTERFERENCE_SAMPLE_MS");
+      if (sample_ms) {
+        _counters.push_back(counter_ptr(
+          new Sampler(ranks, "SAMPLES", std::stol(sample_ms), _perf)));
+      }
+
+      // Account the MPI calls of the application
+      if (std::getenv("INTERFERENCE_MPI_STATS")) {
+        _mpi_stats = new MpiStats("MPI");
+        _counters.push_back(counter_ptr(_mpi_stats));
+      }
+
+      // Regions account all the counters, which accumulate
+      auto regions = std::getenv("INTERFERENCE_REGIONS");
+      if (regions) {
+        long slots = std::stol(regions);
+        if (slots <= 0)
+          throw std::runtime_error("INTERFERENCE_REGIONS should be positive");
+        std::vector<Counter *> cumulative;
+        for (const auto &c : _counters)
+          if (c->cumulative())
+            cumulative.push_back(c.get());
+        _regions = new Regions("REGIONS", cumulative, slots);
+        _counters.push_back(counter_ptr(_regions));
+      }
     }
 
     auto env = std::getenv("INTERFERENCE_PREFIX");
     if (!env)
       throw std::runtime_error("INTERFERENCE_PREFIX should be set");
     PREFIX = env;
+
+    auto reduce_ptr = std::getenv("INTERFERENCE_REDUCE");
+    if (reduce_ptr) {
+      reduce = reduce_ptr;
+      if (reduce != "node" && reduce != "global")
+        throw std::runtime_error("Unknown reduction requested: " + reduce);
+      if (output_format != "json")
+        throw std::runtime_error("INTERFERENCE_REDUCE requires json output");
+      if (std::getenv("INTERFERENCE_OUTPUT_FILE"))
+        throw std::runtime_error("INTERFERENCE_REDUCE can not be combined"
+                                 " with INTERFERENCE_OUTPUT_FILE");
+    }
   }
 
   void dump_csv(const CounterMap &map) {
@@ -232,7 +473,24 @@ public:
     }
   }
 
-  void dump_json(const CounterMap &map) {
+  void region_begin(const char *name, size_t len) {
+    if (_regions)
+      _regions->begin(name, len);
+  }
+
+  void region_end(const char *name, size_t len) {
+    if (_regions)
+      _regions->end(name, len);
+  }
+
+  // Values describing the whole run, collective
+  json summary() {
+    if (!_mpi_stats)
+      return json::object();
+    return _mpi_stats->latency();
+  }
+
+  void dump_json(const CounterMap &map, const json &summary) {
     json j;
 
     for (int i = 0; i < _ranks; i++) {
@@ -242,11 +500,101 @@ public:
       }
       j[PREFIX].push_back(row);
     }
+    if (!summary.empty())
+      j[PREFIX + "_SUMMARY"] = summary;
+
+    std::cout << j.dump() << std::endl;
+  }
+
+  /**
+   * Print minimum, maximum, mean and sum of every numeric field over
+   * the ranks of every node or over all ranks. Text fields are taken
+   * from the first rank of a node.
+   */
+  void dump_reduced(bool per_node, const json &summary) {
+    std::vector<Field> fields;
+    std::vector<size_t> offsets;
+    std::vector<double> values;
+    for (size_t i = 0; i < _counters.size(); i++) {
+      size_t offset = _offsets[i];
+      for (const auto &f : _counters[i]->fields()) {
+        const char *data = _record.data() + offset;
+        if (f.kind == Field::INT)
+          values.push_back(load<int64_t>(data));
+        else if (f.kind == Field::DOUBLE)
+          values.push_back(load<double>(data));
+        if (f.kind != Field::BLOB) {
+          fields.push_back(f);
+          offsets.push_back(offset);
+        }
+        offset += f.size;
+      }
+    }
+
+    size_t count = values.size();
+    size_t stats_size = (3 * count + 1) * sizeof(double);
+    size_t group_size = stats_size + _record_size;
+
+    int groups = reduce_groups(per_node);
+    std::vector<char> stats;
+    if (get_my_rank() == 0)
+      stats.resize(groups * group_size);
+    reduce_values(values.data(), count, _record.data(), _record_size,
+                  stats.data());
+
+    if (get_my_rank() != 0)
+      return;
+
+    json j;
+    for (int g = 0; g < groups; g++) {
+      const char *group = stats.data() + g * group_size;
+      const char *leader = group + stats_size;
+      double ranks = load<double>(group + 3 * count * sizeof(double));
+
+      json row;
+      row["RANKS"] = std::to_string(static_cast<int64_t>(ranks));
+      size_t k = 0;
+      for (size_t i = 0; i < fields.size(); i++) {
+        const auto &f = fields[i];
+        if (f.kind == Field::STRING) {
+          if (per_node)
+            row[f.name] = format_field(f, leader + offsets[i]);
+          continue;
+        }
+
+        double min = load<double>(group + k * sizeof(double));
+        double max = load<double>(group + (count + k) * sizeof(double));
+        double sum = load<double>(group + (2 * count + k) * sizeof(double));
+        k++;
+        if (f.kind == Field::INT) {
+          row[f.name + "_MIN"] = std::to_string(static_cast<int64_t>(min));
+          row[f.name + "_MAX"] = std::to_string(static_cast<int64_t>(max));
+          row[f.name + "_SUM"] = std::to_string(static_cast<int64_t>(sum));
+        } else {
+          row[f.name + "_MIN"] = std::to_string(min);
+          row[f.name + "_MAX"] = std::to_string(max);
+          row[f.name + "_SUM"] = std::to_string(sum);
+        }
+        row[f.name + "_MEAN"] = std::to_string(sum / ranks);
+      }
+      j[PREFIX].push_back(row);
+    }
+    if (!summary.empty())
+      j[PREFIX + "_SUMMARY"] = summary;
 
     std::cout << j.dump() << std::endl;
   }
 
   void dump(const std::set<std::string> &filter = std::set<std::string>()) {
+    auto summary = this->summary();
+
+    if (!reduce.empty()) {
+      dump_reduced(reduce == "node", summary);
+      return;
+    }
+
+    exchange();
+
     int my_rank = get_my_rank();
     if (my_rank != 0)
       return;
@@ -256,9 +604,52 @@ public:
     if (output_format == "csv") {
       dump_csv(map);
     } else if (output_format == "json") {
-      dump_json(map);
+      dump_json(map, summary);
     }
   }
+
+  /**
+   * Header of the output file: json description of the record layout
+   * on a single line, padded so that the records are aligned.
+   */
+  std::string header() {
+    static const char *kinds[] = {"int", "double", "string", "blob"};
+
+    json fields = json::array();
+    for (size_t i = 0; i < _counters.size(); i++) {
+      size_t offset = _offsets[i];
+      for (const auto &f : _counters[i]->fields()) {
+        json field = {{"name", f.name}, {"kind", kinds[f.kind]},
+                      {"size", f.size}, {"offset", offset}};
+        if (!f.meta.empty())
+          field["meta"] = json::parse(f.meta);
+        fields.push_back(field);
+        offset += f.size;
+      }
+    }
+
+    json j = {{"prefix", PREFIX}, {"ranks", _ranks},
+              {"record_size", _record_size}, {"fields", fields}};
+    std::string text = j.dump();
+    text.append(7 - text.size() % 8, ' ');
+    text += '\n';
+    return text;
+  }
+
+  /**
+   * Write records of all ranks into a file in parallel. The summary
+   * follows the records as a json line.
+   */
+  void write(const std::string &path) {
+    auto text = header();
+    auto summary = this->summary();
+    std::string trailer = summary.empty() ? "" : summary.dump() + "\n";
+    int ret = write_records(path.c_str(), text.data(), text.size(),
+                            _record.data(), _record_size,
+                            trailer.data(), trailer.size());
+    if (ret)
+      throw std::runtime_error("Failed to write results to " + path);
+  }
 };
 
 std::unique_ptr<InterferenceAccounter> accounter;
@@ -277,7 +668,11 @@ void interference_end()
   // Here we should read stat
   accounter->end_accounting();
 
-  accounter->dump();
+  auto output_file = std::getenv("INTERFERENCE_OUTPUT_FILE");
+  if (output_file)
+    accounter->write(output_file);
+  else
+    accounter->dump();
 
   if (std::getenv("INTERFERENCE_HACK")) {
     barrier();
@@ -285,3 +680,54 @@ void interference_end()
     exit(0);
   }
 }
+
+/**
+ * Exceptions must not leave the C and Fortran interface. A wrong region
+ * call is ignored, the first one is reported.
+ */
+static void region_call(bool begin, const char *name, size_t len)
+{
+  static bool warned = false;
+
+  if (!accounter)
+    return;
+  try {
+    if (begin)
+      accounter->region_begin(name, len);
+    else
+      accounter->region_end(name, len);
+  } catch (const std::exception &e) {
+    if (!warned)
+      std::cerr << "interference: ignoring region call: " << e.what()
+                << std::endl;
+    warned = true;
+  }
+}
+
+void interference_region_begin(const char *name)
+{
+  region_call(true, name, strlen(name));
+}
+
+void interference_region_end(const char *name)
+{
+  region_call(false, name, strlen(name));
+}
+
+// Fortran passes the length of a string separately, without '\0'
+static size_t fortran_length(const char *str, size_t len)
+{
+  while (len > 0 && str[len - 1] == ' ')
+    len--;
+  return len;
+}
+
+void interference_region_begin_(const char *name, size_t len)
+{
+  region_call(true, name, fortran_length(name, len));
+}
+
+void interference_region_end_(const char *name, size_t len)
+{
+  region_call(false, name, fortran_length(name, len));
+}
@@ -1,10 +1,20 @@
 #pragma once
 
+#include <stddef.h>
+
 #ifdef __cplusplus
 extern "C" {
 #endif /* __cplusplus */
   void interference_start();
   void interference_end();
+
+  /* Account the counters between begin and end under the name */
+  void interference_region_begin(const char *name);
+  void interference_region_end(const char *name);
+
+  /* Fortran: call interference_region_begin('solver') */
+  void interference_region_begin_(const char *name, size_t len);
+  void interference_region_end_(const char *name, size_t len);
 #ifdef __cplusplus
 }
 #endif /* __cplusplus */
@@ -1,3 +1,6 @@
+#include <stdlib.h>
+#include <string.h>
+
 #include <mpi.h>
 
 #include "interference_mpi.h"
@@ -23,12 +26,117 @@ void gather(void *my_data, size_t count, void *all_data)
              0, MPI_COMM_WORLD);
 }
 
-void gather_names(const char *my_name, char *names, unsigned name_len)
+void barrier()
 {
-  MPI_Gather((void *)my_name, name_len, MPI_CHAR, names, name_len, MPI_CHAR, 0, MPI_COMM_WORLD);
+  MPI_Barrier(MPI_COMM_WORLD);
 }
 
-void barrier()
+/* Ranks, which are reduced together, and the first ranks of the groups */
+static MPI_Comm group_comm = MPI_COMM_NULL;
+static MPI_Comm leader_comm = MPI_COMM_NULL;
+
+/**
+ * Split the ranks into groups for reduce_values: one group per node
+ * or a single group. Returns the number of groups on rank 0.
+ */
+int reduce_groups(int per_node)
 {
-  MPI_Barrier(MPI_COMM_WORLD);
+  int rank, group_rank, groups = 0;
+
+  MPI_Comm_rank(MPI_COMM_WORLD, &rank);
+  if (per_node)
+    MPI_Comm_split_type(MPI_COMM_WORLD, MPI_COMM_TYPE_SHARED, rank,
+                        MPI_INFO_NULL, &group_comm);
+  else
+    MPI_Comm_dup(MPI_COMM_WORLD, &group_comm);
+
+  MPI_Comm_rank(group_comm, &group_rank);
+  MPI_Comm_split(MPI_COMM_WORLD, group_rank == 0 ? 0 : MPI_UNDEFINED, rank,
+                 &leader_comm);
+  if (leader_comm != MPI_COMM_NULL)
+    MPI_Comm_size(leader_comm, &groups);
+  return groups;
+}
+
+/**
+ * Reduce values over every group with MIN, MAX and SUM. Rank 0
+ * receives for every group the minimums, maximums, sums, the number
+ * of ranks as a double and the tag of the first rank of the group.
+ */
+void reduce_values(const double *values, size_t count,
+                   const void *tag, size_t tag_size, void *stats)
+{
+  size_t stats_size = (3 * count + 1) * sizeof(double);
+  char *group = malloc(stats_size + tag_size);
+  double *res = (double *)group;
+  int group_size;
+
+  MPI_Comm_size(group_comm, &group_size);
+  MPI_Reduce((void *)values, res, count, MPI_DOUBLE, MPI_MIN, 0, group_comm);
+  MPI_Reduce((void *)values, res + count, count, MPI_DOUBLE, MPI_MAX, 0,
+             group_comm);
+  MPI_Reduce((void *)values, res + 2 * count, count, MPI_DOUBLE, MPI_SUM, 0,
+             group_comm);
+
+  if (leader_comm != MPI_COMM_NULL) {
+    res[3 * count] = group_size;
+    memcpy(group + stats_size, tag, tag_size);
+    MPI_Gather(group, stats_size + tag_size, MPI_BYTE,
+               stats, stats_size + tag_size, MPI_BYTE, 0, leader_comm);
+    MPI_Comm_free(&leader_comm);
+  }
+
+  free(group);
+  MPI_Comm_free(&group_comm);
+}
+
+/**
+ * Sum values over all ranks, rank 0 receives the sums
+ */
+void reduce_sum(const uint64_t *values, size_t count, uint64_t *sums)
+{
+  MPI_Reduce((void *)values, sums, count, MPI_UINT64_T, MPI_SUM, 0,
+             MPI_COMM_WORLD);
+}
+
+/**
+ * Write a file consisting of a header, the records of all ranks in
+ * the rank order and a trailer. All ranks write their records in
+ * parallel, the header and the trailer are written by rank 0.
+ */
+int write_records(const char *path,
+                  const char *header, size_t header_size,
+                  const void *record, size_t record_size,
+                  const char *trailer, size_t trailer_size)
+{
+  MPI_File fh;
+  MPI_Offset offset;
+  int rank, ranks, ret;
+
+  MPI_Comm_rank(MPI_COMM_WORLD, &rank);
+  MPI_Comm_size(MPI_COMM_WORLD, &ranks);
+
+  ret = MPI_File_open(MPI_COMM_WORLD, (char *)path,
+                      MPI_MODE_CREATE | MPI_MODE_WRONLY,
+                      MPI_INFO_NULL, &fh);
+  if (ret != MPI_SUCCESS)
+    return ret;
+
+  ret = MPI_File_set_size(fh, 0);
+  if (ret == MPI_SUCCESS && rank == 0) {
+    ret = MPI_File_write_at(fh, 0, (void *)header, header_size,
+                            MPI_BYTE, MPI_STATUS_IGNORE);
+    offset = header_size + (MPI_Offset)ranks * record_size;
+    if (ret == MPI_SUCCESS && trailer_size > 0)
+      ret = MPI_File_write_at(fh, offset, (void *)trailer, trailer_size,
+                              MPI_BYTE, MPI_STATUS_IGNORE);
+  }
+
+  offset = header_size + (MPI_Offset)rank * record_size;
+  if (MPI_File_write_at_all(fh, offset, (void *)record, record_size,
+                            MPI_BYTE, MPI_STATUS_IGNORE) != MPI_SUCCESS)
+    ret = MPI_ERR_OTHER;
+
+  MPI_File_close(&fh);
+  return ret;
 }
@@ -1,6 +1,7 @@
 #pragma once
 
 #include <stddef.h>
+#include <stdint.h>
 
 #ifdef __cplusplus
 extern "C" {
@@ -9,8 +10,15 @@ extern "C" {
   int get_ranks();
   int get_my_rank();
   void gather(void *my_data, size_t count, void* all_count);
-  void gather_names(const char *my_name, char *names, unsigned name_len);
   void barrier();
+  int reduce_groups(int per_node);
+  void reduce_values(const double *values, size_t count,
+                     const void *tag, size_t tag_size, void *stats);
+  void reduce_sum(const uint64_t *values, size_t count, uint64_t *sums);
+  int write_records(const char *path,
+                    const char *header, size_t header_size,
+                    const void *record, size_t record_size,
+                    const char *trailer, size_t trailer_size);
 
 #ifdef __cplusplus
 }
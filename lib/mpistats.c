@@ -0,0 +1,128 @@
+#include <string.h>
+
+#include "mpistats.h"
+
+/* Threads beyond the limit are not accounted */
+#define MPISTATS_THREADS 64
+
+int mpistats_enabled = 0;
+int mpistats_iter_op = -1;
+__thread struct mpistats *mpistats_local = NULL;
+
+#define MPISTATS_NAME(name) #name,
+const char *mpistats_names[MPISTATS_NOPS] = {
+  MPISTATS_OPS(MPISTATS_NAME)
+};
+
+/* Every thread accumulates into its own slot without atomics, slots
+ * do not share cache lines */
+static struct slot {
+  struct mpistats stats;
+} __attribute__((aligned(64))) slots[MPISTATS_THREADS];
+static int used = 0;
+
+static int used_slots(void)
+{
+  int threads = __atomic_load_n(&used, __ATOMIC_ACQUIRE);
+  return threads < MPISTATS_THREADS ? threads : MPISTATS_THREADS;
+}
+
+struct mpistats *mpistats_register(void)
+{
+  int slot = __atomic_fetch_add(&used, 1, __ATOMIC_RELAXED);
+  if (slot >= MPISTATS_THREADS)
+    return NULL;
+  mpistats_local = &slots[slot].stats;
+  return mpistats_local;
+}
+
+void mpistats_start(void)
+{
+  memset(slots, 0, used_slots() * sizeof(slots[0]));
+  __atomic_store_n(&mpistats_enabled, 1, __ATOMIC_RELEASE);
+}
+
+void mpistats_stop(struct mpistats *total)
+{
+  __atomic_store_n(&mpistats_enabled, 0, __ATOMIC_RELEASE);
+  mpistats_read(total);
+}
+
+/* Sum of all threads, the threads may keep accounting */
+void mpistats_read(struct mpistats *total)
+{
+  int slot, c, op, b;
+
+  memset(total, 0, sizeof(*total));
+  for (slot = 0; slot < used_slots(); slot++) {
+    const struct mpistats *stats = &slots[slot].stats;
+    for (c = 0; c < MPISTATS_CATEGORIES; c++) {
+      total->calls[c] += stats->calls[c];
+      total->bytes[c] += stats->bytes[c];
+      total->ns[c] += stats->ns[c];
+    }
+    for (op = 0; op < MPISTATS_NOPS; op++)
+      for (b = 0; b < MPISTATS_BUCKETS; b++)
+        total->hist[op][b] += stats->hist[op][b];
+  }
+}
+
+/* Smallest duration in nanoseconds above the bucket */
+uint64_t mpistats_bucket_limit(int bucket)
+{
+  int exp = bucket / 4 + 1;
+
+  if (bucket < 4)
+    return bucket + 1;
+  return (uint64_t)(4 + bucket % 4 + 1) << (exp - 2);
+}
+
+/*
+ * Iterations, the times are kept in a buffer of the caller. Only the
+ * thread, which started the detection, counts iterations, calls from
+ * other threads are ignored.
+ */
+static __thread long iter_every, iter_calls;
+static __thread uint64_t *iter_times, iter_capacity, iter_count, iter_last;
+
+/*
+ * Record the time between every Kth call of op in the calling thread.
+ * Only the first capacity times are kept, but all iterations are
+ * counted.
+ */
+void mpistats_iter_start(int op, long every, uint64_t *times,
+                         uint64_t capacity)
+{
+  iter_every = every;
+  iter_calls = 0;
+  iter_times = times;
+  iter_capacity = capacity;
+  iter_count = 0;
+  iter_last = 0;
+  __atomic_store_n(&mpistats_iter_op, op, __ATOMIC_RELEASE);
+}
+
+/* Returns the number of iterations, called by the starting thread */
+uint64_t mpistats_iter_stop(void)
+{
+  __atomic_store_n(&mpistats_iter_op, -1, __ATOMIC_RELEASE);
+  iter_times = NULL;
+  return iter_count;
+}
+
+void mpistats_iteration(void)
+{
+  uint64_t now;
+
+  if (!iter_times || ++iter_calls % iter_every)
+    return;
+
+  /* The first boundary starts the first iteration */
+  now = mpistats_now();
+  if (iter_last) {
+    if (iter_count < iter_capacity)
+      iter_times[iter_count] = now - iter_last;
+    iter_count++;
+  }
+  iter_last = now;
+}
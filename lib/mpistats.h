@@ -0,0 +1,118 @@
+#pragma once
+
+#include <stdint.h>
+#include <time.h>
+
+#ifdef __cplusplus
+extern "C" {
+#endif /* __cplusplus */
+
+  /* Categories of intercepted MPI calls */
+  enum {
+    MPISTATS_P2P,
+    MPISTATS_COLL,
+    MPISTATS_WAIT,
+    MPISTATS_CATEGORIES
+  };
+
+  /* Intercepted MPI calls, each gets its own latency histogram */
+#define MPISTATS_OPS(X)                                               \
+  X(MPI_Send) X(MPI_Ssend) X(MPI_Bsend) X(MPI_Rsend) X(MPI_Isend)     \
+  X(MPI_Issend) X(MPI_Recv) X(MPI_Irecv) X(MPI_Bcast) X(MPI_Reduce)   \
+  X(MPI_Allreduce) X(MPI_Alltoall) X(MPI_Allgather) X(MPI_Gather)     \
+  X(MPI_Scatter) X(MPI_Barrier) X(MPI_Wait) X(MPI_Waitall)            \
+  X(MPI_Waitany) X(MPI_Waitsome)
+
+#define MPISTATS_OP(name) MPISTATS_OP_##name
+#define MPISTATS_ENUM(name) MPISTATS_OP(name),
+  enum {
+    MPISTATS_OPS(MPISTATS_ENUM)
+    MPISTATS_NOPS
+  };
+#undef MPISTATS_ENUM
+
+  /* Four buckets per power of two of nanoseconds up to 2^41 ns */
+#define MPISTATS_BUCKETS 160
+
+  struct mpistats {
+    uint64_t calls[MPISTATS_CATEGORIES];
+    uint64_t bytes[MPISTATS_CATEGORIES];
+    uint64_t ns[MPISTATS_CATEGORIES];
+    uint64_t hist[MPISTATS_NOPS][MPISTATS_BUCKETS];
+  };
+
+  extern int mpistats_enabled;
+  /* Call marking iteration boundaries, -1 if none */
+  extern int mpistats_iter_op;
+  extern __thread struct mpistats *mpistats_local;
+  extern const char *mpistats_names[MPISTATS_NOPS];
+
+  struct mpistats *mpistats_register(void);
+  void mpistats_start(void);
+  void mpistats_stop(struct mpistats *total);
+  void mpistats_read(struct mpistats *total);
+  uint64_t mpistats_bucket_limit(int bucket);
+
+  void mpistats_iter_start(int op, long every, uint64_t *times,
+                           uint64_t capacity);
+  uint64_t mpistats_iter_stop(void);
+  void mpistats_iteration(void);
+
+  static inline uint64_t mpistats_now(void)
+  {
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return (uint64_t)ts.tv_sec * 1000000000 + ts.tv_nsec;
+  }
+
+  static inline int mpistats_bucket(uint64_t ns)
+  {
+    int exp;
+
+    if (ns < 4)
+      return ns;
+    exp = 63 - __builtin_clzll(ns);
+    if (exp > 40)
+      return MPISTATS_BUCKETS - 1;
+    /* The two bits after the leading one select the sub-bucket */
+    return 4 * (exp - 1) + ((ns >> (exp - 2)) & 3);
+  }
+
+  /* Start of an intercepted call, 0 if accounting is off */
+  static inline uint64_t mpistats_begin(void)
+  {
+    if (!mpistats_enabled)
+      return 0;
+    return mpistats_now();
+  }
+
+  /* End of an intercepted call started with mpistats_begin */
+  static inline void mpistats_end(int category, int op, uint64_t start,
+                                  uint64_t bytes)
+  {
+    struct mpistats *stats;
+    uint64_t ns;
+
+    if (!start || !mpistats_enabled)
+      return;
+
+    stats = mpistats_local ? mpistats_local : mpistats_register();
+    if (!stats)
+      return;
+    ns = mpistats_now() - start;
+    stats->calls[category]++;
+    stats->bytes[category] += bytes;
+    stats->ns[category] += ns;
+    stats->hist[op][mpistats_bucket(ns)]++;
+  }
+
+  /* Every intercepted call may mark an iteration boundary */
+  static inline void mpistats_mark(int op)
+  {
+    if (op == mpistats_iter_op)
+      mpistats_iteration();
+  }
+
+#ifdef __cplusplus
+}
+#endif /* __cplusplus */
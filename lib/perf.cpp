@@ -1,3 +1,6 @@
+#include <algorithm>
+#include <map>
+
 #include <unistd.h>
 #include <string.h>
 #include <sys/ioctl.h>
@@ -19,77 +22,244 @@ perf_event_open(struct perf_event_attr *hw_event, pid_t pid,
   return ret;
 }
 
-void PerfCounter::build_perf_attr(struct perf_event_attr *attr,
-                                  const std::string &event)
+struct PerfEvent {
+  uint32_t type;
+  uint64_t config;
+  // For some event we need to take kernel into account
+  bool kernel;
+};
+
+static const std::map<std::string, PerfEvent> perf_events = {
+  {"cpu_cycles", {PERF_TYPE_HARDWARE, PERF_COUNT_HW_CPU_CYCLES, false}},
+  {"instructions", {PERF_TYPE_HARDWARE, PERF_COUNT_HW_INSTRUCTIONS, false}},
+  {"cache_references", {PERF_TYPE_HARDWARE, PERF_COUNT_HW_CACHE_REFERENCES, false}},
+  {"cache_misses", {PERF_TYPE_HARDWARE, PERF_COUNT_HW_CACHE_MISSES, false}},
+  {"branch_instructions", {PERF_TYPE_HARDWARE, PERF_COUNT_HW_BRANCH_INSTRUCTIONS, false}},
+  {"branch_misses", {PERF_TYPE_HARDWARE, PERF_COUNT_HW_BRANCH_MISSES, false}},
+  {"bus_cycles", {PERF_TYPE_HARDWARE, PERF_COUNT_HW_BUS_CYCLES, false}},
+  {"stalled_cycles_frontend", {PERF_TYPE_HARDWARE, PERF_COUNT_HW_STALLED_CYCLES_FRONTEND, false}},
+  {"stalled_cycles_backend", {PERF_TYPE_HARDWARE, PERF_COUNT_HW_STALLED_CYCLES_BACKEND, false}},
+  {"ref_cpu_cycles", {PERF_TYPE_HARDWARE, PERF_COUNT_HW_REF_CPU_CYCLES, false}},
+  {"migrations", {PERF_TYPE_SOFTWARE, PERF_COUNT_SW_CPU_MIGRATIONS, true}},
+  {"page_faults", {PERF_TYPE_SOFTWARE, PERF_COUNT_SW_PAGE_FAULTS, false}},
+  {"minor_faults", {PERF_TYPE_SOFTWARE, PERF_COUNT_SW_PAGE_FAULTS_MIN, false}},
+  {"major_faults", {PERF_TYPE_SOFTWARE, PERF_COUNT_SW_PAGE_FAULTS_MAJ, false}},
+  {"context_switches", {PERF_TYPE_SOFTWARE, PERF_COUNT_SW_CONTEXT_SWITCHES, true}},
+  {"cpu_clock", {PERF_TYPE_SOFTWARE, PERF_COUNT_SW_CPU_CLOCK, false}},
+  {"task_clock", {PERF_TYPE_SOFTWARE, PERF_COUNT_SW_TASK_CLOCK, false}},
+};
+
+static const std::map<std::string, uint64_t> perf_caches = {
+  {"L1D", PERF_COUNT_HW_CACHE_L1D},
+  {"L1I", PERF_COUNT_HW_CACHE_L1I},
+  {"LLC", PERF_COUNT_HW_CACHE_LL},
+  {"DTLB", PERF_COUNT_HW_CACHE_DTLB},
+  {"ITLB", PERF_COUNT_HW_CACHE_ITLB},
+  {"BPU", PERF_COUNT_HW_CACHE_BPU},
+  {"NODE", PERF_COUNT_HW_CACHE_NODE},
+};
+
+static const std::map<std::string, uint64_t> perf_cache_ops = {
+  {"read", PERF_COUNT_HW_CACHE_OP_READ},
+  {"write", PERF_COUNT_HW_CACHE_OP_WRITE},
+  {"prefetch", PERF_COUNT_HW_CACHE_OP_PREFETCH},
+};
+
+static const std::map<std::string, uint64_t> perf_cache_results = {
+  {"access", PERF_COUNT_HW_CACHE_RESULT_ACCESS},
+  {"miss", PERF_COUNT_HW_CACHE_RESULT_MISS},
+};
+
+static std::vector<std::string> split(const std::string &str, char delim)
+{
+  std::vector<std::string> result;
+  std::string::size_type start = 0, end;
+  while ((end = str.find(delim, start)) != std::string::npos) {
+    result.push_back(str.substr(start, end - start));
+    start = end + 1;
+  }
+  result.push_back(str.substr(start));
+  return result;
+}
+
+/**
+ * Fill perf_event_attr for an event. An event is either a name from
+ * perf_events, a cache event <cache>:<op>:<result> (e.g. LLC:read:miss)
+ * or a raw event r<hex>. A trailing :u, :k or :uk restricts counting
+ * to user space, kernel or both.
+ */
+void build_perf_attr(struct perf_event_attr *attr, const std::string &event)
 {
   memset(attr, 0, sizeof(struct perf_event_attr));
 
   attr->disabled = 1;
   attr->exclude_hv = 1;
-  // For some event we need to take kernel into account
   attr->exclude_kernel = 1;
   attr->size = sizeof(struct perf_event_attr);
 
-  if (event == "cpu_cycles") {
-    attr->type   = PERF_TYPE_HARDWARE;
-    attr->config = PERF_COUNT_HW_CPU_CYCLES;
-  } else if (event == "instructions") {
-    attr->type   = PERF_TYPE_HARDWARE;
-    attr->config = PERF_COUNT_HW_INSTRUCTIONS;
-  } else if (event == "cache_references") {
-    attr->type   = PERF_TYPE_HARDWARE;
-    attr->config = PERF_COUNT_HW_CACHE_REFERENCES;
-  } else if (event == "cache_misses") {
-    attr->type   = PERF_TYPE_HARDWARE;
-    attr->config = PERF_COUNT_HW_CACHE_MISSES;
-  } else if (event == "branch_instructions") {
-    attr->type   = PERF_TYPE_HARDWARE;
-    attr->config = PERF_COUNT_HW_BRANCH_INSTRUCTIONS;
-  } else if (event == "branch_misses") {
-    attr->type   = PERF_TYPE_HARDWARE;
-    attr->config = PERF_COUNT_HW_BRANCH_MISSES;
-  } else if (event == "migrations") {
-    attr->type   = PERF_TYPE_SOFTWARE;
-    attr->config = PERF_COUNT_SW_CPU_MIGRATIONS;
-    attr->exclude_kernel = 0;
-  } else if (event == "page_faults") {
-    attr->type   = PERF_TYPE_SOFTWARE;
-    attr->config = PERF_COUNT_SW_PAGE_FAULTS;
-  } else if (event == "context_switches") {
-    attr->type   = PERF_TYPE_SOFTWARE;
-    attr->config = PERF_COUNT_SW_CONTEXT_SWITCHES;
-    attr->exclude_kernel = 0;
+  auto parts = split(event, ':');
+  std::string modifier;
+  if (parts.size() > 1 && !parts.back().empty() &&
+      parts.back().find_first_not_of("uk") == std::string::npos) {
+    modifier = parts.back();
+    parts.pop_back();
+  }
+
+  auto unknown = std::runtime_error("Unknown perf event requested " + event);
+  auto named = perf_events.find(parts[0]);
+  if (parts.size() == 1 && named != perf_events.end()) {
+    attr->type = named->second.type;
+    attr->config = named->second.config;
+    attr->exclude_kernel = !named->second.kernel;
+  } else if (parts.size() == 1 && parts[0].size() > 1 && parts[0][0] == 'r') {
+    std::size_t pos;
+    try {
+      attr->config = std::stoull(parts[0].substr(1), &pos, 16);
+    } catch (std::exception &e) {
+      throw unknown;
+    }
+    if (pos != parts[0].size() - 1)
+      throw unknown;
+    attr->type = PERF_TYPE_RAW;
+  } else if (parts.size() == 3) {
+    auto cache = perf_caches.find(parts[0]);
+    auto op = perf_cache_ops.find(parts[1]);
+    auto result = perf_cache_results.find(parts[2]);
+    if (cache == perf_caches.end() || op == perf_cache_ops.end() ||
+        result == perf_cache_results.end())
+      throw unknown;
+    attr->type = PERF_TYPE_HW_CACHE;
+    attr->config = cache->second | (op->second << 8) | (result->second << 16);
   } else {
-    throw std::runtime_error("Unknown perf event requested " + event);
+    throw unknown;
+  }
+
+  if (!modifier.empty()) {
+    attr->exclude_user = modifier.find('u') == std::string::npos;
+    attr->exclude_kernel = modifier.find('k') == std::string::npos;
   }
+}
 
+PerfFds::~PerfFds()
+{
+  // Members first, the leader last
+  for (auto fd = _fds.rbegin(); fd != _fds.rend(); fd++)
+    close(*fd);
 }
 
-PerfCounter::PerfCounter(int ranks, std::string name) :
-  SingleCounter(ranks, name)
+PerfCounter::PerfCounter(int ranks, const std::string &name,
+                         const std::vector<std::string> &events) :
+  Counter(name),
+  _events(events),
+  _buffer(3 + events.size()),
+  _current(3 + events.size()),
+  _sampled(3 + events.size()),
+  _ranks(ranks),
+  _value(2 + events.size())
 {
-  struct perf_event_attr event;
-  build_perf_attr(&event, name);
+  int leader = -1;
+  for (const auto &e : _events) {
+    struct perf_event_attr event;
+    build_perf_attr(&event, e);
+    event.read_format = PERF_FORMAT_GROUP |
+      PERF_FORMAT_TOTAL_TIME_ENABLED |
+      PERF_FORMAT_TOTAL_TIME_RUNNING;
+    // Members follow the leader
+    event.disabled = leader == -1;
 
-  _fd = perf_event_open(&event, 0, -1, -1, 0);
-  if (_fd == -1) {
-    auto err = strerror(errno);
-    throw std::runtime_error("Failed to create event: " + _name + "  " + err);
+    int fd = perf_event_open(&event, 0, -1, leader, 0);
+    if (fd == -1) {
+      auto err = strerror(errno);
+      throw std::runtime_error("Failed to create event: " + e + "  " + err);
+    }
+    if (leader == -1)
+      leader = fd;
+    _fds.push_back(fd);
   }
 }
 
 void PerfCounter::start_accounting()
 {
-  ioctl(_fd, PERF_EVENT_IOC_RESET, 0);
-  ioctl(_fd, PERF_EVENT_IOC_ENABLE, 0);
+  if (_fds.empty())
+    return;
+  ioctl(_fds[0], PERF_EVENT_IOC_RESET, PERF_IOC_FLAG_GROUP);
+  ioctl(_fds[0], PERF_EVENT_IOC_ENABLE, PERF_IOC_FLAG_GROUP);
 }
 
-void PerfCounter::end_accounting()
+void PerfCounter::read_group()
 {
-  ioctl(_fd, PERF_EVENT_IOC_DISABLE, 0);
-  auto ret = read(_fd, &_value, sizeof(_value));
-  if (ret != sizeof(_value)) {
+  auto size = _buffer.size() * sizeof(uint64_t);
+  auto ret = read(_fds[0], _buffer.data(), size);
+  if (ret != static_cast<ssize_t>(size)) {
     throw std::runtime_error("Failed to read counter: " + _name + "  " + strerror(errno));
   }
-  exchange();
+}
+
+void PerfCounter::end_accounting()
+{
+  if (!_fds.empty()) {
+    ioctl(_fds[0], PERF_EVENT_IOC_DISABLE, PERF_IOC_FLAG_GROUP);
+    read_group();
+    std::copy(_buffer.begin() + 1, _buffer.end(), _value.begin());
+  }
+}
+
+/**
+ * Scale a counter value by the fraction of time the group was
+ * actually counting.
+ */
+static int64_t scale(uint64_t value, uint64_t enabled, uint64_t running)
+{
+  if (running == 0 || running >= enabled)
+    return value;
+  return static_cast<int64_t>(static_cast<double>(value) * enabled / running);
+}
+
+void PerfCounter::read_values(int64_t *values)
+{
+  auto size = _sampled.size() * sizeof(uint64_t);
+  if (_fds.empty() || read(_fds[0], _sampled.data(), size) != static_cast<ssize_t>(size)) {
+    std::fill(values, values + _events.size(), 0);
+    return;
+  }
+  for (size_t i = 0; i < _events.size(); i++)
+    values[i] = scale(_sampled[3 + i], _sampled[1], _sampled[2]);
+}
+
+Fields PerfCounter::fields()
+{
+  Fields fields = {{_name + "_SCALE", Field::DOUBLE, sizeof(double)}};
+  for (const auto &e : _events)
+    fields.push_back({e, Field::INT, sizeof(int64_t)});
+  return fields;
+}
+
+/**
+ * Store the fraction of time the group was counting and the scaled
+ * values.
+ * @param value time_enabled, time_running, then a value for each event
+ */
+static void pack_group(char *record, const uint64_t *value, size_t events)
+{
+  uint64_t enabled = value[0], running = value[1];
+
+  double fraction = enabled ? static_cast<double>(running) / enabled : 1.;
+  store<double>(record, fraction);
+  for (size_t i = 0; i < events; i++) {
+    record += sizeof(int64_t);
+    store<int64_t>(record, scale(value[2 + i], enabled, running));
+  }
+}
+
+void PerfCounter::pack(char *record)
+{
+  pack_group(record, _value.data(), _events.size());
+}
+
+void PerfCounter::pack_current(char *record)
+{
+  auto size = _current.size() * sizeof(uint64_t);
+  if (_fds.empty() || read(_fds[0], _current.data(), size) != static_cast<ssize_t>(size))
+    std::fill(_current.begin(), _current.end(), 0);
+  pack_group(record, _current.data() + 1, _events.size());
 }
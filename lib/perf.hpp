@@ -1,17 +1,72 @@
 #pragma once
 
+#include <linux/perf_event.h>
+
 #include "counter.hpp"
 
-class PerfCounter : public SingleCounter<uint64_t>
+void build_perf_attr(struct perf_event_attr *attr, const std::string &event);
+
+/**
+ * File descriptors of the events of a group. They are closed with the
+ * holder, also when the group fails halfway through opening.
+ */
+class PerfFds
+{
+  std::vector<int> _fds;
+
+public:
+  PerfFds() = default;
+  PerfFds(const PerfFds &) = delete;
+  PerfFds &operator=(const PerfFds &) = delete;
+  ~PerfFds();
+
+  void push_back(int fd) { _fds.push_back(fd); }
+  bool empty() const { return _fds.empty(); }
+  int operator[](size_t i) const { return _fds[i]; }
+};
+
+/**
+ * A group of perf events. The events are started, stopped and read
+ * together. If the kernel multiplexes the group, values are scaled by
+ * the fraction of time the group was counting, which is reported as
+ * <name>_SCALE.
+ */
+class PerfCounter : public Counter
 {
-  int _fd;
+  std::vector<std::string> _events;
+  PerfFds _fds;
+
+  // nr, time_enabled, time_running, then a value for each event
+  std::vector<uint64_t> _buffer;
+  // The same for reads of the main thread in the middle of the run
+  std::vector<uint64_t> _current;
+  // The same for the sampler thread, which reads concurrently
+  std::vector<uint64_t> _sampled;
 
-  void build_perf_attr(struct perf_event_attr *attr, const std::string &event);
+  void read_group();
+
+protected:
+  int _ranks;
+  // time_enabled, time_running, then a value for each event
+  std::vector<uint64_t> _value;
 
 public:
 
-  PerfCounter(int ranks, std::string name);
+  PerfCounter(int ranks, const std::string &name,
+              const std::vector<std::string> &events);
+
+  const std::vector<std::string> &events() { return _events; }
 
   void start_accounting();
   void end_accounting();
+
+  // Current scaled values of the events, the group keeps running.
+  // Called by the sampler thread.
+  void read_values(int64_t *values);
+
+  Fields fields() override;
+  void pack(char *record) override;
+
+  bool cumulative() override { return true; }
+  void pack_current(char *record) override;
 };
@@ -0,0 +1,162 @@
+#include <cstring>
+
+#include "regions.hpp"
+
+#include "nlohmann/json.hpp"
+
+using json = nlohmann::json;
+
+const size_t Regions::name_size;
+
+Regions::Regions(const std::string &name,
+                 const std::vector<Counter *> &counters,
+                 size_t slots) :
+  Counter(name),
+  _slots(slots),
+  _counters(counters),
+  _running(false)
+{
+  size_t size = 0;
+  for (auto c : _counters) {
+    _offsets.push_back(size);
+    for (const auto &f : c->fields()) {
+      // Only integer values accumulate meaningfully
+      if (f.kind == Field::INT) {
+        _columns.push_back(f.name);
+        _columns_offsets.push_back(size);
+      }
+      size += f.size;
+    }
+  }
+  _current.resize(size);
+
+  _slot_size = name_size + (1 + _columns.size()) * sizeof(int64_t);
+  _buffer.resize(_slots * _slot_size);
+  _begin.resize(_slots * _columns.size());
+  _open.resize(_slots);
+  _now.resize(_columns.size());
+}
+
+// Slot of the region, a new one is taken only if create is set
+int Regions::find(const char *name, size_t len, bool create)
+{
+  if (len == 0 || len >= name_size)
+    throw std::runtime_error("Region name should have 1 to " +
+                             std::to_string(name_size - 1) +
+                             " characters: " + std::string(name, len));
+
+  for (size_t s = 0; s < _slots; s++) {
+    char *slot = &_buffer[s * _slot_size];
+    if (!slot[0]) {
+      if (!create)
+        return -1;
+      memcpy(slot, name, len);
+      return s;
+    }
+    if (!strncmp(slot, name, len) && !slot[len])
+      return s;
+  }
+  if (!create)
+    return -1;
+  throw std::runtime_error("Too many regions, " + std::string(name, len) +
+                           " does not fit");
+}
+
+void Regions::read(int64_t *values)
+{
+  for (size_t i = 0; i < _counters.size(); i++)
+    _counters[i]->pack_current(&_current[_offsets[i]]);
+  for (size_t i = 0; i < _columns.size(); i++)
+    values[i] = load<int64_t>(&_current[_columns_offsets[i]]);
+}
+
+void Regions::begin(const char *name, size_t len)
+{
+  if (!_running)
+    return;
+
+  int s = find(name, len, true);
+  if (_open[s])
+    throw std::runtime_error("Region " + std::string(name, len) +
+                             " is already open");
+  _open[s] = 1;
+  read(&_begin[s * _columns.size()]);
+}
+
+void Regions::end(const char *name, size_t len)
+{
+  if (!_running)
+    return;
+
+  int s = find(name, len, false);
+  if (s < 0 || !_open[s])
+    throw std::runtime_error("Region " + std::string(name, len) +
+                             " is not open");
+  _open[s] = 0;
+
+  read(_now.data());
+
+  char *slot = &_buffer[s * _slot_size] + name_size;
+  const int64_t *begin = &_begin[s * _columns.size()];
+  store<int64_t>(slot, load<int64_t>(slot) + 1);
+  for (size_t i = 0; i < _columns.size(); i++) {
+    char *total = slot + (1 + i) * sizeof(int64_t);
+    store<int64_t>(total, load<int64_t>(total) + _now[i] - begin[i]);
+  }
+}
+
+void Regions::start_accounting()
+{
+  std::fill(_buffer.begin(), _buffer.end(), 0);
+  std::fill(_open.begin(), _open.end(), 0);
+  _running = true;
+}
+
+void Regions::end_accounting()
+{
+  // Regions, which are still open, are not accounted
+  _running = false;
+}
+
+std::vector<std::string> Regions::columns()
+{
+  std::vector<std::string> columns = {"COUNT"};
+  columns.insert(columns.end(), _columns.begin(), _columns.end());
+  return columns;
+}
+
+Fields Regions::fields()
+{
+  json meta = {{"format", "regions"}, {"slots", _slots},
+               {"name_size", name_size}, {"columns", columns()}};
+  return {{_name, Field::BLOB, _buffer.size(), meta.dump()}};
+}
+
+void Regions::pack(char *record)
+{
+  memcpy(record, _buffer.data(), _buffer.size());
+}
+
+CounterMap Regions::emit(const char *records, int ranks, size_t stride)
+{
+  auto columns = this->columns();
+
+  // Ranks may enter different regions, they get zeros for the others
+  CounterMap map;
+  for (int rank = 0; rank < ranks; rank++) {
+    for (size_t s = 0; s < _slots; s++) {
+      const char *slot = records + rank * stride + s * _slot_size;
+      std::string region(slot, strnlen(slot, name_size));
+      if (region.empty())
+        break;
+
+      for (size_t c = 0; c < columns.size(); c++) {
+        auto &values = map[region + ":" + columns[c]];
+        values.resize(ranks, "0");
+        values[rank] = std::to_string(
+          load<int64_t>(slot + name_size + c * sizeof(int64_t)));
+      }
+    }
+  }
+  return map;
+}
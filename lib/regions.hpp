@@ -0,0 +1,56 @@
+#pragma once
+
+#include "counter.hpp"
+
+/**
+ * Values of cumulative counters accumulated over named regions of the
+ * program, marked by interference_region_begin and
+ * interference_region_end. There is a fixed number of slots for
+ * regions and all the memory is allocated in advance, so that marking a
+ * region does not allocate.
+ */
+class Regions : public Counter
+{
+  static const size_t name_size = 32;
+
+  size_t _slots;
+
+  std::vector<Counter *> _counters;
+  // Offset of every counter in _current
+  std::vector<size_t> _offsets;
+  std::vector<char> _current;
+
+  // Accounted fields and their offsets in _current
+  std::vector<std::string> _columns;
+  std::vector<size_t> _columns_offsets;
+
+  // For every slot the name, the number of times the region was
+  // entered and the totals of the columns
+  size_t _slot_size;
+  std::vector<char> _buffer;
+  // For every slot the values at the last begin
+  std::vector<int64_t> _begin;
+  std::vector<char> _open;
+  // Values at the current end
+  std::vector<int64_t> _now;
+  bool _running;
+
+  int find(const char *name, size_t len, bool create);
+  void read(int64_t *values);
+  std::vector<std::string> columns();
+
+public:
+  Regions(const std::string &name, const std::vector<Counter *> &counters,
+          size_t slots);
+
+  // The name is not necessarily terminated by '\0'
+  void begin(const char *name, size_t len);
+  void end(const char *name, size_t len);
+
+  void start_accounting() override;
+  void end_accounting() override;
+
+  Fields fields() override;
+  void pack(char *record) override;
+  CounterMap emit(const char *records, int ranks, size_t stride) override;
+};
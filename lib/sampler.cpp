@@ -0,0 +1,224 @@
+#include <cstring>
+#include <iostream>
+#include <string>
+
+#include <fcntl.h>
+#include <sched.h>
+#include <time.h>
+#include <unistd.h>
+#include <sys/syscall.h>
+
+#include "sampler.hpp"
+
+#include "nlohmann/json.hpp"
+
+using json = nlohmann::json;
+
+static long get_param(const char *name, long def)
+{
+  auto ptr = std::getenv(name);
+  if (!ptr)
+    return def;
+  return std::stol(ptr);
+}
+
+Sampler::Sampler(int ranks, const std::string &name, long period_ms,
+                 const std::vector<PerfCounter *> &perf) :
+  Counter(name),
+  _ranks(ranks),
+  _period(period_ms * 1000),
+  _capacity(get_param("INTERFERENCE_SAMPLE_SIZE", 1024)),
+  _cpu(get_param("INTERFERENCE_SAMPLE_CPU", -1)),
+  _perf(perf),
+  _fields(3),
+  _stop(false),
+  _running(false)
+{
+  if (period_ms <= 0)
+    throw std::runtime_error("INTERFERENCE_SAMPLE_MS should be positive");
+  if (_capacity == 0)
+    throw std::runtime_error("INTERFERENCE_SAMPLE_SIZE should be positive");
+  // Samplers of the ranks of a node get consecutive CPUs
+  if (_cpu >= 0)
+    _cpu += get_indirect_param("INTERFERENCE_LOCALID");
+  if (sched_getaffinity(0, sizeof(_affinity), &_affinity))
+    throw std::runtime_error("Failed to get affinity of the main thread");
+
+  for (auto p : _perf)
+    _fields += p->events().size();
+  _buffer.resize(1 + _capacity * _fields);
+
+  // The sampler runs in its own thread, so it has to ask for the CPU
+  // time and the CPU of the main thread explicitly.
+  if (pthread_getcpuclockid(pthread_self(), &_clock))
+    throw std::runtime_error("Failed to get CPU clock of the main thread");
+
+  auto tid = syscall(SYS_gettid);
+  auto stat = "/proc/self/task/" + std::to_string(tid) + "/stat";
+  _stat_fd = open(stat.c_str(), O_RDONLY);
+  if (_stat_fd == -1)
+    throw std::runtime_error("Failed to open " + stat + ": " +
+                             strerror(errno));
+}
+
+Sampler::~Sampler()
+{
+  stop();
+  close(_stat_fd);
+}
+
+int Sampler::current_cpu()
+{
+  auto len = pread(_stat_fd, _stat, sizeof(_stat) - 1, 0);
+  if (len <= 0)
+    return -1;
+  _stat[len] = '\0';
+
+  // The CPU is the 39th field
+  auto p = stat_field(_stat, 39);
+  if (!p)
+    return -1;
+  return atoi(p);
+}
+
+void Sampler::sample(int64_t *record)
+{
+  auto now = std::chrono::steady_clock::now();
+  record[0] = std::chrono::duration_cast<std::chrono::microseconds>(
+    now - _start).count();
+
+  struct timespec ts;
+  clock_gettime(_clock, &ts);
+  record[1] = ts.tv_sec * 1000000 + ts.tv_nsec / 1000;
+
+  record[2] = current_cpu();
+
+  record += 3;
+  for (auto p : _perf) {
+    p->read_values(record);
+    record += p->events().size();
+  }
+}
+
+void Sampler::loop()
+{
+  int64_t &count = _buffer[0];
+  auto next = _start + _period;
+
+  std::unique_lock<std::mutex> lock(_mutex);
+  while (!_wakeup.wait_until(lock, next, [this] { return _stop; })) {
+    sample(&_buffer[1 + (count % _capacity) * _fields]);
+    count++;
+
+    // Skip the periods we missed instead of catching up
+    auto now = std::chrono::steady_clock::now();
+    next += _period;
+    if (next < now)
+      next += (now - next) / _period * _period + _period;
+  }
+}
+
+void *Sampler::run(void *sampler)
+{
+  static_cast<Sampler *>(sampler)->loop();
+  return nullptr;
+}
+
+void Sampler::start_accounting()
+{
+  _start = std::chrono::steady_clock::now();
+  _stop = false;
+
+  // The rank may be pinned and run under SCHED_FIFO by now. The sampler
+  // should neither share its CPU nor its real-time priority, so it runs
+  // under SCHED_OTHER on the CPUs the rank had before pinning, unless
+  // it gets a CPU of its own.
+  pthread_attr_t attr;
+  struct sched_param param;
+  memset(&param, 0, sizeof(param));
+  pthread_attr_init(&attr);
+  pthread_attr_setinheritsched(&attr, PTHREAD_EXPLICIT_SCHED);
+  pthread_attr_setschedpolicy(&attr, SCHED_OTHER);
+  pthread_attr_setschedparam(&attr, &param);
+  int ret = pthread_create(&_thread, &attr, &Sampler::run, this);
+  pthread_attr_destroy(&attr);
+  if (ret)
+    throw std::runtime_error(std::string("Failed to start the sampler: ") +
+                             strerror(ret));
+  _running = true;
+
+  cpu_set_t cpu_set = _affinity;
+  if (_cpu >= 0) {
+    CPU_ZERO(&cpu_set);
+    CPU_SET(_cpu, &cpu_set);
+  }
+  ret = pthread_setaffinity_np(_thread, sizeof(cpu_set), &cpu_set);
+  if (ret)
+    std::cerr << "interference: failed to set affinity of the sampler: "
+              << strerror(ret) << std::endl;
+}
+
+void Sampler::stop()
+{
+  if (!_running)
+    return;
+  {
+    std::lock_guard<std::mutex> lock(_mutex);
+    _stop = true;
+  }
+  _wakeup.notify_one();
+  pthread_join(_thread, nullptr);
+  _running = false;
+}
+
+void Sampler::end_accounting()
+{
+  stop();
+}
+
+std::vector<std::string> Sampler::columns()
+{
+  std::vector<std::string> columns = {"TIME_US", "CPUTIME_US", "CPU"};
+  for (auto p : _perf)
+    columns.insert(columns.end(), p->events().begin(), p->events().end());
+  return columns;
+}
+
+Fields Sampler::fields()
+{
+  // The number of samples followed by the ring of samples
+  json meta = {{"format", "samples"}, {"capacity", _capacity},
+               {"columns", columns()}};
+  return {{_name, Field::BLOB, _buffer.size() * sizeof(int64_t), meta.dump()}};
+}
+
+void Sampler::pack(char *record)
+{
+  memcpy(record, _buffer.data(), _buffer.size() * sizeof(int64_t));
+}
+
+CounterMap Sampler::emit(const char *records, int ranks, size_t stride)
+{
+  auto columns = this->columns();
+
+  CounterMap map;
+  std::vector<std::string> str_values;
+  for (int rank = 0; rank < ranks; rank++) {
+    const char *buffer = records + rank * stride;
+    int64_t count = load<int64_t>(buffer);
+    int64_t kept = std::min<int64_t>(count, _capacity);
+
+    json j;
+    j["LOST"] = count - kept;
+    for (size_t f = 0; f < _fields; f++) {
+      std::vector<int64_t> column;
+      for (int64_t s = count - kept; s < count; s++)
+        column.push_back(load<int64_t>(
+          buffer + (1 + (s % _capacity) * _fields + f) * sizeof(int64_t)));
+      j[columns[f]] = column;
+    }
+    str_values.push_back(j.dump());
+  }
+  map[_name] = str_values;
+  return map;
+}
@@ -0,0 +1,63 @@
+#pragma once
+
+#include <atomic>
+#include <chrono>
+#include <condition_variable>
+#include <mutex>
+
+#include <pthread.h>
+
+#include "counter.hpp"
+#include "perf.hpp"
+
+/**
+ * Periodically records the state of the main thread into a ring
+ * buffer. A sample consists of the time since the start, CPU time of
+ * the main thread, the CPU the main thread runs on and current values
+ * of perf counters. All the memory is allocated before the sampling
+ * starts.
+ */
+class Sampler : public Counter
+{
+  int _ranks;
+  std::chrono::microseconds _period;
+  size_t _capacity;
+  int _cpu;
+  // Affinity of the rank before it gets pinned
+  cpu_set_t _affinity;
+
+  std::vector<PerfCounter *> _perf;
+  size_t _fields;
+  // First element is the number of taken samples, then the ring
+  std::vector<int64_t> _buffer;
+
+  clockid_t _clock;
+  int _stat_fd;
+  char _stat[1024];
+
+  std::chrono::steady_clock::time_point _start;
+  bool _stop;
+  std::mutex _mutex;
+  std::condition_variable _wakeup;
+  pthread_t _thread;
+  bool _running;
+
+  static void *run(void *sampler);
+  void loop();
+  void stop();
+  void sample(int64_t *record);
+  int current_cpu();
+  std::vector<std::string> columns();
+
+public:
+  Sampler(int ranks, const std::string &name, long period_ms,
+          const std::vector<PerfCounter *> &perf);
+  ~Sampler();
+
+  void start_accounting() override;
+  void end_accounting() override;
+
+  Fields fields() override;
+  void pack(char *record) override;
+  CounterMap emit(const char *records, int ranks, size_t stride) override;
+};
@@ -0,0 +1,281 @@
+/*
+ * C wrappers expanded from wrappers.w. The build regenerates this file
+ * with wrap.py (lib/wrap), if the submodule is checked out. Keep it in
+ * sync with wrappers.w.
+ */
+#include <mpi.h>
+#include <stdint.h>
+
+#ifndef _EXTERN_C_
+#ifdef __cplusplus
+#define _EXTERN_C_ extern "C"
+#else /* __cplusplus */
+#define _EXTERN_C_
+#endif /* __cplusplus */
+#endif /* _EXTERN_C_ */
+
+#include "interference.h"
+#include "mpistats.h"
+
+static uint64_t bytes(int count, MPI_Datatype type)
+{
+  int size;
+
+  if (!mpistats_enabled)
+    return 0;
+  PMPI_Type_size(type, &size);
+  return (uint64_t)count * size;
+}
+
+/* ================== C Wrappers for MPI_Init ================== */
+_EXTERN_C_ int PMPI_Init(int *argc, char ***argv);
+_EXTERN_C_ int MPI_Init(int *argc, char ***argv) {
+  int _wrap_py_return_val = 0;
+  _wrap_py_return_val = PMPI_Init(argc, argv);
+  interference_start();
+  return _wrap_py_return_val;
+}
+
+/* ================== C Wrappers for MPI_Finalize ================== */
+_EXTERN_C_ int PMPI_Finalize(void);
+_EXTERN_C_ int MPI_Finalize(void) {
+  int _wrap_py_return_val = 0;
+  interference_end();
+  _wrap_py_return_val = PMPI_Finalize();
+  return _wrap_py_return_val;
+}
+
+/* ================== C Wrappers for MPI_Send ================== */
+_EXTERN_C_ int PMPI_Send(const void *buf, int count, MPI_Datatype datatype, int dest, int tag, MPI_Comm comm);
+_EXTERN_C_ int MPI_Send(const void *buf, int count, MPI_Datatype datatype, int dest, int tag, MPI_Comm comm) {
+  int _wrap_py_return_val = 0;
+  uint64_t start = mpistats_begin();
+  _wrap_py_return_val = PMPI_Send(buf, count, datatype, dest, tag, comm);
+  mpistats_end(MPISTATS_P2P, MPISTATS_OP(MPI_Send), start,
+               bytes(count, datatype));
+  mpistats_mark(MPISTATS_OP(MPI_Send));
+  return _wrap_py_return_val;
+}
+
+/* ================== C Wrappers for MPI_Ssend ================== */
+_EXTERN_C_ int PMPI_Ssend(const void *buf, int count, MPI_Datatype datatype, int dest, int tag, MPI_Comm comm);
+_EXTERN_C_ int MPI_Ssend(const void *buf, int count, MPI_Datatype datatype, int dest, int tag, MPI_Comm comm) {
+  int _wrap_py_return_val = 0;
+  uint64_t start = mpistats_begin();
+  _wrap_py_return_val = PMPI_Ssend(buf, count, datatype, dest, tag, comm);
+  mpistats_end(MPISTATS_P2P, MPISTATS_OP(MPI_Ssend), start,
+               bytes(count, datatype));
+  mpistats_mark(MPISTATS_OP(MPI_Ssend));
+  return _wrap_py_return_val;
+}
+
+/* ================== C Wrappers for MPI_Bsend ================== */
+_EXTERN_C_ int PMPI_Bsend(const void *buf, int count, MPI_Datatype datatype, int dest, int tag, MPI_Comm comm);
+_EXTERN_C_ int MPI_Bsend(const void *buf, int count, MPI_Datatype datatype, int dest, int tag, MPI_Comm comm) {
+  int _wrap_py_return_val = 0;
+  uint64_t start = mpistats_begin();
+  _wrap_py_return_val = PMPI_Bsend(buf, count, datatype, dest, tag, comm);
+  mpistats_end(MPISTATS_P2P, MPISTATS_OP(MPI_Bsend), start,
+               bytes(count, datatype));
+  mpistats_mark(MPISTATS_OP(MPI_Bsend));
+  return _wrap_py_return_val;
+}
+
+/* ================== C Wrappers for MPI_Rsend ================== */
+_EXTERN_C_ int PMPI_Rsend(const void *buf, int count, MPI_Datatype datatype, int dest, int tag, MPI_Comm comm);
+_EXTERN_C_ int MPI_Rsend(const void *buf, int count, MPI_Datatype datatype, int dest, int tag, MPI_Comm comm) {
+  int _wrap_py_return_val = 0;
+  uint64_t start = mpistats_begin();
+  _wrap_py_return_val = PMPI_Rsend(buf, count, datatype, dest, tag, comm);
+  mpistats_end(MPISTATS_P2P, MPISTATS_OP(MPI_Rsend), start,
+               bytes(count, datatype));
+  mpistats_mark(MPISTATS_OP(MPI_Rsend));
+  return _wrap_py_return_val;
+}
+
+/* ================== C Wrappers for MPI_Isend ================== */
+_EXTERN_C_ int PMPI_Isend(const void *buf, int count, MPI_Datatype datatype, int dest, int tag, MPI_Comm comm, MPI_Request *request);
+_EXTERN_C_ int MPI_Isend(const void *buf, int count, MPI_Datatype datatype, int dest, int tag, MPI_Comm comm, MPI_Request *request) {
+  int _wrap_py_return_val = 0;
+  uint64_t start = mpistats_begin();
+  _wrap_py_return_val = PMPI_Isend(buf, count, datatype, dest, tag, comm, request);
+  mpistats_end(MPISTATS_P2P, MPISTATS_OP(MPI_Isend), start,
+               bytes(count, datatype));
+  mpistats_mark(MPISTATS_OP(MPI_Isend));
+  return _wrap_py_return_val;
+}
+
+/* ================== C Wrappers for MPI_Issend ================== */
+_EXTERN_C_ int PMPI_Issend(const void *buf, int count, MPI_Datatype datatype, int dest, int tag, MPI_Comm comm, MPI_Request *request);
+_EXTERN_C_ int MPI_Issend(const void *buf, int count, MPI_Datatype datatype, int dest, int tag, MPI_Comm comm, MPI_Request *request) {
+  int _wrap_py_return_val = 0;
+  uint64_t start = mpistats_begin();
+  _wrap_py_return_val = PMPI_Issend(buf, count, datatype, dest, tag, comm, request);
+  mpistats_end(MPISTATS_P2P, MPISTATS_OP(MPI_Issend), start,
+               bytes(count, datatype));
+  mpistats_mark(MPISTATS_OP(MPI_Issend));
+  return _wrap_py_return_val;
+}
+
+/* ================== C Wrappers for MPI_Recv ================== */
+_EXTERN_C_ int PMPI_Recv(void *buf, int count, MPI_Datatype datatype, int source, int tag, MPI_Comm comm, MPI_Status *status);
+_EXTERN_C_ int MPI_Recv(void *buf, int count, MPI_Datatype datatype, int source, int tag, MPI_Comm comm, MPI_Status *status) {
+  int _wrap_py_return_val = 0;
+  uint64_t start = mpistats_begin();
+  _wrap_py_return_val = PMPI_Recv(buf, count, datatype, source, tag, comm, status);
+  mpistats_end(MPISTATS_P2P, MPISTATS_OP(MPI_Recv), start,
+               bytes(count, datatype));
+  mpistats_mark(MPISTATS_OP(MPI_Recv));
+  return _wrap_py_return_val;
+}
+
+/* ================== C Wrappers for MPI_Irecv ================== */
+_EXTERN_C_ int PMPI_Irecv(void *buf, int count, MPI_Datatype datatype, int source, int tag, MPI_Comm comm, MPI_Request *request);
+_EXTERN_C_ int MPI_Irecv(void *buf, int count, MPI_Datatype datatype, int source, int tag, MPI_Comm comm, MPI_Request *request) {
+  int _wrap_py_return_val = 0;
+  uint64_t start = mpistats_begin();
+  _wrap_py_return_val = PMPI_Irecv(buf, count, datatype, source, tag, comm, request);
+  mpistats_end(MPISTATS_P2P, MPISTATS_OP(MPI_Irecv), start,
+               bytes(count, datatype));
+  mpistats_mark(MPISTATS_OP(MPI_Irecv));
+  return _wrap_py_return_val;
+}
+
+/* ================== C Wrappers for MPI_Bcast ================== */
+_EXTERN_C_ int PMPI_Bcast(void *buffer, int count, MPI_Datatype datatype, int root, MPI_Comm comm);
+_EXTERN_C_ int MPI_Bcast(void *buffer, int count, MPI_Datatype datatype, int root, MPI_Comm comm) {
+  int _wrap_py_return_val = 0;
+  uint64_t start = mpistats_begin();
+  _wrap_py_return_val = PMPI_Bcast(buffer, count, datatype, root, comm);
+  mpistats_end(MPISTATS_COLL, MPISTATS_OP(MPI_Bcast), start,
+               bytes(count, datatype));
+  mpistats_mark(MPISTATS_OP(MPI_Bcast));
+  return _wrap_py_return_val;
+}
+
+/* ================== C Wrappers for MPI_Reduce ================== */
+_EXTERN_C_ int PMPI_Reduce(const void *sendbuf, void *recvbuf, int count, MPI_Datatype datatype, MPI_Op op, int root, MPI_Comm comm);
+_EXTERN_C_ int MPI_Reduce(const void *sendbuf, void *recvbuf, int count, MPI_Datatype datatype, MPI_Op op, int root, MPI_Comm comm) {
+  int _wrap_py_return_val = 0;
+  uint64_t start = mpistats_begin();
+  _wrap_py_return_val = PMPI_Reduce(sendbuf, recvbuf, count, datatype, op, root, comm);
+  mpistats_end(MPISTATS_COLL, MPISTATS_OP(MPI_Reduce), start,
+               bytes(count, datatype));
+  mpistats_mark(MPISTATS_OP(MPI_Reduce));
+  return _wrap_py_return_val;
+}
+
+/* ================== C Wrappers for MPI_Allreduce ================== */
+_EXTERN_C_ int PMPI_Allreduce(const void *sendbuf, void *recvbuf, int count, MPI_Datatype datatype, MPI_Op op, MPI_Comm comm);
+_EXTERN_C_ int MPI_Allreduce(const void *sendbuf, void *recvbuf, int count, MPI_Datatype datatype, MPI_Op op, MPI_Comm comm) {
+  int _wrap_py_return_val = 0;
+  uint64_t start = mpistats_begin();
+  _wrap_py_return_val = PMPI_Allreduce(sendbuf, recvbuf, count, datatype, op, comm);
+  mpistats_end(MPISTATS_COLL, MPISTATS_OP(MPI_Allreduce), start,
+               bytes(count, datatype));
+  mpistats_mark(MPISTATS_OP(MPI_Allreduce));
+  return _wrap_py_return_val;
+}
+
+/* ================== C Wrappers for MPI_Alltoall ================== */
+_EXTERN_C_ int PMPI_Alltoall(const void *sendbuf, int sendcount, MPI_Datatype sendtype, void *recvbuf, int recvcount, MPI_Datatype recvtype, MPI_Comm comm);
+_EXTERN_C_ int MPI_Alltoall(const void *sendbuf, int sendcount, MPI_Datatype sendtype, void *recvbuf, int recvcount, MPI_Datatype recvtype, MPI_Comm comm) {
+  int _wrap_py_return_val = 0;
+  uint64_t start = mpistats_begin();
+  _wrap_py_return_val = PMPI_Alltoall(sendbuf, sendcount, sendtype, recvbuf, recvcount, recvtype, comm);
+  mpistats_end(MPISTATS_COLL, MPISTATS_OP(MPI_Alltoall), start,
+               bytes(sendcount, sendtype));
+  mpistats_mark(MPISTATS_OP(MPI_Alltoall));
+  return _wrap_py_return_val;
+}
+
+/* ================== C Wrappers for MPI_Allgather ================== */
+_EXTERN_C_ int PMPI_Allgather(const void *sendbuf, int sendcount, MPI_Datatype sendtype, void *recvbuf, int recvcount, MPI_Datatype recvtype, MPI_Comm comm);
+_EXTERN_C_ int MPI_Allgather(const void *sendbuf, int sendcount, MPI_Datatype sendtype, void *recvbuf, int recvcount, MPI_Datatype recvtype, MPI_Comm comm) {
+  int _wrap_py_return_val = 0;
+  uint64_t start = mpistats_begin();
+  _wrap_py_return_val = PMPI_Allgather(sendbuf, sendcount, sendtype, recvbuf, recvcount, recvtype, comm);
+  mpistats_end(MPISTATS_COLL, MPISTATS_OP(MPI_Allgather), start,
+               bytes(sendcount, sendtype));
+  mpistats_mark(MPISTATS_OP(MPI_Allgather));
+  return _wrap_py_return_val;
+}
+
+/* ================== C Wrappers for MPI_Gather ================== */
+_EXTERN_C_ int PMPI_Gather(const void *sendbuf, int sendcount, MPI_Datatype sendtype, void *recvbuf, int recvcount, MPI_Datatype recvtype, int root, MPI_Comm comm);
+_EXTERN_C_ int MPI_Gather(const void *sendbuf, int sendcount, MPI_Datatype sendtype, void *recvbuf, int recvcount, MPI_Datatype recvtype, int root, MPI_Comm comm) {
+  int _wrap_py_return_val = 0;
+  uint64_t start = mpistats_begin();
+  _wrap_py_return_val = PMPI_Gather(sendbuf, sendcount, sendtype, recvbuf, recvcount, recvtype, root, comm);
+  mpistats_end(MPISTATS_COLL, MPISTATS_OP(MPI_Gather), start,
+               bytes(sendcount, sendtype));
+  mpistats_mark(MPISTATS_OP(MPI_Gather));
+  return _wrap_py_return_val;
+}
+
+/* ================== C Wrappers for MPI_Scatter ================== */
+_EXTERN_C_ int PMPI_Scatter(const void *sendbuf, int sendcount, MPI_Datatype sendtype, void *recvbuf, int recvcount, MPI_Datatype recvtype, int root, MPI_Comm comm);
+_EXTERN_C_ int MPI_Scatter(const void *sendbuf, int sendcount, MPI_Datatype sendtype, void *recvbuf, int recvcount, MPI_Datatype recvtype, int root, MPI_Comm comm) {
+  int _wrap_py_return_val = 0;
+  uint64_t start = mpistats_begin();
+  _wrap_py_return_val = PMPI_Scatter(sendbuf, sendcount, sendtype, recvbuf, recvcount, recvtype, root, comm);
+  mpistats_end(MPISTATS_COLL, MPISTATS_OP(MPI_Scatter), start,
+               bytes(sendcount, sendtype));
+  mpistats_mark(MPISTATS_OP(MPI_Scatter));
+  return _wrap_py_return_val;
+}
+
+/* ================== C Wrappers for MPI_Barrier ================== */
+_EXTERN_C_ int PMPI_Barrier(MPI_Comm comm);
+_EXTERN_C_ int MPI_Barrier(MPI_Comm comm) {
+  int _wrap_py_return_val = 0;
+  uint64_t start = mpistats_begin();
+  _wrap_py_return_val = PMPI_Barrier(comm);
+  mpistats_end(MPISTATS_COLL, MPISTATS_OP(MPI_Barrier), start, 0);
+  mpistats_mark(MPISTATS_OP(MPI_Barrier));
+  return _wrap_py_return_val;
+}
+
+/* ================== C Wrappers for MPI_Wait ================== */
+_EXTERN_C_ int PMPI_Wait(MPI_Request *request, MPI_Status *status);
+_EXTERN_C_ int MPI_Wait(MPI_Request *request, MPI_Status *status) {
+  int _wrap_py_return_val = 0;
+  uint64_t start = mpistats_begin();
+  _wrap_py_return_val = PMPI_Wait(request, status);
+  mpistats_end(MPISTATS_WAIT, MPISTATS_OP(MPI_Wait), start, 0);
+  mpistats_mark(MPISTATS_OP(MPI_Wait));
+  return _wrap_py_return_val;
+}
+
+/* ================== C Wrappers for MPI_Waitall ================== */
+_EXTERN_C_ int PMPI_Waitall(int count, MPI_Request array_of_requests[], MPI_Status array_of_statuses[]);
+_EXTERN_C_ int MPI_Waitall(int count, MPI_Request array_of_requests[], MPI_Status array_of_statuses[]) {
+  int _wrap_py_return_val = 0;
+  uint64_t start = mpistats_begin();
+  _wrap_py_return_val = PMPI_Waitall(count, array_of_requests, array_of_statuses);
+  mpistats_end(MPISTATS_WAIT, MPISTATS_OP(MPI_Waitall), start, 0);
+  mpistats_mark(MPISTATS_OP(MPI_Waitall));
+  return _wrap_py_return_val;
+}
+
+/* ================== C Wrappers for MPI_Waitany ================== */
+_EXTERN_C_ int PMPI_Waitany(int count, MPI_Request array_of_requests[], int *indx, MPI_Status *status);
+_EXTERN_C_ int MPI_Waitany(int count, MPI_Request array_of_requests[], int *indx, MPI_Status *status) {
+  int _wrap_py_return_val = 0;
+  uint64_t start = mpistats_begin();
+  _wrap_py_return_val = PMPI_Waitany(count, array_of_requests, indx, status);
+  mpistats_end(MPISTATS_WAIT, MPISTATS_OP(MPI_Waitany), start, 0);
+  mpistats_mark(MPISTATS_OP(MPI_Waitany));
+  return _wrap_py_return_val;
+}
+
+/* ================== C Wrappers for MPI_Waitsome ================== */
+_EXTERN_C_ int PMPI_Waitsome(int incount, MPI_Request array_of_requests[], int *outcount, int array_of_indices[], MPI_Status array_of_statuses[]);
+_EXTERN_C_ int MPI_Waitsome(int incount, MPI_Request array_of_requests[], int *outcount, int array_of_indices[], MPI_Status array_of_statuses[]) {
+  int _wrap_py_return_val = 0;
+  uint64_t start = mpistats_begin();
+  _wrap_py_return_val = PMPI_Waitsome(incount, array_of_requests, outcount, array_of_indices, array_of_statuses);
+  mpistats_end(MPISTATS_WAIT, MPISTATS_OP(MPI_Waitsome), start, 0);
+  mpistats_mark(MPISTATS_OP(MPI_Waitsome));
+  return _wrap_py_return_val;
+}
@@ -1,4 +1,15 @@
 #include "interference.h"
+#include "mpistats.h"
+
+static uint64_t bytes(int count, MPI_Datatype type)
+{
+  int size;
+
+  if (!mpistats_enabled)
+    return 0;
+  PMPI_Type_size(type, &size);
+  return (uint64_t)count * size;
+}
 
 {{fn init MPI_Init}}
   {{callfn}}
@@ -8,4 +19,50 @@
 {{fn final MPI_Finalize}}
   interference_end();
   {{callfn}}
+{{endfn}}
+
+{{fn p2p MPI_Send MPI_Ssend MPI_Bsend MPI_Rsend MPI_Isend MPI_Issend MPI_Recv MPI_Irecv}}
+  uint64_t start = mpistats_begin();
+  {{callfn}}
+  mpistats_end(MPISTATS_P2P, MPISTATS_OP({{fn_name}}), start,
+               bytes({{1}}, {{2}}));
+  mpistats_mark(MPISTATS_OP({{fn_name}}));
+{{endfn}}
+
+{{fn bcast MPI_Bcast}}
+  uint64_t start = mpistats_begin();
+  {{callfn}}
+  mpistats_end(MPISTATS_COLL, MPISTATS_OP({{fn_name}}), start,
+               bytes({{1}}, {{2}}));
+  mpistats_mark(MPISTATS_OP({{fn_name}}));
+{{endfn}}
+
+{{fn reduce MPI_Reduce MPI_Allreduce}}
+  uint64_t start = mpistats_begin();
+  {{callfn}}
+  mpistats_end(MPISTATS_COLL, MPISTATS_OP({{fn_name}}), start,
+               bytes({{2}}, {{3}}));
+  mpistats_mark(MPISTATS_OP({{fn_name}}));
+{{endfn}}
+
+{{fn coll MPI_Alltoall MPI_Allgather MPI_Gather MPI_Scatter}}
+  uint64_t start = mpistats_begin();
+  {{callfn}}
+  mpistats_end(MPISTATS_COLL, MPISTATS_OP({{fn_name}}), start,
+               bytes({{1}}, {{2}}));
+  mpistats_mark(MPISTATS_OP({{fn_name}}));
+{{endfn}}
+
+{{fn barrier MPI_Barrier}}
+  uint64_t start = mpistats_begin();
+  {{callfn}}
+  mpistats_end(MPISTATS_COLL, MPISTATS_OP({{fn_name}}), start, 0);
+  mpistats_mark(MPISTATS_OP({{fn_name}}));
+{{endfn}}
+
+{{fn wait MPI_Wait MPI_Waitall MPI_Waitany MPI_Waitsome}}
+  uint64_t start = mpistats_begin();
+  {{callfn}}
+  mpistats_end(MPISTATS_WAIT, MPISTATS_OP({{fn_name}}), start, 0);
+  mpistats_mark(MPISTATS_OP({{fn_name}}));
 {{endfn}}
\ No newline at end of file
@@ -88,7 +88,6 @@ class Cosel(manager.Machine):
         self.mpilib = OpenMPI()
 
         self.runs = (i for i in range(3))
-        self.benchmarks = self.group.benchmarks
 
         self.nodelist = self.get_nodelist()
         self.hostfile_dir = self.env['HOME'] + '/hostfiles'
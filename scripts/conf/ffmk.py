@@ -35,8 +35,8 @@ class Ffmk(manager.Machine):
                 np = np_func(nodes, oversub)
             # HACK END
 
-            return self.modules_load + '; cd {} ;' \
-                ' make {} NPROCS={} CLASS={}'.format(wd, prog, np, size)
+            return 'cd {} ; make {} NPROCS={} CLASS={}'.format(
+                wd, prog, np, size)
 
         def np_func(nodes, oversub):
             return nodes * oversub * cpu_per_node
@@ -101,7 +101,6 @@ class Ffmk(manager.Machine):
                                                   'cache_misses',])
 
         self.runs = (i for i in range(3))
-        self.benchmarks = self.group.benchmarks
 
         self.nodelist = self.get_nodelist()
 
@@ -113,8 +112,7 @@ class Ffmk(manager.Machine):
     def create_context(self, machine, cfg):
         class FfmkContext(manager.Context):
             def __enter__(self):
-                nodes = self.machine.nodelist[:self.bench.nodes]
-                self.nodestr = ",".join(nodes)
+                self.nodestr = ",".join(self.nodelist)
                 return super().__enter__()
 
         return FfmkContext(machine, cfg)
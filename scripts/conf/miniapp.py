@@ -1,3 +1,5 @@
+import os
+
 import manager
 from numpy import prod
 
@@ -13,8 +15,19 @@ class Miniapp(manager.Benchmark):
 
         self.name = self.tmpl.format_map(self.SafeDict(**self.__dict__))
 
+    def binary(self):
+        return os.path.join(self.wd, self.prog)
+
+    def source_dirs(self):
+        # Some miniapps, e.g. CoMD, build into bin/ from sources next
+        # to it
+        wd = os.path.normpath(self.wd)
+        if os.path.basename(wd) == 'bin':
+            return [os.path.dirname(wd)]
+        return [wd]
+
     def __eq__(self, other):
-        return ((self.prog == other.prog) and (self.np == self.np) and
+        return ((self.prog == other.prog) and (self.np == other.np) and
                 (self.size == other.size) and (self.wd == other.wd))
 
     def __hash__(self):
@@ -9,7 +9,7 @@ class Mvapich(manager.Lib):
         else:
             mpiexec = kwargs['mpiexec']
 
-        super().__init__(name='openmpi', **kwargs)
+        super().__init__(name='mvapich', **kwargs)
         if mpiexec == 'mpirun':
             self.mpiexec = 'mpirun'
             self.mpiexec_param = ''
@@ -50,6 +50,6 @@ class Mvapich(manager.Lib):
         parameters = " ".join([hostfile, self.mpiexec_np,
                                str(context.bench.np),
                                mpiexec_param])
-        command = "{} ; taskset 0xFFFFFFFF {} {} {} ./bin/{}"
-        return command.format(context.machine.modules_load, self.mpiexec, parameters,
+        command = "taskset 0xFFFFFFFF {} {} {} ./bin/{}"
+        return command.format(self.mpiexec, parameters,
                               preload, context.bench.name)
@@ -1,3 +1,5 @@
+import os
+
 import manager
 
 
@@ -9,8 +11,17 @@ class Npb(manager.Benchmark):
 
         self.name = "{}.{}.{}".format(self.prog, self.size, self.np)
 
+    def source_dirs(self):
+        return [os.path.join(self.wd, d)
+                for d in (self.prog.upper(), 'common', 'config', 'sys')]
+
+    def sources(self):
+        # npbparams.h is regenerated for every class and process count
+        return [s for s in super().sources()
+                if os.path.basename(s) != 'npbparams.h']
+
     def __eq__(self, other):
-        return ((self.prog == other.prog) and (self.np == self.np) and
+        return ((self.prog == other.prog) and (self.np == other.np) and
                 (self.size == other.size) and (self.wd == other.wd))
 
     def __hash__(self):
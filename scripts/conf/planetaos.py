@@ -85,7 +85,6 @@ class PlanetaOS(manager.Machine):
         self.mpilib = OpenMPI()
 
         self.runs = (i for i in range(3))
-        self.benchmarks = self.group.benchmarks
 
         self.nodelist = self.get_nodelist()
         self.hostfile_dir = self.env['HOME'] + '/hostfiles'
@@ -57,7 +57,6 @@ class PlanetaOS_AMPI(manager.Machine):
         self.prefix = 'INTERFERENCE'
 
         self.runs = (i for i in range(3))
-        self.benchmarks = self.group.benchmarks
 
         self.nodelist = self.get_nodelist()
         self.hostfile_dir = self.env['HOME'] + '/hostfiles'
@@ -31,8 +31,8 @@ class Taurus(manager.Machine):
                 np = np_func(nodes, oversub)
             # HACK END
 
-            return self.modules_load + '; cd {} ;' \
-                ' make {} NPROCS={} CLASS={}'.format(wd, prog, np, size)
+            return 'cd {} ; make {} NPROCS={} CLASS={}'.format(
+                wd, prog, np, size)
 
         def np_func(nodes, oversub):
             return nodes * oversub * cpu_per_node
@@ -92,7 +92,6 @@ class Taurus(manager.Machine):
         self.env['INTERFERENCE_PERF'] = 'instructions,cache_references,cache_misses,migrations,page_faults,context_switches'
 
         self.runs = (i for i in range(3))
-        self.benchmarks = self.group.benchmarks
 
         self.nodelist = self.get_nodelist()
         self.hostfile_dir = os.environ['HOME'] + '/hostfiles'
@@ -104,8 +103,7 @@ class Taurus(manager.Machine):
             def __enter__(self):
                 self.hostfile = self.create_file(
                     self.machine.hostfile_dir, 'hostfile')
-                self.hostfile.f.write(
-                    "\n".join(self.machine.nodelist[:self.bench.nodes]) + '\n')
+                self.hostfile.f.write("\n".join(self.nodelist) + '\n')
 
                 self.nodestr = self.hostfile.path
 
@@ -8,6 +8,9 @@ from .miniapp import Miniapp
 
 
 class Taurus_AMPI(manager.Machine):
+    # srun picks the nodes itself
+    exclusive = True
+
     def __init__(self, args):
         self.env = os.environ.copy()
 
@@ -110,7 +113,6 @@ class Taurus_AMPI(manager.Machine):
         self.prefix = 'INTERFERENCE'
 
         self.runs = (i for i in range(3))
-        self.benchmarks = self.group.benchmarks
 
         self.nodelist = self.get_nodelist()
         self.hostfile_dir = self.env['HOME'] + '/hostfiles'
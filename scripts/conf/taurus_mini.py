@@ -35,7 +35,7 @@ class Taurus_Mini(manager.Machine):
             return decomposition + problem_size
 
         self.modules_load = 'source {}/mini.env'.format(base)
-        compile_command = self.modules_load + '; cd ../src-mpi ; make'
+        compile_command = 'cd ../src-mpi ; make'
         tmpl = './{prog} {size_param}'
         comd_param = {
             'prog': ("CoMD-mpi",),
@@ -51,7 +51,7 @@ class Taurus_Mini(manager.Machine):
             manager.BenchGroup(Miniapp, **comd_param, **fullsub_param) + \
             manager.BenchGroup(Miniapp, **comd_param, **oversub_param)
 
-        compile_command = self.modules_load + '; make lassen_mpi'
+        compile_command = 'make lassen_mpi'
 
         def lassen_size_param(size, nodes, max_nodes, oversub):
             np = np_func(nodes, oversub)
@@ -80,7 +80,7 @@ class Taurus_Mini(manager.Machine):
         def lulesh_np_func(nodes):
             return {1: 8, 2: 27, 4: 64, 8: 125, 16: 343}[nodes]
 
-        compile_command = self.modules_load + '; make'
+        compile_command = 'make'
         lulesh_param = {
             'prog': ("lulesh2.0",),
             'size_param': ("-i 300 -c 10 -b 3",),
@@ -113,7 +113,6 @@ class Taurus_Mini(manager.Machine):
         self.prefix = 'INTERFERENCE'
 
         self.runs = (i for i in range(3))
-        self.benchmarks = self.group.benchmarks
 
         self.nodelist = self.get_nodelist()
         self.hostfile_dir = self.env['HOME'] + '/hostfiles'
@@ -134,9 +133,9 @@ class Taurus_Mini(manager.Machine):
                                self.mpiexec_np, str(context.bench.np),
                                '-ssh',
                                '-export-all'])
-        command = "{} ; taskset 0xFFFFFFFF {} {} {} ./{}"
+        command = "taskset 0xFFFFFFFF {} {} {} ./{}"
         lib = self.preload.format(self.get_lib())
-        return command.format(self.modules_load, self.mpiexec, parameters,
+        return command.format(self.mpiexec, parameters,
                               lib, context.bench.name)
 
     def correct_guess():
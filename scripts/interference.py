@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
 
+import os
+import sys
 from argparse import ArgumentParser
 
 from manager import *
@@ -10,9 +12,15 @@ def parse_args():
                         help='Which configuration use to run benchmarks',
                         default='guess')
     parser.add_argument('--mpi',
-                        help='Which mpi library to work with',
+                        help='Which mpi library to work with. Prepare accepts '
+                        'a comma separated list',
                         default='default')
-    parser.set_defaults(comm=None)
+    parser.add_argument('-j', '--jobs',
+                        help='How many compilation jobs to run concurrently. '
+                        'By default benchmarks are compiled one at a time '
+                        'and the library with a job per CPU',
+                        type=int)
+    parser.set_defaults(comm=None, filter=EmptyFilter(), design=None)
 
     commands = parser.add_subparsers(help='Choose mode of operation', dest='comm')
 
@@ -23,6 +31,11 @@ def parse_args():
                             type=str,
                             dest='out',
                             required=True)
+    run_parser.add_argument('--resume',
+                            help='Keep results already present in the output'
+                            ' and run only the missing configurations.',
+                            action='store_true',
+                            default=False)
     run_parser.add_argument('--cache',
                             help='Cache compilation results, use cache if possible.',
                             action='store_true',
@@ -32,17 +45,119 @@ def parse_args():
                             type=Filter.create_filter,
                             default=EmptyFilter(),
                             dest='filter')
+    run_parser.add_argument('--design',
+                            help='Run a subset of the benchmark matrix: full,'
+                            ' random:N, lhs:N or fractional[:K].',
+                            type=Design.create_design,
+                            default=None)
+    run_parser.add_argument('--seed',
+                            help='Seed for random designs.',
+                            type=int,
+                            default=0)
     run_parser.add_argument('--writer',
                             help='Output format.',
                             default='csv',
-                            choices=[CsvWriter, JsonWriter],
+                            choices=[CsvWriter, JsonWriter, NdjsonWriter, NpzWriter],
                             type=Writer.create_writer)
     run_parser.add_argument('--run-order',
-                            help='Benchmarks of the same group should run consecutively or interleaving each other.',
+                            help='Benchmarks of the same group should run consecutively or interleaving each other.'
+                            ' longest runs consecutively, longest benchmarks first (needs --history).',
                             default='interleave',
-                            choices=['interleave', 'consecutive'],
+                            choices=['interleave', 'consecutive', 'longest'],
                             dest='run_order',
                             type=str)
+    run_parser.add_argument('--records',
+                            help='Directory, where the library writes results'
+                            ' of every run in parallel instead of printing'
+                            ' them. It should be visible from all nodes.',
+                            default=None)
+    run_parser.add_argument('--reduce',
+                            help='Let the library report minimum, maximum,'
+                            ' mean and sum of every counter per node or'
+                            ' over all ranks instead of a row per rank.',
+                            choices=['node', 'global'],
+                            default=None)
+    run_parser.add_argument('--timeout',
+                            help='Kill a run after so many seconds.',
+                            type=float,
+                            default=None)
+    run_parser.add_argument('--adaptive',
+                            help='Repeat every configuration until the confidence'
+                            ' interval of its wall time is narrow enough.',
+                            action='store_true',
+                            default=False)
+    run_parser.add_argument('--ci-target',
+                            help='Relative half width of the 95%% confidence'
+                            ' interval to reach in adaptive mode.',
+                            type=float,
+                            default=0.02,
+                            dest='ci_target')
+    run_parser.add_argument('--min-runs',
+                            help='Minimal number of runs in adaptive mode.',
+                            type=int,
+                            default=3,
+                            dest='min_runs')
+    run_parser.add_argument('--max-runs',
+                            help='Maximal number of runs in adaptive mode.',
+                            type=int,
+                            default=10,
+                            dest='max_runs')
+    run_parser.add_argument('--outlier',
+                            help='Rerun runs, which differ from the median by'
+                            ' more than this fraction (adaptive mode).',
+                            type=float,
+                            default=0.25)
+    run_parser.add_argument('--history',
+                            help='Earlier results to predict run times from.',
+                            nargs='+',
+                            default=None)
+    run_parser.add_argument('--exclusive',
+                            help='Run one configuration at a time, instead of packing'
+                            ' several configurations onto disjoint nodes.',
+                            action='store_true',
+                            default=False)
+
+    plan_parser = \
+        commands.add_parser('plan',
+                            help='Estimate how long the benchmarks run')
+    plan_parser.add_argument('--history',
+                             help='Earlier results to predict run times from.',
+                             nargs='+',
+                             required=True)
+    plan_parser.add_argument('--time-limit',
+                             help='Split the benchmarks into chunks, which fit'
+                             ' into this SLURM time limit ([D-]HH:MM:SS).',
+                             type=str,
+                             default=None,
+                             dest='time_limit')
+    plan_parser.add_argument('--runs',
+                             help='Number of runs of every benchmark.'
+                             ' Taken from the machine by default.',
+                             type=int,
+                             default=None)
+    plan_parser.add_argument('--filter',
+                             help='String which specfies which subset of benchmarks to plan',
+                             type=Filter.create_filter,
+                             default=EmptyFilter(),
+                             dest='filter')
+
+    analyze_parser = \
+        commands.add_parser('analyze',
+                            help='Compute statistics of every configuration'
+                            ' from csv, json, ndjson or npz results')
+    analyze_parser.add_argument('results',
+                                help='Result files',
+                                nargs='+')
+    analyze_parser.add_argument('-o',
+                                help='Where to write the statistics (csv).',
+                                type=str,
+                                dest='out',
+                                default=None)
+    analyze_parser.add_argument('--metrics',
+                                help='Comma separated list of counters to analyze.'
+                                ' All numeric counters by default.',
+                                type=lambda x: x.split(','),
+                                default=None)
 
     compile_parser = \
         commands.add_parser('prepare',
@@ -53,6 +168,15 @@ def parse_args():
         parser.print_help()
         raise Exception('No command has been chosen')
 
+    if args.design is not None:
+        args.design.seed = args.seed
+
+    if args.comm == 'run' and args.reduce is not None:
+        if args.writer is CsvWriter:
+            parser.error("--reduce requires json output")
+        if args.records is not None:
+            parser.error("--reduce can not be combined with --records")
+
     return args
 
 
@@ -97,14 +221,27 @@ def create_machine(args):
 def main():
     args = parse_args()
 
+    if args.comm == 'analyze':
+        analysis = Analysis(args.results, args.metrics)
+        if args.out is None:
+            analysis.write(sys.stdout)
+        else:
+            with open(args.out, 'w') as out:
+                analysis.write(out)
+        return
+
     machine = create_machine(args)
 
     if args.comm == 'prepare':
         machine.compile_libs()
+    elif args.comm == 'plan':
+        machine.plan()
     elif args.comm == 'run':
         machine.compile_benchmarks()
 
-        with args.writer(args.out) as runtimes_log:
+        if args.records is not None and not os.path.isdir(args.records):
+            os.makedirs(args.records)
+        with args.writer(args.out, resume=args.resume) as runtimes_log:
             machine.run_benchmarks(runtimes_log)
 
 
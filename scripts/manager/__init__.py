@@ -5,8 +5,17 @@ def m(x, y):
 
 from .machine import Machine
 from .cache import Cache
+from .environment import Environment
 from .benchmark import Benchmark, BenchGroup
 from .lib import Lib
 from .context import Context
-from .writer import CsvWriter, JsonWriter, Writer
+from .runner import Runner
+from .scheduler import Scheduler
+from .records import Records
+from .writer import CsvWriter, JsonWriter, NdjsonWriter, NpzWriter, Writer
 from .filter import Filter, EmptyFilter
+from .table import Table
+from .design import Design
+from .analysis import Analysis
+from .repetition import Repetition
+from .planner import Planner
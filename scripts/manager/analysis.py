@@ -0,0 +1,207 @@
+import csv
+import json
+import re
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .writer import NdjsonWriter, NpzWriter
+
+
+class Analysis:
+    """Per configuration statistics of run results.
+
+    Results are loaded into column arrays. Rank rows are reduced to one
+    value per run: the maximum for WTIME, ITER, maxima and percentiles,
+    the minimum for minima, the mean for means and the sum for the
+    other counters. Rows reduced per node by the library are weighted by
+    their number of ranks. Runs are then grouped by configuration, all
+    with vectorized numpy operations.
+
+    """
+    key_params = ('prog', 'nodes', 'np', 'size', 'oversub', 'schedulers',
+                  'affinity', 'cpu_per_node', 'vp')
+    # Columns, which are neither parameters nor metrics
+    id_columns = ('run', 'RANK', 'CPU', 'NODE', 'LOCALID', 'design',
+                  'max_nodes')
+    # Legacy csv column names
+    csv_names = {'sched': 'schedulers', 'cpu': 'CPU', 'rank': 'RANK',
+                 'node': 'NODE', 'iter': 'ITER', 'utime': 'UTIME',
+                 'wtime': 'WTIME', 'stime': 'STIME'}
+    baseline = 'cfs'
+    # Columns like MPI_BARRIER_P99_US or ITER_US_P99
+    percentile = re.compile(r'_P\d+(_US)?$')
+
+    # Two-sided 95% quantiles of Student's t distribution
+    t95 = (12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262,
+           2.228, 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101,
+           2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052,
+           2.048, 2.045, 2.042)
+
+    def __init__(self, filenames, metrics=None):
+        if numpy is None:
+            raise Exception("Analysis requires numpy")
+        tables = [Analysis.load(f) for f in filenames]
+        for t in tables:
+            # Results reduced in the library have no per rank WTIME
+            if 'WTIME' not in t and 'WTIME_MAX' in t:
+                t['WTIME'] = t['WTIME_MAX']
+        self.columns = Analysis.concat(tables)
+        self.keys = [k for k in self.key_params if k in self.columns]
+        if metrics is None:
+            metrics = [k for (k, v) in self.columns.items()
+                       if k not in self.key_params and
+                       k not in self.id_columns and v.dtype.kind in 'iuf']
+        self.metrics = metrics
+
+    def load(filename):
+        with open(filename, 'rb') as f:
+            head = f.read(2).lstrip()
+        if head.startswith(b'PK'):
+            return NpzWriter.read(filename)
+        if head.startswith(b'['):
+            with open(filename, 'r') as f:
+                return Analysis.from_rows(json.load(f))
+        if head.startswith(b'{'):
+            return Analysis.from_rows(NdjsonWriter.read(filename))
+        with open(filename, 'r') as f:
+            rows = csv.DictReader(f)
+            rows.fieldnames = [Analysis.csv_names.get(k, k)
+                               for k in rows.fieldnames]
+            return Analysis.from_rows(rows)
+
+    def from_rows(rows):
+        values = dict()
+        size = 0
+        for row in rows:
+            for k in row.keys() - values.keys():
+                values[k] = [None] * size
+            for (k, v) in values.items():
+                v.append(row.get(k))
+            size += 1
+        return {k: NpzWriter.array(v) for (k, v) in values.items()}
+
+    def concat(tables):
+        size = [len(next(iter(t.values()), [])) for t in tables]
+        names = set().union(*tables)
+        res = dict()
+        for k in names:
+            parts = [t[k] if k in t else NpzWriter.array([None] * n)
+                     for (t, n) in zip(tables, size)]
+            try:
+                res[k] = numpy.concatenate(parts)
+            except TypeError:
+                res[k] = numpy.concatenate([p.astype(str) for p in parts])
+        return res
+
+    def group(columns):
+        """ Return group id of every row and index of first row of each group """
+        code = numpy.zeros(len(columns[0]), dtype=numpy.int64)
+        for c in columns:
+            (_, inverse) = numpy.unique(c, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            (_, code) = numpy.unique(code * (inverse.max(initial=0) + 1) +
+                                     inverse, return_inverse=True)
+            code = code.reshape(-1)
+        (_, first) = numpy.unique(code, return_index=True)
+        return (code, first)
+
+    def reduce_runs(self):
+        """ Reduce rank rows to one row per run """
+        cols = [self.columns[k] for k in self.keys + ['run']]
+        (code, first) = Analysis.group(cols)
+        order = numpy.argsort(code, kind='stable')
+        starts = numpy.searchsorted(code[order], numpy.arange(len(first)))
+
+        runs = {k: self.columns[k][first] for k in self.keys}
+        if 'RANKS' in self.columns:
+            ranks = self.columns['RANKS'][order].astype(numpy.float64)
+        for k in self.metrics:
+            values = self.columns[k][order].astype(numpy.float64)
+            # A run is as slow as its slowest rank, so percentiles are
+            # the maximum over the ranks, as is the number of iterations.
+            # Regions have columns '<region>:<counter>'.
+            name = k.rpartition(':')[2]
+            if (name in ('WTIME', 'ITER') or name.endswith('_MAX') or
+                    Analysis.percentile.search(name)):
+                runs[k] = numpy.maximum.reduceat(values, starts)
+            elif name.endswith('_MIN'):
+                runs[k] = numpy.minimum.reduceat(values, starts)
+            elif name.endswith('_MEAN') and 'RANKS' in self.columns:
+                # Rows of a reduced run are nodes of different size
+                runs[k] = (numpy.add.reduceat(values * ranks, starts) /
+                           numpy.add.reduceat(ranks, starts))
+            elif name.endswith('_MEAN'):
+                runs[k] = (numpy.add.reduceat(values, starts) /
+                           numpy.diff(numpy.append(starts, len(values))))
+            else:
+                runs[k] = numpy.add.reduceat(values, starts)
+        return runs
+
+    def stats(self):
+        """ Compute statistics of every configuration """
+        runs = self.reduce_runs()
+        (code, first) = Analysis.group([runs[k] for k in self.keys])
+        ngroups = len(first)
+        count = numpy.bincount(code, minlength=ngroups)
+
+        res = {k: runs[k][first] for k in self.keys}
+        res['runs'] = count
+
+        # Configurations, which differ from each other only in the scheduler
+        others = [k for k in self.keys if k != 'schedulers']
+        if 'schedulers' in self.keys and others:
+            (other, _) = Analysis.group([res[k] for k in others])
+            is_baseline = res['schedulers'] == self.baseline
+        else:
+            other = None
+
+        t = numpy.array((numpy.nan,) + self.t95)
+        tq = numpy.where(count - 1 < len(t), t[numpy.minimum(count - 1, len(t) - 1)],
+                         1.96)
+
+        for k in self.metrics:
+            v = runs[k]
+            order = numpy.lexsort((v, code))
+            sv = v[order]
+            starts = numpy.searchsorted(code[order], numpy.arange(ngroups))
+            lo = sv[starts + (count - 1) // 2]
+            hi = sv[starts + count // 2]
+            median = (lo + hi) / 2
+
+            total = numpy.bincount(code, weights=v, minlength=ngroups)
+            mean = total / count
+            sq = numpy.bincount(code, weights=(v - mean[code])**2,
+                                minlength=ngroups)
+            with numpy.errstate(invalid='ignore', divide='ignore'):
+                std = numpy.sqrt(sq / (count - 1))
+                ci = tq * std / numpy.sqrt(count)
+
+            res[k + '_median'] = median
+            res[k + '_mean'] = mean
+            res[k + '_std'] = std
+            res[k + '_ci95'] = ci
+            res[k + '_min'] = numpy.minimum.reduceat(sv, starts)
+            res[k + '_max'] = numpy.maximum.reduceat(sv, starts)
+
+            if other is not None:
+                base = numpy.full(other.max() + 1, numpy.nan)
+                base[other[is_baseline]] = median[is_baseline]
+                with numpy.errstate(invalid='ignore', divide='ignore'):
+                    res[k + '_slowdown'] = median / base[other]
+        return res
+
+    def write(self, out):
+        res = self.stats()
+        names = list(res.keys())
+        w = csv.writer(out)
+        w.writerow(names)
+        for i in range(len(res['runs'])):
+            w.writerow([Analysis.format(res[k][i]) for k in names])
+
+    def format(value):
+        if isinstance(value, (float, numpy.floating)):
+            return '{:.6g}'.format(value)
+        return str(value)
@@ -1,7 +1,9 @@
 import itertools
+import os
 import subprocess as sp
 
 from . import m
+from .table import Table
 
 class Benchmark:
     class SafeDict(dict):
@@ -22,6 +24,28 @@ class Benchmark:
             else:
                 setattr(self, k, v)
 
+    source_suffixes = ('.c', '.cc', '.cpp', '.cxx', '.h', '.hh', '.hpp',
+                       '.f', '.F', '.f90', '.F90', '.inc', '.def', '.mk')
+    source_names = ('Makefile', 'makefile', 'GNUmakefile')
+
+    def source_dirs(self):
+        return [self.wd]
+
+    def sources(self):
+        """ List files the binary depends on """
+        res = list()
+        for d in self.source_dirs():
+            for (root, dirs, files) in os.walk(d):
+                dirs[:] = sorted(x for x in dirs
+                                 if x != 'bin' and not x.startswith('.'))
+                res += [os.path.join(root, f) for f in sorted(files)
+                        if f.endswith(self.source_suffixes) or
+                        f in self.source_names]
+        return res
+
+    def binary(self):
+        return os.path.join(self.wd, 'bin', self.name)
+
     def compile(self, env):
         print(self.compile_command)
         p = sp.Popen(self.compile_command,
@@ -30,9 +54,9 @@ class Benchmark:
                      stderr=sp.PIPE,
                      stdout=sp.PIPE,
                      shell=True)
-        err = p.stderr.read().decode('UTF-8')
-        out = p.stdout.read().decode('UTF-8')
-        p.communicate()
+        (out, err) = p.communicate()
+        out = out.decode('UTF-8')
+        err = err.decode('UTF-8')
         if (p.returncode):
             self.fail = True
             print("Failed to complie benchmark")
@@ -41,7 +65,11 @@ class Benchmark:
 
 
 class BenchGroup:
-    """ Class representing a group of NPB benchmarks """
+    """ Class representing a group of NPB benchmarks
+
+    Benchmarks are not constructed up front. The group keeps a table of
+    parameters and constructs only the benchmarks which are selected.
+    """
     def __init__(self, BenchmarkClass, **kwargs):
         if 'tmpl' not in kwargs:
             kwargs['tmpl'] = ''
@@ -53,11 +81,49 @@ class BenchGroup:
             return not is_container(x)
         rest = {k: kwargs[k] for k in filter(is_not_container, kwargs)}
         lists = {k: kwargs[k] for k in filter(is_container, kwargs)}
-        params = [dict(zip(lists, p))
-                  for p in itertools.product(*lists.values())]
-        params = [m(rest, i) for i in params]
-        self.benchmarks = tuple(BenchmarkClass(**i) for i in params)
+        self.parts = [(BenchmarkClass, rest, lists)]
+        self.table = None
 
     def __add__(self, other):
-        self.benchmarks = self.benchmarks + other.benchmarks
+        self.parts = self.parts + other.parts
+        self.table = None
         return self
+
+    def params(self):
+        """ Iterate over the raw parameters of all group members """
+        for (BenchmarkClass, rest, lists) in self.parts:
+            for p in itertools.product(*lists.values()):
+                yield (BenchmarkClass, m(rest, dict(zip(lists, p))))
+
+    def select(self, filter, design=None):
+        """Construct only benchmarks, which pass the filter.
+
+        The filter is first checked against the parameters known before
+        construction, so that most of the skipped benchmarks are never
+        built. A design picks a subset of the benchmarks, which pass the
+        filter, and is recorded in them.
+
+        """
+        if self.table is None:
+            self.table = Table(self.params())
+        ids = self.table.select(filter)
+        if design is None or design.kind == 'full':
+            for i in ids:
+                (BenchmarkClass, params) = self.table[i]
+                bench = BenchmarkClass(**params)
+                if not filter.skip(bench):
+                    yield bench
+            return
+
+        # Parameters derived in construction may be filtered as well,
+        # so the design samples from the constructed benchmarks
+        passed = list()
+        for i in ids:
+            (BenchmarkClass, params) = self.table[i]
+            bench = BenchmarkClass(**params)
+            if not filter.skip(bench):
+                passed.append((params, bench))
+        for i in design.sample(params for (params, bench) in passed):
+            bench = passed[i][1]
+            bench.design = str(design)
+            yield bench
@@ -1,35 +1,124 @@
-import pickle
+import hashlib
+import json
 import os
+import tempfile
+import threading
+
 
 class Cache:
+    """Compilation cache.
+
+    Every compiled benchmark is stored in an append-only manifest under
+    a key, which is a hash of the compile command, the relevant part of
+    the environment and the state of the benchmark sources. If any of
+    them changes, or the binary disappears, the benchmark is compiled
+    again.
+
+    """
+    # Environment variables, which may influence the compilation
+    env_keys = ('PATH', 'LD_LIBRARY_PATH', 'LIBRARY_PATH', 'CPATH',
+                'CC', 'CXX', 'FC', 'F77', 'CFLAGS', 'CXXFLAGS', 'FFLAGS',
+                'LDFLAGS', 'LOADEDMODULES')
+
     def __init__(self, machine):
         self.machine = machine
+        self.compiled = dict()
+        self.keys = dict()
+        self.sources = dict()
+        self.lock = threading.Lock()
+        self.lines = 0
+        self.pad = False
+
         name = self.name()
         if not os.path.isfile(name) or not self.machine.args.cache:
-            self.compiled = dict()
             return
-        with open(name, 'rb') as cache:
-            self.compiled = pickle.load(cache)
+        with open(name, 'r') as cache:
+            for line in cache:
+                self.lines += 1
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Partially written entry after a crash
+                    continue
+                self.compiled[entry['key']] = entry
+            # Do not glue the next entry to the broken one
+            self.pad = self.lines > 0 and not line.endswith('\n')
 
     def name(self):
-        return '.{}.pkl'.format(self.machine.suffix)
+        return '.{}.cache'.format(self.machine.suffix)
+
+    def key(self, bench):
+        if bench in self.keys:
+            return self.keys[bench]
 
-    def __contains__(self, key):
-        return key in self.compiled
+        h = hashlib.sha256()
+        h.update(bench.compile_command.encode())
+        h.update(bench.wd.encode())
+        for k in self.env_keys:
+            h.update('{}={}\n'.format(k, self.machine.env.get(k)).encode())
+        for (path, mtime, size) in self.snapshot(bench.sources()):
+            h.update('{} {} {}\n'.format(path, mtime, size).encode())
 
-    def add(self, key):
-        self.compiled[key] = key.fail
-        self.__save()
+        self.keys[bench] = h.hexdigest()
+        return self.keys[bench]
+
+    def snapshot(self, paths):
+        res = list()
+        for path in paths:
+            if path not in self.sources:
+                st = os.stat(path)
+                self.sources[path] = (path, st.st_mtime_ns, st.st_size)
+            res.append(self.sources[path])
+        return res
+
+    def __contains__(self, bench):
+        entry = self.compiled.get(self.key(bench))
+        if entry is None:
+            return False
+        return entry['fail'] or os.path.isfile(entry['binary'])
+
+    def __getitem__(self, bench):
+        return self.compiled[self.key(bench)]['fail']
+
+    def add(self, bench):
+        entry = {'key': self.key(bench),
+                 'binary': bench.binary(),
+                 'fail': bench.fail}
+        with self.lock:
+            self.compiled[entry['key']] = entry
+            self.__append(entry)
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
-        self.__save()
+        self.__compact()
 
-    def __save(self):
+    def __append(self, entry):
         if not self.machine.args.cache:
             return
+        # A single short write to a file opened for appending does
+        # not interleave with or damage the earlier entries
+        with open(self.name(), 'a') as cache:
+            if self.pad:
+                cache.write('\n')
+                self.pad = False
+            cache.write(json.dumps(entry) + '\n')
+            cache.flush()
+            os.fsync(cache.fileno())
+        self.lines += 1
+
+    def __compact(self):
+        """Drop overwritten entries, replacing the manifest atomically"""
+        if not self.machine.args.cache or self.lines <= len(self.compiled):
+            return
         name = self.name()
-        with open(name, 'wb') as cache:
-            pickle.dump(self.compiled, cache, pickle.HIGHEST_PROTOCOL)
+        (fd, path) = tempfile.mkstemp(prefix=name + '.',
+                                      dir=os.path.dirname(os.path.abspath(name)))
+        with os.fdopen(fd, 'w') as cache:
+            for entry in self.compiled.values():
+                cache.write(json.dumps(entry) + '\n')
+            cache.flush()
+            os.fsync(cache.fileno())
+        os.replace(path, name)
+        self.lines = len(self.compiled)
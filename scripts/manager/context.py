@@ -31,6 +31,8 @@ class Context:
     def __init__(self, machine, cfg):
         self.machine = machine
         (self.run, self.bench, self.env) = cfg
+        # Nodes the configuration runs on
+        self.nodelist = machine.nodelist[:self.bench.nodes]
 
     def __enter__(self):
         if hasattr(self, 'files'):
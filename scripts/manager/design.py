@@ -0,0 +1,100 @@
+import random
+
+
+class Design(object):
+    """Chooses a representative subset of the benchmark matrix.
+
+        full            every configuration
+        random:N        N configurations chosen at random
+        lhs:N           latin hypercube: N configurations, levels of every
+                        factor are spread evenly over them
+        fractional[:K]  1/K (default 1/2) regular fraction: configurations
+                        whose level indices sum to 0 modulo K
+
+    Factors are the parameters with more than one value. The choice is
+    reproducible for a given seed.
+
+    """
+    def __init__(self, design_str, seed=0):
+        parts = design_str.split(':')
+        self.kind = parts[0]
+        self.seed = seed
+        if self.kind == 'full':
+            self.size = None
+        elif self.kind in ('random', 'lhs') and len(parts) == 2:
+            self.size = int(parts[1])
+        elif self.kind == 'fractional' and len(parts) <= 2:
+            self.size = int(parts[1]) if len(parts) == 2 else 2
+        else:
+            raise Exception("Unknown design: " + design_str)
+
+    def create_design(design_str):
+        return Design(design_str)
+
+    def __str__(self):
+        if self.kind == 'full':
+            return self.kind
+        return '{}:{}:seed={}'.format(self.kind, self.size, self.seed)
+
+    def factors(self, rows):
+        """ Return levels of every parameter with several values """
+        values = dict()
+        for params in rows:
+            for (k, v) in params.items():
+                if callable(v):
+                    continue
+                values.setdefault(k, set()).add(v)
+        return {k: sorted(v, key=lambda x: (type(x).__name__, x))
+                for (k, v) in values.items() if len(v) > 1}
+
+    def sample(self, rows):
+        """ Return sorted indices of the chosen @rows (dicts of parameters) """
+        rows = list(rows)
+        if self.kind == 'full' or len(rows) == 0:
+            return list(range(len(rows)))
+
+        rng = random.Random(self.seed)
+        factors = self.factors(rows)
+        if self.kind == 'random':
+            return sorted(rng.sample(range(len(rows)),
+                                     min(self.size, len(rows))))
+        if self.kind == 'fractional':
+            return [i for (i, params) in enumerate(rows)
+                    if sum(levels.index(params[k])
+                           for (k, levels) in factors.items()
+                           if k in params) % self.size == 0]
+        return self.lhs(rows, factors, rng)
+
+    def lhs(self, rows, factors, rng):
+        if self.size >= len(rows):
+            return list(range(len(rows)))
+
+        # Every factor gets each of its levels equally often
+        columns = dict()
+        for (k, levels) in factors.items():
+            strata = [levels[i * len(levels) // self.size]
+                      for i in range(self.size)]
+            rng.shuffle(strata)
+            columns[k] = strata
+
+        # Level indices of every row, computed once
+        keys = list(columns)
+        levels = [tuple(row.get(k) for k in keys) for row in rows]
+        exact = dict()
+        for (j, level) in enumerate(levels):
+            exact.setdefault(level, []).append(j)
+
+        # The matrix may not be a full product, so take the closest
+        # configuration, which has not been chosen yet
+        chosen = set()
+        for i in range(self.size):
+            wanted = tuple(columns[k][i] for k in keys)
+            free = [j for j in exact.get(wanted, []) if j not in chosen]
+            if free:
+                best = free[0]
+            else:
+                best = max((j for j in range(len(rows)) if j not in chosen),
+                           key=lambda j: sum(a == b for (a, b) in
+                                             zip(levels[j], wanted)))
+            chosen.add(best)
+        return sorted(chosen)
@@ -0,0 +1,87 @@
+import hashlib
+import json
+import os
+import shlex
+import subprocess as sp
+
+from .cache import Cache
+
+
+class Environment:
+    """Snapshot of the environment produced by the module setup.
+
+    Machines, which need modules, set `modules_load` to a shell command
+    like 'source mini.env'. The command is evaluated once, and the
+    variables it sets or removes are stored in a file. The snapshot is
+    reused while the command, the files it mentions and the relevant
+    part of the calling environment stay the same.
+
+    """
+    # Variables maintained by the shell itself
+    ignore = ('_', 'SHLVL', 'PWD', 'OLDPWD')
+
+    def __init__(self, machine):
+        self.machine = machine
+        self.command = machine.modules_load
+
+    def name(self):
+        return '.{}.env.json'.format(type(self.machine).__name__)
+
+    def key(self, env):
+        digest = hashlib.sha256()
+        digest.update(self.command.encode() + b'\0')
+        for key in Cache.env_keys + ('MODULEPATH',):
+            digest.update('{}={}'.format(key, env.get(key, '')).encode()
+                          + b'\0')
+        for word in shlex.split(self.command):
+            if not os.path.isfile(word):
+                continue
+            digest.update(word.encode() + b'\0')
+            with open(word, 'rb') as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        return digest.hexdigest()
+
+    def evaluate(self, env):
+        command = '{} >/dev/null 2>&1 && env -0'.format(self.command)
+        p = sp.run(['/bin/bash', '-c', command],
+                   env=env,
+                   stdout=sp.PIPE)
+        if p.returncode:
+            raise Exception("Failed to load modules: " + self.command)
+
+        loaded = {}
+        for entry in p.stdout.decode('UTF-8').split('\0'):
+            (name, sep, value) = entry.partition('=')
+            if sep and name not in self.ignore:
+                loaded[name] = value
+
+        return {
+            'set': {k: v for (k, v) in loaded.items() if env.get(k) != v},
+            'unset': [k for k in env
+                      if k not in loaded and k not in self.ignore]}
+
+    def apply(self, env):
+        """Return a copy of env with the module environment applied"""
+        key = self.key(env)
+        name = self.name()
+        snapshot = None
+        if os.path.isfile(name):
+            with open(name, 'r') as f:
+                try:
+                    snapshot = json.load(f)
+                except ValueError:
+                    pass
+        if snapshot is None or snapshot.get('key') != key:
+            print("Loading modules: " + self.command)
+            snapshot = self.evaluate(env)
+            snapshot['key'] = key
+            tmp = name + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp, name)
+
+        env = env.copy()
+        env.update(snapshot['set'])
+        for k in snapshot['unset']:
+            env.pop(k, None)
+        return env
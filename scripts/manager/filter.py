@@ -1,28 +1,89 @@
+import re
+
+
 class Filter(object):
+    """Selects a subset of benchmarks.
+
+    The filter string is a list of clauses separated by ':'. A clause
+    compares a benchmark parameter against a value or a list of values
+    separated by ',':
+
+        prog=ep,lu    parameter is one of the values
+        prog!=ep      parameter is none of the values
+        nodes>=4      also >, < and <=
+        prog~^bt      regular expression search, !~ negates it
+        !nodes=2,4    '!' in front negates any clause
+
+    """
+    class Clause(object):
+        pattern = re.compile(r'^(!?)(\w+)(!=|>=|<=|!~|=|>|<|~)(.*)$')
+
+        def __init__(self, clause_str):
+            what = self.pattern.match(clause_str)
+            if not what:
+                raise Exception("Can't parse filter clause: " + clause_str)
+            (negate, self.key, self.op, values) = what.groups()
+            self.negate = bool(negate)
+            self.values = values.split(',')
+            if self.op in ('~', '!~'):
+                self.regex = re.compile('|'.join(self.values))
+            elif self.op not in ('=', '!='):
+                if len(self.values) != 1:
+                    raise Exception("Comparison expects single value: " +
+                                    clause_str)
+            # Values converted to the type of the parameter
+            self.converted = dict()
+
+        def convert(self, t):
+            if t not in self.converted:
+                self.converted[t] = [t(v) for v in self.values]
+            return self.converted[t]
+
+        def match(self, value):
+            if self.op in ('~', '!~'):
+                res = self.regex.search(str(value)) is not None
+                res = res if self.op == '~' else not res
+            else:
+                values = self.convert(type(value))
+                if self.op == '=':
+                    res = value in values
+                elif self.op == '!=':
+                    res = value not in values
+                elif self.op == '>=':
+                    res = value >= values[0]
+                elif self.op == '<=':
+                    res = value <= values[0]
+                elif self.op == '>':
+                    res = value > values[0]
+                else:
+                    res = value < values[0]
+            return res != self.negate
+
     def __init__(self, filter_str):
-        self.params = dict(map(lambda x: x.split('='), filter_str.split(':')))
-        for k in self.params:
-            self.params[k] = self.params[k].split(',')
+        self.clauses = [self.Clause(c) for c in filter_str.split(':')]
+        self.params = {c.key: c.values for c in self.clauses
+                       if c.op == '=' and not c.negate}
 
     def skip(self, bench):
-        for k in self.params:
-            if k in bench.__dict__:
-                present = False
-                for v in self.params[k]:
-                    val = type(bench.__dict__[k])(v)
-                    if val == bench.__dict__[k]:
-                        present = True
-                        break
-                if not present:
-                    return True
-        return  False
+        return self.skip_params(bench.__dict__)
+
+    def skip_params(self, params):
+        """ Check only the keys present in @params """
+        for c in self.clauses:
+            if c.key in params and not c.match(params[c.key]):
+                return True
+        return False
 
     def create_filter(filter_str):
         return Filter(filter_str)
 
 class EmptyFilter(Filter):
     def __init__(self):
-        pass
+        self.clauses = []
+        self.params = dict()
 
     def skip(self, bench):
         return False
+
+    def skip_params(self, params):
+        return False
@@ -1,9 +1,6 @@
 class Lib:
     def __init__(self, name='default', **kwargs):
-        if 'name' not in kwargs:
-            self.name = 'default'
-        else:
-            self.name = kwargs['name']
+        self.name = name
 
         if 'compile_pre' not in kwargs:
             self.compile_pre = ''
@@ -1,9 +1,21 @@
 import os
+import asyncio
+import hashlib
 import itertools
+import threading
 import subprocess as sp
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 from .cache import Cache
 from .context import Context
+from .environment import Environment
+from .planner import Planner
+from .records import Records
+from .repetition import Repetition
+from .runner import Runner
+from .scheduler import Scheduler
 
 
 class Machine:
@@ -11,12 +23,14 @@ class Machine:
         def __enter__(self):
             self.hostfile = self.create_file(
                 self.machine.hostfile_dir, 'hostfile')
-            self.hostfile.f.write(
-                "\n".join(self.machine.nodelist[:self.bench.nodes]) + '\n')
+            self.hostfile.f.write("\n".join(self.nodelist) + '\n')
 
             self.nodestr = self.hostfile.path
             return super().__enter__()
 
+    # Set if configurations can not be confined to a subset of nodes
+    exclusive = False
+
     def create_context(self, machine, cfg):
         return self.Hostfile(machine, cfg)
 
@@ -27,7 +41,23 @@ class Machine:
             self.prefix = 'INTERFERENCE'
         self.env['INTERFERENCE_PREFIX'] = self.prefix
 
-        self.suffix = "{}-{}".format(type(self).__name__, self.mpilib.name)
+        # Evaluate the module setup once instead of in every command
+        if hasattr(self, 'modules_load'):
+            self.env = Environment(self).apply(self.env)
+
+        if not hasattr(self, 'mpilibs'):
+            self.mpilibs = {self.mpilib.name: self.mpilib}
+        self.libs = self.select_libs(self.args.mpi)
+        if len(self.libs) > 1 and self.args.comm != 'prepare':
+            raise Exception("Only prepare accepts several MPI libraries")
+        self.mpilib = self.libs[0]
+        self.suffix = self.lib_suffix(self.mpilib)
+
+        self.benchmarks = tuple(self.group.select(self.args.filter,
+                                                  self.args.design))
+        if self.args.design is not None:
+            print("Design {} selected {} benchmarks".format(
+                self.args.design, len(self.benchmarks)))
 
     def get_script_path(self):
         return os.path.dirname(os.path.realpath(__file__))
@@ -36,103 +66,376 @@ class Machine:
         return self.get_lib_path() + 'libinterference.so'
 
     def get_lib_path(self):
-        lib = "/../../install-{}/usr/local/lib/"
-        return self.get_script_path() + lib.format(self.suffix)
+        return self.get_install_path(self.mpilib) + 'usr/local/lib/'
+
+    def get_install_path(self, mpilib):
+        install = "/../../install-{}/"
+        return self.get_script_path() + install.format(self.lib_suffix(mpilib))
+
+    def get_build_path(self, mpilib):
+        build = "/../../build-{}/"
+        return self.get_script_path() + build.format(self.lib_suffix(mpilib))
+
+    def lib_suffix(self, mpilib):
+        return "{}-{}".format(type(self).__name__, mpilib.name)
+
+    def select_libs(self, names):
+        if names == 'default':
+            return [self.mpilib]
+        libs = []
+        for name in names.split(','):
+            if name not in self.mpilibs:
+                raise Exception("Unknown MPI library {}. Known: {}".format(
+                    name, ", ".join(self.mpilibs)))
+            libs.append(self.mpilibs[name])
+        return libs
 
     def configurations(self, writer):
+        runs = self.runs
+        if self.args.adaptive:
+            runs = range(self.args.min_runs)
+
+        benchmarks = self.benchmarks
+        if self.args.run_order == 'longest':
+            benchmarks = sorted(benchmarks,
+                                key=lambda b: -(self.predict(b) or 0))
+
         # Depending on if we want run happen consecutively or
         # interleave each other, we put runs first or second
         if self.args.run_order == 'interleave':
-            confs = tuple(itertools.product(self.runs, self.benchmarks))
+            confs = tuple(itertools.product(runs, benchmarks))
         else:
-            confs = tuple(itertools.product(self.benchmarks, self.runs))
+            confs = tuple(itertools.product(benchmarks, runs))
         res = list()
         for (run, bench) in confs:
             # We may need to swap run and bench because we put runs
             # as second parameters two lines above
-            if self.args.run_order == 'consecutive':
+            if self.args.run_order != 'interleave':
                 (run, bench) = (bench, run)
-            env = self.env.copy()
-            env['INTERFERENCE_AFFINITY'] = bench.affinity
-            env['INTERFERENCE_SCHED'] = bench.schedulers
-            env['INTERFERENCE_OUTPUT'] = repr(writer)
-            res.append((run, bench, env))
+            res.append(self.configuration(run, bench, writer))
         return res
 
+    def predict(self, bench):
+        """ Predicted wall time of a run in seconds or None """
+        if not hasattr(self, 'planner'):
+            self.planner = Planner(self.args.history)
+        return self.planner.predict(bench)
+
+    def plan(self):
+        runs = self.args.runs
+        if runs is None:
+            runs = len(list(self.runs))
+
+        jobs = list()
+        unknown = list()
+        for b in self.benchmarks:
+            time = self.predict(b)
+            if time is None:
+                unknown.append(b)
+            else:
+                jobs.append((time * runs, b))
+        jobs.sort(key=lambda j: -j[0])
+
+        def describe(bench):
+            return ':'.join('{}={}'.format(k, getattr(bench, k))
+                            for k in Planner.key_params if hasattr(bench, k))
+
+        for (time, b) in jobs:
+            print(Planner.format_time(time), describe(b))
+        for b in unknown:
+            print('unknown', describe(b))
+        print('Total: {} for {} configurations x {} runs, {} unknown'.format(
+            Planner.format_time(sum(j[0] for j in jobs)), len(jobs), runs,
+            len(unknown)))
+
+        if self.args.time_limit is None:
+            return
+        limit = Planner.parse_time(self.args.time_limit)
+        chunks = self.planner.chunks(jobs, limit)
+        for (i, (time, benchmarks)) in enumerate(chunks):
+            over = ' (exceeds the limit)' if time > limit else ''
+            print('Chunk {}: {}{}'.format(i, Planner.format_time(time), over))
+            for b in benchmarks:
+                print('  ', describe(b))
+
+    def configuration(self, run, bench, writer):
+        env = self.env.copy()
+        env['INTERFERENCE_AFFINITY'] = bench.affinity
+        env['INTERFERENCE_SCHED'] = bench.schedulers
+        env['INTERFERENCE_OUTPUT'] = repr(writer)
+        if self.args.reduce is not None:
+            env['INTERFERENCE_REDUCE'] = self.args.reduce
+        return (run, bench, env)
+
     def compile_benchmarks(self):
 
         with Cache(self) as cache:
             env = self.env.copy()
 
-            # execute compilation command
+            # Many benchmarks differ only in parameters, which do not
+            # influence the binary (scheduler, affinity, ...). Compile
+            # every binary only once and share the result.
+            builds = OrderedDict()
             for b in self.benchmarks:
-                if self.args.filter.skip(b):
-                    continue
+                builds.setdefault(b, []).append(b)
+
+            # Builds in the same working directory may step onto each
+            # other, so each directory is compiled serially.
+            workdirs = OrderedDict()
+            for b, duplicates in builds.items():
                 if b in cache:
-                    b.fail = cache.compiled[b]
+                    for d in duplicates:
+                        d.fail = cache[b]
                     print("Skipping: {}".format(b))
                     continue
-                print("Compiling: {}".format(b))
-                b.compile(env)
+                workdirs.setdefault(b.wd, []).append(b)
+
+            lock = threading.Lock()
+
+            def compile_wd(benchmarks):
+                for b in benchmarks:
+                    print("Compiling: {}".format(b))
+                    b.compile(env)
+                    with lock:
+                        for d in builds[b]:
+                            d.fail = b.fail
+                        cache.add(b)
 
-                cache.add(b)
+            with ThreadPoolExecutor(max_workers=self.args.jobs or 1) as pool:
+                for f in [pool.submit(compile_wd, benchmarks)
+                          for benchmarks in workdirs.values()]:
+                    f.result()
 
     def run_benchmarks(self, writer):
         print('-' * 62)
-        for cfg in self.configurations(writer):
+        confs = [cfg for cfg in self.configurations(writer)
+                 if not cfg[1].fail]
+
+        done = [cfg for cfg in confs if writer.done(cfg[0], cfg[1])]
+        if done:
+            print("Skipping {} configurations present in the output".format(
+                len(done)))
+            confs = [cfg for cfg in confs if not writer.done(cfg[0], cfg[1])]
+
+        scheduler = Scheduler(self.nodelist,
+                              self.exclusive or self.args.exclusive)
+        runner = Runner(self.prefix, timeout=self.args.timeout)
+
+        # Benchmarks compare equal if they share a binary, so they are
+        # told apart by identity
+        repetitions = dict()
+
+        def top_up(bench):
+            rep = repetitions[id(bench)]
+            while rep.more():
+                run = rep.launched
+                if writer.done(run, bench):
+                    rep.resume(writer.done_wtime(run, bench))
+                    continue
+                rep.launch()
+                scheduler.add(self.configuration(run, bench, writer))
+            if rep.running:
+                return
+            if rep.failed:
+                print("Giving up on {} after a failed run".format(bench.name))
+            else:
+                print("Finished {} after {} runs, CI {:.3f}".format(
+                    bench.name, rep.launched, rep.ci()))
+
+        if self.args.adaptive:
+            # Runs already present in the output count towards the
+            # confidence interval
+            for (run, bench, env) in done + confs:
+                if id(bench) not in repetitions:
+                    repetitions[id(bench)] = Repetition(
+                        self.args.ci_target, self.args.min_runs,
+                        self.args.max_runs, self.args.outlier)
+                rep = repetitions[id(bench)]
+                if writer.done(run, bench):
+                    rep.resume(writer.done_wtime(run, bench))
+                else:
+                    rep.launch()
+            # Configurations with all runs done may need more runs now
+            for bench in {id(cfg[1]): cfg[1] for cfg in done}.values():
+                if not repetitions[id(bench)].running:
+                    top_up(bench)
+
+        def repeat(cfg, results):
+            """ Account a finished run, return False if it is rejected """
             (run, bench, env) = cfg
+            rep = repetitions[id(bench)]
+            wtime = None if results is None else writer.wtime(results)
+            accepted = rep.add(wtime)
+            if not accepted and wtime is not None:
+                print("Outlier: {} took {}, not recorded".format(bench.name,
+                                                                 wtime))
+            top_up(bench)
+            return accepted
 
-            if bench.fail:
-                continue
+        async def schedule():
+            async for (cfg, results) in scheduler.run(
+                    confs, lambda cfg, nodes:
+                    self.run_benchmark(runner, cfg, nodes)):
+                # Outliers are not written, so that the analysis does
+                # not count them either
+                if self.args.adaptive and not repeat(cfg, results):
+                    continue
+                if results is None:
+                    continue
+                (run, bench, env) = cfg
+                writer.submit(run, bench, results)
+                print('=' * 40)
 
-            if self.args.filter.skip(bench):
-                continue
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(schedule())
+        finally:
+            loop.close()
 
-            with self.create_context(self, cfg) as context:
+    async def run_benchmark(self, runner, cfg, nodelist):
+        (run, bench, env) = cfg
+
+        records = None
+        if self.args.records is not None:
+            # Let the library write the results into a file of its own
+            (fd, records) = tempfile.mkstemp(suffix='.rec',
+                                             prefix=bench.prog + '-',
+                                             dir=self.args.records)
+            os.close(fd)
+            env = env.copy()
+            env['INTERFERENCE_OUTPUT_FILE'] = records
+            cfg = (run, bench, env)
+
+        try:
+            context = self.create_context(self, cfg)
+            context.nodelist = nodelist
+            with context:
                 if hasattr(self, 'format_command'):
                     command = self.format_command(context)
                 elif hasattr(self, 'mpilib'):
                     command = self.mpilib.format_command(context)
                 else:
-                    raise Exception('Expected {} to have either mpilib or format_command'.format(self.__name__))
+                    raise Exception('Expected {} to have either mpilib or '
+                                    'format_command'.format(self.__name__))
                 print("Run ", bench.name, bench.nodes, {
-                      i: env[i] for i in filter(lambda k: 'INTERFERENCE' in k, env.keys())})
+                      i: env[i] for i in filter(lambda k: 'INTERFERENCE' in k,
+                                                env.keys())})
                 print(command)
-                p = sp.Popen(command, stdout=sp.PIPE, stderr=sp.STDOUT,
-                             cwd=bench.wd, env=env, shell=True)
-                out = p.stdout.read().decode('UTF-8')
-                err = p.stdout.read().decode('UTF-8')
-                p.communicate()
+                res = await runner.run(command, bench.wd, env)
 
-                if (p.returncode):
+                if res.timeout:
+                    print("Timeout after {} seconds: {}".format(runner.timeout,
+                                                               command))
+                    print("\n".join(res.tail))
+                    return None
+
+                if (res.returncode):
                     print("Error")
-                    print("".join(out))
-                    print("".join(err))
-                    print(p.returncode)
-                    continue
+                    print("\n".join(res.tail))
+                    print(res.returncode)
+                    return None
 
-                results = list(
-                    filter(lambda x: self.prefix in x, out.splitlines()))
-                if len(results) == 0:
+                if records is not None:
+                    try:
+                        return Records.read(records)
+                    except (OSError, ValueError, KeyError):
+                        print("Failed to read profiling data from " + records)
+                        print("\n".join(res.tail))
+                        return None
+
+                if len(res.results) == 0:
                     print("Failed to get profiling data")
-                    print("".join(out))
-                    print("".join(err))
-                    continue
-                writer.submit(run, bench, results)
-                print('=' * 40)
+                    print("\n".join(res.tail))
+                    return None
+                return res.results
+        finally:
+            # The rows are in memory by now
+            if records is not None and os.path.exists(records):
+                os.remove(records)
+
+    # Files outside lib/, which take part in the build of the library
+    lib_inputs = ('CMakeLists.txt', 'scripts/CMakeLists.txt')
+    lib_dirs = ('lib', 'test')
+    lib_suffixes = ('.c', '.cpp', '.h', '.hpp', '.w', '.py', '.txt',
+                    '.cmake', '.in')
+
+    def lib_sources(self):
+        root = os.path.realpath(self.get_script_path() + '/../..')
+        sources = [os.path.join(root, f) for f in self.lib_inputs]
+        for d in self.lib_dirs:
+            for path, dirs, files in os.walk(os.path.join(root, d)):
+                dirs[:] = sorted(x for x in dirs if not x.startswith('.')
+                                 and x != '__pycache__')
+                sources += [os.path.join(path, f) for f in sorted(files)
+                            if f.endswith(self.lib_suffixes)]
+        return sources
+
+    def lib_jobs(self):
+        """ Make jobs for the library, all CPUs unless --jobs is given """
+        return self.args.jobs or os.cpu_count() or 1
+
+    def lib_stamp(self, mpilib):
+        """Hash of everything, which determines the installed library"""
+        digest = hashlib.sha256()
+        for part in (mpilib.compile_pre, mpilib.compile_flags):
+            digest.update(part.encode() + b'\0')
+        for key in Cache.env_keys:
+            digest.update('{}={}'.format(key, self.env.get(key, '')).encode()
+                          + b'\0')
+        for source in self.lib_sources():
+            if not os.path.isfile(source):
+                continue
+            digest.update(source.encode() + b'\0')
+            with open(source, 'rb') as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        return digest.hexdigest()
 
     def compile_libs(self):
-        path = self.get_script_path()
-        build_path = path + '/../../build-' + self.suffix + '/'
-        install_path = path + '/../../install-' + self.suffix + '/'
+        with ThreadPoolExecutor(max_workers=len(self.libs)) as executor:
+            futures = [executor.submit(self.compile_lib, lib)
+                       for lib in self.libs]
+            errors = [f.exception() for f in futures]
+        failed = []
+        for (lib, error) in zip(self.libs, errors):
+            if error is not None:
+                print(error)
+                failed.append(lib.name)
+        if failed:
+            raise Exception("Failed to prepare library: {}".format(
+                ", ".join(failed)))
+
+    def compile_lib(self, mpilib):
+        suffix = self.lib_suffix(mpilib)
+        build_path = self.get_build_path(mpilib)
+        install_path = self.get_install_path(mpilib)
+        stamp_file = install_path + '.stamp'
+        flags_file = build_path + '.flags'
+
+        stamp = self.lib_stamp(mpilib)
+        lib = install_path + 'usr/local/lib/libinterference.so'
+        if os.path.isfile(lib) and os.path.isfile(stamp_file):
+            with open(stamp_file) as f:
+                if f.read().strip() == stamp:
+                    print("{}: library is up to date".format(suffix))
+                    return
+
         if not os.path.exists(build_path):
             os.makedirs(build_path)
+        # Configure only a fresh tree or when the flags change, make
+        # reruns cmake itself if the CMakeLists.txt files change.
+        configure = mpilib.compile_pre + '\0' + mpilib.compile_flags
+        configured = os.path.isfile(build_path + 'CMakeCache.txt')
+        if configured and os.path.isfile(flags_file):
+            with open(flags_file) as f:
+                configured = f.read() == configure
+        else:
+            configured = False
+
         sequence = [
-            self.mpilib.compile_pre,
+            mpilib.compile_pre,
             'cd {}'.format(build_path),
-            'cmake .. {}'.format(self.mpilib.compile_flags),
-            'make clean',
-            'make',
+            '' if configured else 'cmake .. {}'.format(mpilib.compile_flags),
+            'make -j{}'.format(self.lib_jobs()),
             'make install DESTDIR=' + install_path]
         command = ' && '.join(filter(lambda x: len(x) > 0, sequence))
         print(command)
@@ -143,9 +446,12 @@ class Machine:
                      stdout=sp.PIPE,
                      stderr=sp.PIPE)
         (out, err) = p.communicate(input=command.encode())
-        if p.returncode:
-            print(out.decode('UTF-8'))
-            print(err.decode('UTF-8'))
-            raise Exception("Failed to prepare library.")
         print(out.decode('UTF-8'))
         print(err.decode('UTF-8'))
+        if p.returncode:
+            raise Exception("Failed to prepare library {}.".format(suffix))
+
+        with open(flags_file, 'w') as f:
+            f.write(configure)
+        with open(stamp_file, 'w') as f:
+            f.write(stamp + '\n')
@@ -0,0 +1,108 @@
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .analysis import Analysis
+
+
+class Planner:
+    """Predicts run times of configurations from earlier results.
+
+    A configuration found in the history gets the median wall time of
+    its runs. Otherwise the time comes from a least squares fit of
+    log(time) on the program, log(np), log(nodes) and the problem size.
+    Times are in seconds.
+
+    """
+    key_params = ('prog', 'nodes', 'np', 'size', 'oversub', 'schedulers',
+                  'affinity')
+
+    def __init__(self, filenames):
+        self.history = dict()
+        self.model = None
+        if not filenames:
+            return
+
+        stats = Analysis(filenames, metrics=['WTIME']).stats()
+        keys = [k for k in self.key_params if k in stats]
+        wtime = stats['WTIME_median'] / 1000.
+        for i in range(len(wtime)):
+            key = tuple(str(stats[k][i]) if k in keys else 'None'
+                        for k in self.key_params)
+            self.history[key] = wtime[i]
+
+        if all(k in stats for k in ('prog', 'nodes', 'np', 'size')):
+            self.progs = sorted(set(str(p) for p in stats['prog']))
+            self.sizes = sorted(set(str(s) for s in stats['size']))
+            x = numpy.array([self.features(*c) for c in
+                             zip(stats['prog'], stats['nodes'], stats['np'],
+                                 stats['size'])])
+            y = numpy.log(wtime)
+            ok = numpy.isfinite(y)
+            if ok.sum() >= x.shape[1]:
+                (self.model, _, _, _) = numpy.linalg.lstsq(x[ok], y[ok],
+                                                           rcond=None)
+
+    def features(self, prog, nodes, np, size):
+        # Programs and sizes are one-hot, the first ones are the baseline
+        return [1., math.log(float(np)), math.log(float(nodes))] + \
+            [float(str(prog) == p) for p in self.progs[1:]] + \
+            [float(str(size) == s) for s in self.sizes[1:]]
+
+    def key(self, bench):
+        return tuple(str(getattr(bench, k, None)) for k in self.key_params)
+
+    def predict(self, bench):
+        """ Predicted wall time of one run or None if unknown """
+        key = self.key(bench)
+        if key in self.history:
+            return self.history[key]
+        if (self.model is None or str(bench.prog) not in self.progs or
+                str(bench.size) not in self.sizes):
+            return None
+        x = self.features(bench.prog, bench.nodes, bench.np, bench.size)
+        return math.exp(numpy.dot(self.model, x))
+
+    def chunks(self, jobs, limit):
+        """Split (time, item) pairs into chunks fitting into @limit seconds.
+
+        Longest jobs are placed first, each into the first chunk where
+        it fits.
+
+        """
+        chunks = list()
+        for (time, item) in sorted(jobs, key=lambda j: -j[0]):
+            for c in chunks:
+                if c[0] + time <= limit:
+                    c[0] += time
+                    c[1].append(item)
+                    break
+            else:
+                chunks.append([time, [item]])
+        return chunks
+
+    def parse_time(time_str):
+        """ Parse SLURM time limit into seconds """
+        days = 0
+        if '-' in time_str:
+            (d, time_str) = time_str.split('-')
+            days = int(d)
+            parts = [int(p) for p in time_str.split(':')]
+            parts += [0] * (3 - len(parts))
+        else:
+            parts = [int(p) for p in time_str.split(':')]
+            # minutes, minutes:seconds or hours:minutes:seconds
+            parts = {1: [0, parts[0], 0],
+                     2: [0] + parts}.get(len(parts), parts)
+        (h, m, s) = parts
+        return ((days * 24 + h) * 60 + m) * 60 + s
+
+    def format_time(seconds):
+        seconds = int(round(seconds))
+        (d, seconds) = divmod(seconds, 24 * 3600)
+        (h, seconds) = divmod(seconds, 3600)
+        (m, s) = divmod(seconds, 60)
+        return '{}-{:02d}:{:02d}:{:02d}'.format(d, h, m, s)
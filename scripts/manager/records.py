@@ -0,0 +1,95 @@
+import json
+import struct
+
+
+class Records:
+    """Results, which the library writes into a file.
+
+    If INTERFERENCE_OUTPUT_FILE is set, every rank writes a fixed-size
+    binary record into the file. The file starts with a json header on
+    a single line, which describes the fields of a record, followed by
+    the records of all ranks in rank order. An optional json line after
+    the records holds values describing the whole run, they are added
+    to every row. Rows have the same keys and values as the json output
+    of the library.
+
+    """
+    formats = {'int': '=q', 'double': '=d'}
+
+    def __init__(self, header, rows):
+        self.header = header
+        self.rows = rows
+
+    def read(filename):
+        with open(filename, 'rb') as f:
+            header = json.loads(f.readline().decode('UTF-8'))
+            size = header['record_size']
+            data = f.read(size * header['ranks'])
+            trailer = f.read()
+        if len(data) != size * header['ranks']:
+            raise ValueError("Truncated results file: " + filename)
+        summary = json.loads(trailer.decode('UTF-8')) if trailer else {}
+
+        rows = list()
+        for rank in range(header['ranks']):
+            record = data[rank * size:(rank + 1) * size]
+            row = dict()
+            for f in header['fields']:
+                if f.get('meta', {}).get('format') == 'regions':
+                    row.update(Records.regions(f, record))
+                else:
+                    row[f['name']] = Records.format(f, record)
+            row.update(summary)
+            rows.append(row)
+        # Ranks may enter different regions, they get zeros for the others
+        keys = set().union(*rows)
+        for row in rows:
+            for k in keys.difference(row):
+                row[k] = '0'
+        return Records(header, rows)
+
+    def format(field, record):
+        start = field['offset']
+        value = record[start:start + field['size']]
+        kind = field['kind']
+        if kind == 'int':
+            return str(struct.unpack(Records.formats[kind], value)[0])
+        if kind == 'double':
+            return '{:f}'.format(struct.unpack(Records.formats[kind], value)[0])
+        if kind == 'string':
+            return value.split(b'\0', 1)[0].decode('UTF-8')
+        meta = field.get('meta', {})
+        if meta.get('format') == 'samples':
+            return Records.samples(meta, value)
+        raise ValueError("Unknown field kind: " + kind)
+
+    def samples(meta, value):
+        """ Samples in the order they were taken, see lib/sampler.cpp """
+        columns = meta['columns']
+        capacity = meta['capacity']
+        values = struct.unpack('={}q'.format(len(value) // 8), value)
+        count = values[0]
+        kept = min(count, capacity)
+        res = {'LOST': count - kept}
+        for (i, c) in enumerate(columns):
+            res[c] = [values[1 + (s % capacity) * len(columns) + i]
+                      for s in range(count - kept, count)]
+        return json.dumps(res, sort_keys=True, separators=(',', ':'))
+
+    def regions(field, record):
+        """ Columns '<region>:<counter>' of every region, see lib/regions.cpp """
+        meta = field['meta']
+        columns = meta['columns']
+        name_size = meta['name_size']
+        slot_size = name_size + 8 * len(columns)
+        res = dict()
+        for s in range(meta['slots']):
+            start = field['offset'] + s * slot_size
+            name = record[start:start + name_size].split(b'\0', 1)[0]
+            if not name:
+                break
+            values = struct.unpack('={}q'.format(len(columns)),
+                                   record[start + name_size:start + slot_size])
+            for (c, v) in zip(columns, values):
+                res['{}:{}'.format(name.decode('UTF-8'), c)] = str(v)
+        return res
@@ -0,0 +1,67 @@
+import math
+import statistics
+
+from .analysis import Analysis
+
+
+class Repetition:
+    """Decides how many times to run a configuration.
+
+    A configuration is repeated until the relative 95% confidence
+    interval of its wall time drops below @ci_target, but at least
+    @min_runs and at most @max_runs times. A run, which is further than
+    @outlier (relative) from the median of the previous runs, is not
+    counted and is run again. A configuration is given up after a
+    failed run.
+
+    """
+    def __init__(self, ci_target, min_runs, max_runs, outlier):
+        self.ci_target = ci_target
+        self.min_runs = min_runs
+        self.max_runs = max_runs
+        self.outlier = outlier
+
+        self.times = list()
+        self.launched = 0
+        self.running = 0
+        self.failed = False
+
+    def launch(self):
+        self.launched += 1
+        self.running += 1
+
+    def add(self, wtime):
+        """ Record wall time of a finished run, return False for outliers """
+        self.running -= 1
+        if wtime is None:
+            self.failed = True
+            return False
+        if len(self.times) >= 2:
+            median = statistics.median(self.times)
+            if abs(wtime - median) > self.outlier * median:
+                return False
+        self.times.append(wtime)
+        return True
+
+    def resume(self, wtime):
+        """ Record a run, which is already present in the output """
+        self.launched += 1
+        if wtime is not None:
+            self.times.append(wtime)
+
+    def ci(self):
+        """ Relative half width of the 95% confidence interval """
+        n = len(self.times)
+        if n < 2:
+            return math.inf
+        t = Analysis.t95[n - 2] if n - 2 < len(Analysis.t95) else 1.96
+        mean = statistics.mean(self.times)
+        return t * statistics.stdev(self.times) / math.sqrt(n) / mean
+
+    def more(self):
+        """ Check if another run should be started """
+        if self.failed or self.launched >= self.max_runs:
+            return False
+        if len(self.times) + self.running < self.min_runs:
+            return True
+        return self.running == 0 and self.ci() > self.ci_target
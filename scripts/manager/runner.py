@@ -0,0 +1,72 @@
+import asyncio
+import collections
+import os
+import signal
+
+
+class Runner:
+    """Runs commands as asyncio subprocesses.
+
+    Output is read line by line. Only the lines containing the prefix
+    are kept, together with a bounded tail of the output for error
+    reports. A command running longer than the timeout is killed with
+    its whole process group.
+
+    """
+    class Result:
+        def __init__(self):
+            self.returncode = None
+            self.timeout = False
+            self.results = list()
+            self.tail = None
+
+    def __init__(self, prefix, timeout=None, tail=100, grace=10):
+        self.prefix = prefix
+        self.timeout = timeout
+        self.tail = tail
+        self.grace = grace
+
+    async def run(self, command, cwd, env):
+        res = self.Result()
+        res.tail = collections.deque(maxlen=self.tail)
+
+        # Own session, so that the whole process tree can be killed.
+        # Library output for many ranks is a single long line.
+        p = await asyncio.create_subprocess_shell(
+            command, stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT, cwd=cwd, env=env,
+            start_new_session=True, limit=1 << 30)
+
+        # The process may close its output and still hang, so the
+        # timeout covers waiting for the exit as well
+        try:
+            await asyncio.wait_for(self.read(p, res), self.timeout)
+        except asyncio.TimeoutError:
+            res.timeout = True
+            await self.kill(p)
+
+        res.returncode = await p.wait()
+        return res
+
+    async def read(self, p, res):
+        while True:
+            line = await p.stdout.readline()
+            if not line:
+                break
+            line = line.decode('UTF-8', 'replace').rstrip('\n')
+            if self.prefix in line:
+                res.results.append(line)
+            res.tail.append(line)
+        await p.wait()
+
+    async def kill(self, p):
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            try:
+                os.killpg(p.pid, sig)
+            except ProcessLookupError:
+                return
+            try:
+                await asyncio.wait_for(p.wait(), self.grace)
+                return
+            except asyncio.TimeoutError:
+                continue
@@ -0,0 +1,77 @@
+import asyncio
+
+
+class Scheduler:
+    """Launches configurations concurrently on disjoint sets of nodes.
+
+    Configurations are launched in the order they are given. If the
+    next configuration does not fit into the free nodes, later smaller
+    configurations are launched in its place. In exclusive mode only
+    one configuration runs at a time.
+
+    """
+    def __init__(self, nodelist, exclusive=False):
+        self.nodelist = list(nodelist)
+        self.free = list(self.nodelist)
+        self.exclusive = exclusive
+        self.running = dict()
+        self.pending = list()
+
+    def nodes(self, cfg):
+        (run, bench, env) = cfg
+        return min(bench.nodes, len(self.nodelist))
+
+    def allocate(self, count):
+        (nodes, self.free) = (self.free[:count], self.free[count:])
+        return nodes
+
+    def release(self, nodes):
+        self.free = [n for n in self.nodelist if n in self.free or n in nodes]
+
+    def add(self, cfg):
+        """ Queue one more configuration while running """
+        self.pending.append(cfg)
+
+    def fit(self, pending):
+        """ Find index of the next configuration to launch """
+        if self.exclusive:
+            if self.running or not pending:
+                return None
+            return 0
+        # The first configuration, which fits, backfills the free nodes
+        for (i, cfg) in enumerate(pending):
+            if self.nodes(cfg) <= len(self.free):
+                return i
+        return None
+
+    async def run(self, confs, launch):
+        """Await coroutine @launch(cfg, nodes) for every configuration.
+
+        Yields configurations with launch results in the order they
+        complete. A launch, which raises, is reported and yields None
+        like a failed run. More configurations may be queued with add().
+
+        """
+        pending = self.pending
+        pending.extend(confs)
+
+        while pending or self.running:
+            i = self.fit(pending)
+            while i is not None:
+                cfg = pending.pop(i)
+                nodes = self.allocate(self.nodes(cfg))
+                f = asyncio.ensure_future(launch(cfg, nodes))
+                self.running[f] = (cfg, nodes)
+                i = self.fit(pending)
+
+            (done, _) = await asyncio.wait(
+                self.running, return_when=asyncio.FIRST_COMPLETED)
+            for f in done:
+                (cfg, nodes) = self.running.pop(f)
+                self.release(nodes)
+                try:
+                    result = f.result()
+                except Exception as e:
+                    print("Launch failed: {!r}".format(e))
+                    result = None
+                yield (cfg, result)
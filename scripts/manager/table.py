@@ -0,0 +1,48 @@
+class Table:
+    """Campaign matrix as a table of benchmark parameters.
+
+    Every column has an index from value to the set of rows, so that a
+    filter clause is evaluated once per distinct value of its column
+    instead of once per row.
+
+    """
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.index = dict()
+        # Rows, which have a known value in the column
+        self.known = dict()
+
+        for (i, (_, params)) in enumerate(self.rows):
+            for (k, v) in params.items():
+                if callable(v):
+                    continue
+                try:
+                    self.index.setdefault(k, dict()).setdefault(v, set()).add(i)
+                except TypeError:
+                    # Unhashable value, leave it to the filter
+                    continue
+                self.known.setdefault(k, set()).add(i)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, i):
+        return self.rows[i]
+
+    def select(self, filter):
+        """Return indices of rows, which may pass the filter.
+
+        Clauses on columns, which are unknown before a benchmark is
+        constructed, are not checked.
+
+        """
+        ids = set(range(len(self.rows)))
+        for c in filter.clauses:
+            if c.key not in self.index:
+                continue
+            matching = set()
+            for (value, rows) in self.index[c.key].items():
+                if c.match(value):
+                    matching |= rows
+            ids &= matching | (ids - self.known[c.key])
+        return sorted(ids)
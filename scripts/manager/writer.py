@@ -1,14 +1,42 @@
 import csv
 import json
+import os
+import zipfile
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 from . import m
+from .records import Records
 
 class Writer:
-    def __init__(self, filename):
+    # Parameters, which together with the run number identify a
+    # configuration in the output
+    key_params = ('prog', 'nodes', 'np', 'size', 'oversub', 'schedulers',
+                  'affinity')
+
+    def __init__(self, filename, resume=False):
         self.filename = filename
+        # A file left empty by a killed campaign has nothing to resume
+        self.resume = (resume and os.path.isfile(filename) and
+                       os.path.getsize(filename) > 0)
+        self.completed = set()
+        self.wtimes = dict()
 
     def __enter__(self):
-        self.log = open(self.filename, 'w')
+        if self.resume:
+            self.remember(self.load())
+            self.log = open(self.filename, 'a')
+            # Do not glue new rows to a line broken by a crash
+            if self.log.tell() > 0:
+                with open(self.filename, 'rb') as log:
+                    log.seek(-1, os.SEEK_END)
+                    if log.read(1) != b'\n':
+                        self.log.write('\n')
+        else:
+            self.log = open(self.filename, 'w')
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
@@ -19,62 +47,287 @@ class Writer:
             return CsvWriter
         elif writer_type == "json":
             return JsonWriter
+        elif writer_type == "ndjson":
+            return NdjsonWriter
+        elif writer_type == "npz":
+            return NpzWriter
         else:
-            raise Exception("Unknown writer type: {}" % (writer_type))
+            raise Exception("Unknown writer type: {}".format(writer_type))
+
+    def key(self, row):
+        return tuple(str(row.get(k)) for k in ('run',) + self.key_params)
+
+    def wtime(self, results):
+        """ Wall time of a run is the wall time of the slowest rank """
+        return max(float(row['WTIME'] if 'WTIME' in row else row['WTIME_MAX'])
+                   for row in self.parse(results))
+
+    def remember(self, rows):
+        """ Record completed runs and their wall times """
+        for row in rows:
+            key = self.key(row)
+            self.completed.add(key)
+            # Legacy csv rows have lower case names
+            for name in ('WTIME', 'WTIME_MAX', 'wtime'):
+                if row.get(name) is not None:
+                    wtime = float(row[name])
+                    self.wtimes[key] = max(wtime,
+                                           self.wtimes.get(key, wtime))
+                    break
+
+    def done(self, run, bench):
+        """ Check if the output already has results of the run """
+        return self.key(m(bench.__dict__, {'run': run})) in self.completed
+
+    def done_wtime(self, run, bench):
+        """ Wall time of a run present in the output or None """
+        return self.wtimes.get(self.key(m(bench.__dict__, {'run': run})))
 
 class CsvWriter(Writer):
     """CsvWriter expects certain output format for legacy reasons.
     Flexible writing should happen in JsonWriter.
 
     """
-    def __init__(self, filename):
-        super().__init__(filename)
+    # Files written before designs existed have no design column
+    header = ['prog', 'nodes', 'np', 'size', 'oversub', 'run', 'sched',
+              'affinity', 'cpu', 'rank', 'node', 'iter', 'utime', 'wtime',
+              'stime', 'design']
+
+    def __init__(self, filename, resume=False):
+        super().__init__(filename, resume)
+        self.width = len(self.header)
+        if self.resume:
+            with open(filename, 'r') as log:
+                header = next(csv.reader(log), None)
+            if header not in (self.header, self.header[:-1]):
+                raise Exception("Can not resume {}: the csv header is "
+                                "missing".format(filename))
+            self.width = len(header)
 
     def __enter__(self):
         super().__enter__()
         self.csv = csv.writer(self.log)
-        self.csv.writerow(['prog', 'nodes', 'np', 'size', 'oversub', 'run',
-                           'sched', 'affinity', 'cpu', 'rank', 'node', 'iter',
-                           'utime', 'wtime', 'stime'])
+        if not self.resume:
+            # A campaign killed before the first run still leaves a header
+            self.csv.writerow(self.header)
+            self.log.flush()
         return self
 
+    def load(self):
+        with open(self.filename, 'r') as log:
+            for row in csv.DictReader(log):
+                row['schedulers'] = row.pop('sched')
+                yield row
+
+    def parse(self, results):
+        """ Split library output into a dictionary per rank """
+        if isinstance(results, Records):
+            return [m(row, {'RANK': str(rank)})
+                    for (rank, row) in enumerate(results.rows)]
+        return [{k.strip(): v.strip()
+                 for (k, v) in
+                 map(lambda x: x.split(':'),
+                     filter(lambda x: ':' in x,
+                            l.split(',')))}
+                for l in results]
+
     def submit(self, run, bench, results):
-        for l in results:
-            row = {k.strip(): v.strip()
-                   for (k, v) in
-                   map(lambda x: x.split(':'),
-                       filter(lambda x: ':' in x,
-                              l.split(',')))}
+        for row in self.parse(results):
             self.csv.writerow([bench.prog, bench.nodes, bench.np,
                                bench.size, bench.oversub, run,
                                bench.schedulers, bench.affinity,
                                row['CPU'], row['RANK'], row['NODE'],
                                row['ITER'],
-                               row['UTIME'], row['WTIME'], row['STIME']])
+                               row['UTIME'], row['WTIME'], row['STIME'],
+                               getattr(bench, 'design', '')][:self.width])
         self.log.flush()
 
     def __repr__(self):
         return 'csv'
 
 class JsonWriter(Writer):
-    def __init__(self, filename, skiplist = ('wd', 'compile_command', 'tmpl')):
-        super().__init__(filename)
+    def __init__(self, filename, resume=False,
+                 skiplist = ('wd', 'compile_command', 'tmpl')):
+        super().__init__(filename, resume)
         self.name = 'json'
         self.rows = list()
         self.skiplist = skiplist
 
-    def submit(self, run, bench, results):
-        lines = json.loads(results[0])
-        for l in lines["INTERFERENCE"]:
-            bench_dict = {k : v for (k,v) in bench.__dict__.items() if k not in self.skiplist}
+    def __enter__(self):
+        # The list is written as a whole when the campaign ends
+        if self.resume:
+            self.rows = self.load()
+            self.remember(self.rows)
+        return self
+
+    def load(self):
+        with open(self.filename, 'r') as log:
+            return json.load(log)
+
+    def parse(self, results):
+        if isinstance(results, Records):
+            return results.rows
+        output = json.loads(results[0])
+        summary = output.get("INTERFERENCE_SUMMARY", {})
+        return [m(row, summary) for row in output["INTERFERENCE"]]
+
+    def make_rows(self, run, bench, results):
+        bench_dict = {k : v for (k,v) in bench.__dict__.items() if k not in self.skiplist}
+        for l in self.parse(results):
             row = m({'run': run},
                     m(bench_dict, l))
             print(row)
-            self.rows.append(row)
+            yield row
+
+    def submit(self, run, bench, results):
+        self.rows.extend(self.make_rows(run, bench, results))
 
     def __exit__(self, exc_type, exc_value, traceback):
-        json.dump(self.rows, self.log)
-        super().__exit__(exc_type, exc_value, traceback)
+        # Do not lose the old rows, if writing fails halfway
+        tmp = self.filename + '.tmp'
+        with open(tmp, 'w') as log:
+            json.dump(self.rows, log)
+        os.replace(tmp, self.filename)
 
     def __repr__(self):
         return 'json'
+
+
+class NdjsonWriter(JsonWriter):
+    """Writes one json object per line as soon as the run is submitted.
+
+    Nothing is kept in memory and an interrupted campaign keeps all the
+    completed runs. The library output format stays json.
+
+    """
+    def __enter__(self):
+        return Writer.__enter__(self)
+
+    def submit(self, run, bench, results):
+        for row in self.make_rows(run, bench, results):
+            self.log.write(json.dumps(row) + '\n')
+        self.log.flush()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        Writer.__exit__(self, exc_type, exc_value, traceback)
+
+    def load(self):
+        return NdjsonWriter.read(self.filename)
+
+    def read(filename):
+        """ Iterate over the rows of a file without loading it whole """
+        with open(filename, 'r') as log:
+            for line in log:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Empty line or a row broken by a crash
+                    continue
+
+
+class NpzWriter(JsonWriter):
+    """Writes rows column-wise into a compressed numpy .npz archive.
+
+    Rows are buffered and every @chunk rows are converted into typed
+    arrays, one per column, and appended to the archive as
+    '<chunk>/<column>'. The library output format stays json.
+
+    """
+    def __init__(self, filename, resume=False, chunk=1 << 16,
+                 skiplist = ('wd', 'compile_command', 'tmpl')):
+        if numpy is None:
+            raise Exception("NpzWriter requires numpy")
+        super().__init__(filename, resume, skiplist)
+        self.chunk = chunk
+        self.chunks = 0
+        self.columns = dict()
+        self.size = 0
+
+    def __enter__(self):
+        if self.resume:
+            self.remember(self.load())
+            self.chunks = len(NpzWriter.chunk_names(self.filename))
+        elif os.path.exists(self.filename):
+            os.remove(self.filename)
+        return self
+
+    def submit(self, run, bench, results):
+        for row in self.make_rows(run, bench, results):
+            for k in row.keys() - self.columns.keys():
+                self.columns[k] = [None] * self.size
+            for (k, v) in self.columns.items():
+                v.append(row.get(k))
+            self.size += 1
+        if self.size >= self.chunk:
+            self.flush()
+
+    def flush(self):
+        if self.size == 0:
+            return
+        # Reopen the archive for every chunk, so that the file is
+        # complete after each flush
+        with zipfile.ZipFile(self.filename, 'a',
+                             compression=zipfile.ZIP_DEFLATED) as archive:
+            for (k, v) in self.columns.items():
+                name = '{:05d}/{}.npy'.format(self.chunks, k)
+                with archive.open(name, 'w', force_zip64=True) as f:
+                    numpy.lib.format.write_array(f, NpzWriter.array(v))
+        self.chunks += 1
+        self.columns = dict()
+        self.size = 0
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def array(values):
+        """Convert values into int, float or str array, whichever fits.
+
+        Missing values become NaN or empty strings.
+
+        """
+        # int() truncates floats, so only integers and strings qualify
+        if all(isinstance(v, (int, str, numpy.integer)) for v in values):
+            try:
+                return numpy.array([int(v) for v in values], dtype=numpy.int64)
+            except (TypeError, ValueError):
+                pass
+        try:
+            return numpy.array([numpy.nan if v is None else float(v)
+                                for v in values])
+        except (TypeError, ValueError):
+            return numpy.array(['' if v is None else str(v) for v in values])
+
+    def chunk_names(filename):
+        with zipfile.ZipFile(filename, 'r') as archive:
+            return sorted(set(n.split('/')[0] for n in archive.namelist()))
+
+    def read(filename):
+        """ Read a file into a dictionary of column arrays """
+        columns = dict()
+        sizes = list()
+        with numpy.load(filename) as archive:
+            for chunk in NpzWriter.chunk_names(filename):
+                arrays = {k.split('/', 1)[1]: archive[k] for k in archive.files
+                          if k.startswith(chunk + '/')}
+                size = len(next(iter(arrays.values())))
+                for k in arrays.keys() | columns.keys():
+                    if k not in columns:
+                        columns[k] = [NpzWriter.array([None] * n)
+                                      for n in sizes]
+                    columns[k].append(arrays.get(k,
+                                                 NpzWriter.array([None] * size)))
+                sizes.append(size)
+
+        res = dict()
+        for (k, v) in columns.items():
+            try:
+                res[k] = numpy.concatenate(v)
+            except TypeError:
+                # Numeric in one chunk, text in another
+                res[k] = numpy.concatenate([i.astype(str) for i in v])
+        return res
+
+    def load(self):
+        columns = NpzWriter.read(self.filename)
+        for i in range(len(columns['run'])):
+            yield {k: v[i].item() for (k, v) in columns.items()}
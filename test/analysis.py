@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+import json
+import os
+import tempfile
+import unittest
+
+from scripts.interference import Analysis, CsvWriter, NdjsonWriter
+
+
+class Bench:
+    def __init__(self, prog, schedulers):
+        self.prog = prog
+        self.nodes = 1
+        self.np = 2
+        self.size = 'C'
+        self.oversub = 1
+        self.schedulers = schedulers
+        self.affinity = '0-7'
+
+
+def results(wtime, ranks=2):
+    return ['INTERFERENCE ,RANK: {} ,CPU: -1 ,NODE: n0 ,ITER: 1'
+            ' ,UTIME: 10 ,WTIME: {} ,STIME: 1'.format(i, wtime - i)
+            for i in range(ranks)]
+
+
+class TestAnalysis(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.out = os.path.join(self.dir.name, 'out.csv')
+
+        with CsvWriter(self.out) as writer:
+            for (run, wtime) in enumerate((100, 104, 102)):
+                writer.submit(run, Bench('ep', 'cfs'), results(wtime))
+            for (run, wtime) in enumerate((150, 160, 155, 100)):
+                writer.submit(run, Bench('ep', 'fifo_cyclic'), results(wtime))
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_stats(self):
+        stats = Analysis([self.out]).stats()
+
+        self.assertEqual(list(stats['schedulers']), ['cfs', 'fifo_cyclic'])
+        self.assertEqual(list(stats['runs']), [3, 4])
+        self.assertEqual(list(stats['WTIME_median']), [102, 152.5])
+        self.assertEqual(list(stats['WTIME_max']), [104, 160])
+        self.assertEqual(list(stats['UTIME_mean']), [20, 20])
+        self.assertEqual(list(stats['WTIME_slowdown']), [1, 152.5 / 102])
+        self.assertAlmostEqual(stats['WTIME_ci95'][0], 4.303 * 2 / 3**0.5)
+        self.assertNotIn('RANK_median', stats)
+
+    def test_reduced(self):
+        out = os.path.join(self.dir.name, 'out.log')
+        # Two nodes of different size, reduced in the library
+        nodes = [{'NODE': 'n0', 'RANKS': '3', 'WTIME_MIN': '90',
+                  'WTIME_MAX': '100', 'WTIME_MEAN': '95.000000'},
+                 {'NODE': 'n1', 'RANKS': '1', 'WTIME_MIN': '80',
+                  'WTIME_MAX': '80', 'WTIME_MEAN': '80.000000'}]
+        with NdjsonWriter(out) as writer:
+            results = [json.dumps({'INTERFERENCE': nodes})]
+            self.assertEqual(writer.wtime(results), 100)
+            writer.submit(0, Bench('ep', 'cfs'), results)
+
+        stats = Analysis([out]).stats()
+        self.assertEqual(list(stats['WTIME_median']), [100])
+        self.assertEqual(list(stats['WTIME_MIN_median']), [80])
+        self.assertEqual(list(stats['WTIME_MEAN_median']), [(3 * 95 + 80) / 4])
+        self.assertEqual(list(stats['RANKS_median']), [4])
+
+    def test_percentiles(self):
+        out = os.path.join(self.dir.name, 'out.log')
+        rows = [{'RANK': str(i), 'WTIME': '100',
+                 'MPI_BARRIER_P99_US': '20.480000'} for i in range(4)]
+        with NdjsonWriter(out) as writer:
+            writer.submit(0, Bench('ep', 'cfs'),
+                          [json.dumps({'INTERFERENCE': rows})])
+
+        stats = Analysis([out]).stats()
+        self.assertEqual(list(stats['MPI_BARRIER_P99_US_median']), [20.48])
+
+    def test_iterations(self):
+        out = os.path.join(self.dir.name, 'out.log')
+        rows = [{'RANK': str(i), 'WTIME': '100', 'ITER': str(50 - i),
+                 'ITER_US_MIN': str(900 + i), 'ITER_US_P99': str(2000 + i),
+                 'ITER_US_MEAN': str(1000 + 2 * i)} for i in range(2)]
+        with NdjsonWriter(out) as writer:
+            writer.submit(0, Bench('ep', 'cfs'),
+                          [json.dumps({'INTERFERENCE': rows})])
+
+        stats = Analysis([out]).stats()
+        self.assertEqual(list(stats['ITER_US_MIN_median']), [900])
+        self.assertEqual(list(stats['ITER_US_P99_median']), [2001])
+        self.assertEqual(list(stats['ITER_US_MEAN_median']), [1001])
+        self.assertEqual(list(stats['ITER_median']), [50])
+
+    def test_float_rows(self):
+        columns = Analysis.from_rows([{'SCALE': 0.5}, {'SCALE': 1.5}])
+        self.assertEqual(list(columns['SCALE']), [0.5, 1.5])
+
+    def test_regions(self):
+        out = os.path.join(self.dir.name, 'out.log')
+        rows = [{'RANK': str(i), 'WTIME': '100', 'solver:WTIME': str(80 + i),
+                 'solver:UTIME': '70'} for i in range(2)]
+        with NdjsonWriter(out) as writer:
+            writer.submit(0, Bench('ep', 'cfs'),
+                          [json.dumps({'INTERFERENCE': rows})])
+
+        stats = Analysis([out]).stats()
+        self.assertEqual(list(stats['solver:WTIME_median']), [81])
+        self.assertEqual(list(stats['solver:UTIME_median']), [140])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,7 @@
 
 import unittest
 
-from scripts.interference import Filter
+from scripts.interference import BenchGroup, Benchmark, EmptyFilter, Filter
 
 
 class TestFilterObject(unittest.TestCase):
@@ -26,6 +26,73 @@ class TestFilterObject(unittest.TestCase):
         self.assertEqual(filter.skip(bench_pass), False)
         self.assertEqual(filter.skip(bench_fail), True)
 
+    def test_language(self):
+        class Bench:
+            def __init__(self, prog, nodes):
+                self.prog = prog
+                self.nodes = nodes
+
+        benchmarks = [Bench(p, n) for p in ('ep', 'bt', 'bt-mz')
+                      for n in (1, 2, 4, 8)]
+
+        def select(filter_str):
+            filter = Filter.create_filter(filter_str)
+            return [(b.prog, b.nodes) for b in benchmarks
+                    if not filter.skip(b)]
+
+        self.assertEqual(select('prog=ep:nodes>=4'), [('ep', 4), ('ep', 8)])
+        self.assertEqual(select('prog~^bt:nodes<2'),
+                         [('bt', 1), ('bt-mz', 1)])
+        self.assertEqual(select('prog!~mz:nodes>4'), [('ep', 8), ('bt', 8)])
+        self.assertEqual(len(select('!prog=ep,bt')), 4)
+        self.assertEqual(select('prog!=ep,bt:!nodes<=4'), [('bt-mz', 8)])
+        self.assertRaises(Exception, Filter.create_filter, 'nodes>2,4')
+
+
+class TestBenchGroup(unittest.TestCase):
+    class Bench(Benchmark):
+        built = 0
+
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            TestBenchGroup.Bench.built += 1
+
+    def setUp(self):
+        def np_func(nodes, oversub):
+            return nodes * oversub * 16
+
+        self.Bench.built = 0
+        self.group = BenchGroup(self.Bench, prog=('ep', 'lu'),
+                                nodes=(2, 4, 8), oversub=(1, 2),
+                                np=np_func, wd='/tmp')
+        self.group += BenchGroup(self.Bench, prog=('cg',),
+                                 nodes=(2, 4), oversub=(1,),
+                                 np=np_func, wd='/tmp')
+
+    def test_lazy(self):
+        self.assertEqual(self.Bench.built, 0)
+        self.assertEqual(len(list(self.group.select(EmptyFilter()))), 14)
+        self.assertEqual(self.Bench.built, 14)
+
+    def test_pushdown(self):
+        benchmarks = list(self.group.select(
+            Filter.create_filter('prog=ep:nodes=2')))
+        self.assertEqual([b.np for b in benchmarks], [32, 64])
+        self.assertEqual(self.Bench.built, 2)
+
+    def test_resolved(self):
+        benchmarks = list(self.group.select(
+            Filter.create_filter('nodes=4:np=64')))
+        self.assertEqual([b.prog for b in benchmarks], ['ep', 'lu', 'cg'])
+        self.assertEqual(self.Bench.built, 5)
+
+    def test_index(self):
+        benchmarks = list(self.group.select(
+            Filter.create_filter('prog~^(ep|cg)$:nodes>2:!oversub=2')))
+        self.assertEqual([(b.prog, b.nodes) for b in benchmarks],
+                         [('ep', 4), ('ep', 8), ('cg', 4)])
+        self.assertEqual(self.Bench.built, 3)
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
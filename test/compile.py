@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from argparse import Namespace
+
+from scripts.interference import Cache, EmptyFilter, Lib, Machine
+from conf import Miniapp
+
+
+class Bench:
+    def __init__(self, prog, wd, schedulers):
+        self.prog = prog
+        self.wd = wd
+        self.schedulers = schedulers
+        self.compile_command = 'make ' + prog
+        self.fail = False
+
+    def __eq__(self, other):
+        return (self.prog, self.wd) == (other.prog, other.wd)
+
+    def __hash__(self):
+        return hash((self.prog, self.wd))
+
+    def sources(self):
+        return []
+
+    def binary(self):
+        return os.path.join(self.wd, self.prog)
+
+    def compile(self, env):
+        with Bench.lock:
+            Bench.compiled.append(self.prog)
+            Bench.active[self.wd] = Bench.active.get(self.wd, 0) + 1
+            Bench.overlap |= Bench.active[self.wd] > 1
+        time.sleep(0.01)
+        with Bench.lock:
+            Bench.active[self.wd] -= 1
+        self.fail = self.prog == 'bad'
+
+
+class TestCompileBenchmarks(unittest.TestCase):
+    def setUp(self):
+        Bench.lock = threading.Lock()
+        Bench.compiled = []
+        Bench.active = {}
+        Bench.overlap = False
+
+        self.machine = Machine.__new__(Machine)
+        self.machine.args = Namespace(jobs=4, cache=False,
+                                      filter=EmptyFilter())
+        self.machine.suffix = 'test'
+        self.machine.env = {}
+
+    def test_deduplicate(self):
+        self.machine.benchmarks = [Bench(p, wd, s)
+                                   for p in ('ep', 'bad')
+                                   for wd in ('a', 'b')
+                                   for s in ('cfs', 'fifo_cyclic')]
+        self.machine.compile_benchmarks()
+
+        self.assertEqual(sorted(Bench.compiled), ['bad', 'bad', 'ep', 'ep'])
+        self.assertFalse(Bench.overlap)
+        for b in self.machine.benchmarks:
+            self.assertEqual(b.fail, b.prog == 'bad')
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.machine = Machine.__new__(Machine)
+        self.machine.args = Namespace(cache=True)
+        self.machine.suffix = 'test'
+        self.machine.env = {}
+        self.cwd = os.getcwd()
+        os.chdir(self.dir.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.dir.cleanup()
+
+    def test_binary_and_command(self):
+        bench = Bench('ep', self.dir.name, 'cfs')
+        with Cache(self.machine) as cache:
+            self.assertNotIn(bench, cache)
+            cache.add(bench)
+            # Binary was not produced
+            self.assertNotIn(bench, cache)
+
+        open(bench.binary(), 'w').close()
+        with Cache(self.machine) as cache:
+            self.assertIn(bench, cache)
+            self.assertFalse(cache[bench])
+
+        bench.compile_command = 'make ep CLASS=D'
+        with Cache(self.machine) as cache:
+            self.assertNotIn(bench, cache)
+
+    def test_miniapp_sources(self):
+        base = os.path.join(self.dir.name, 'CoMD')
+        os.makedirs(os.path.join(base, 'bin'))
+        os.makedirs(os.path.join(base, 'src-mpi'))
+        source = os.path.join(base, 'src-mpi', 'CoMD.c')
+        open(source, 'w').close()
+        open(os.path.join(base, 'bin', 'CoMD-mpi'), 'w').close()
+
+        bench = Miniapp(prog='CoMD-mpi', np=2, size=1, tmpl='./{prog}',
+                        wd=os.path.join(base, 'bin') + '/',
+                        compile_command='cd ../src-mpi ; make')
+        self.assertEqual(bench.sources(), [source])
+
+    def test_truncated_manifest(self):
+        bench = Bench('bad', self.dir.name, 'cfs')
+        bench.fail = True
+        with Cache(self.machine) as cache:
+            cache.add(bench)
+        with open(Cache(self.machine).name(), 'a') as f:
+            f.write('{"key": "trunc')
+
+        with Cache(self.machine) as cache:
+            self.assertIn(bench, cache)
+            self.assertTrue(cache[bench])
+            other = Bench('ep', self.dir.name, 'cfs')
+            cache.add(other)
+
+        with Cache(self.machine) as cache:
+            self.assertIn(bench, cache)
+            self.assertNotIn(other, cache)
+            self.assertEqual(cache.lines, 2)
+
+
+class TestPrepare(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        root = self.dir.name
+
+        class Local(Machine):
+            def get_install_path(self, mpilib):
+                return os.path.join(root, 'install-' + mpilib.name) + '/'
+
+            def get_build_path(self, mpilib):
+                return os.path.join(root, 'build-' + mpilib.name) + '/'
+
+        self.machine = Local.__new__(Local)
+        self.machine.args = Namespace(jobs=4)
+        self.machine.env = {}
+        self.machine.mpilib = Lib('openmpi')
+        self.machine.mpilibs = {'openmpi': self.machine.mpilib,
+                                'mvapich': Lib('mvapich')}
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_select(self):
+        self.assertEqual([l.name for l in self.machine.select_libs('default')],
+                         ['openmpi'])
+        libs = self.machine.select_libs('mvapich,openmpi')
+        self.assertEqual([l.name for l in libs], ['mvapich', 'openmpi'])
+        with self.assertRaises(Exception):
+            self.machine.select_libs('mpich')
+
+    def test_stamp(self):
+        mpilib = self.machine.mpilib
+        stamp = self.machine.lib_stamp(mpilib)
+        self.assertEqual(stamp, self.machine.lib_stamp(mpilib))
+        other = Lib('openmpi', compile_flags='-Dtest=OFF')
+        self.assertNotEqual(stamp, self.machine.lib_stamp(other))
+        self.machine.env['CC'] = 'clang'
+        self.assertNotEqual(stamp, self.machine.lib_stamp(mpilib))
+
+    def test_jobs(self):
+        self.assertEqual(self.machine.lib_jobs(), 4)
+        self.machine.args.jobs = None
+        self.assertEqual(self.machine.lib_jobs(), os.cpu_count())
+
+    def test_up_to_date(self):
+        mpilib = self.machine.mpilib
+        install = self.machine.get_install_path(mpilib)
+        os.makedirs(install + 'usr/local/lib')
+        open(install + 'usr/local/lib/libinterference.so', 'w').close()
+        with open(install + '.stamp', 'w') as f:
+            f.write(self.machine.lib_stamp(mpilib) + '\n')
+
+        self.machine.compile_lib(mpilib)
+        self.assertFalse(os.path.exists(self.machine.get_build_path(mpilib)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+import itertools
+import unittest
+
+from scripts.interference import BenchGroup, Benchmark, Design, \
+    EmptyFilter, Filter
+
+
+class TestDesign(unittest.TestCase):
+    def setUp(self):
+        self.levels = {'nodes': (1, 2, 4, 8), 'oversub': (1, 2, 4, 12),
+                       'prog': ('ep', 'lu', 'mg')}
+        self.rows = [dict(zip(self.levels, p))
+                     for p in itertools.product(*self.levels.values())]
+
+    def test_parse(self):
+        self.assertEqual(str(Design('lhs:8')), 'lhs:8:seed=0')
+        self.assertEqual(Design('fractional').size, 2)
+        self.assertRaises(Exception, Design, 'lhs')
+        self.assertRaises(Exception, Design, 'box:3')
+
+    def test_random(self):
+        a = Design('random:10', seed=1).sample(self.rows)
+        b = Design('random:10', seed=1).sample(self.rows)
+        c = Design('random:10', seed=2).sample(self.rows)
+        self.assertEqual(len(a), 10)
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, c)
+
+    def test_lhs(self):
+        ids = Design('lhs:12', seed=3).sample(self.rows)
+        self.assertEqual(len(ids), 12)
+        self.assertEqual(ids, Design('lhs:12', seed=3).sample(self.rows))
+        # Every level of every factor is covered equally often
+        for (k, levels) in self.levels.items():
+            counts = [sum(self.rows[i][k] == l for i in ids) for l in levels]
+            self.assertEqual(counts, [12 // len(levels)] * len(levels))
+
+    def test_fractional(self):
+        ids = Design('fractional').sample(self.rows)
+        self.assertEqual(len(ids), len(self.rows) // 2)
+        for (k, levels) in self.levels.items():
+            counts = [sum(self.rows[i][k] == l for i in ids) for l in levels]
+            self.assertEqual(len(set(counts)), 1)
+
+    def test_group(self):
+        group = BenchGroup(Benchmark, wd='/tmp', **self.levels)
+        benchmarks = list(group.select(EmptyFilter(), Design('lhs:4')))
+        self.assertEqual(len(benchmarks), 4)
+        self.assertEqual(sorted(b.nodes for b in benchmarks), [1, 2, 4, 8])
+        self.assertEqual(benchmarks[0].design, 'lhs:4:seed=0')
+
+
+    def test_derived_filter(self):
+        class Derived(Benchmark):
+            def __init__(self, **kwargs):
+                super().__init__(**kwargs)
+                self.np = self.nodes * self.oversub
+
+        group = BenchGroup(Derived, wd='/tmp', **self.levels)
+        benchmarks = list(group.select(Filter('np<=8'), Design('random:6')))
+        self.assertEqual(len(benchmarks), 6)
+        self.assertTrue(all(b.np <= 8 for b in benchmarks))
+
+if __name__ == '__main__':
+    unittest.main()
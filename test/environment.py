@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+import unittest
+
+from scripts.interference import Environment
+
+
+class Machine:
+    pass
+
+
+class Counting(Environment):
+    def evaluate(self, env):
+        self.evaluated += 1
+        return super().evaluate(env)
+
+
+class TestEnvironment(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.dir.name)
+
+        self.envfile = os.path.join(self.dir.name, 'mini.env')
+        with open(self.envfile, 'w') as f:
+            f.write('export LOADED=yes\nunset DROPPED\n')
+        self.machine = Machine()
+        self.machine.modules_load = 'source ' + self.envfile
+        self.env = {'PATH': os.environ['PATH'], 'DROPPED': '1',
+                    'INTERFERENCE_PREFIX': 'INTERFERENCE'}
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.dir.cleanup()
+
+    def apply(self, env):
+        environment = Counting(self.machine)
+        environment.evaluated = 0
+        return (environment.apply(env), environment.evaluated)
+
+    def test_snapshot(self):
+        (env, evaluated) = self.apply(self.env)
+        self.assertEqual(evaluated, 1)
+        self.assertEqual(env['LOADED'], 'yes')
+        self.assertNotIn('DROPPED', env)
+        self.assertEqual(env['INTERFERENCE_PREFIX'], 'INTERFERENCE')
+        self.assertNotIn('SHLVL', env)
+        self.assertIn('DROPPED', self.env)
+
+        # Variables set after the snapshot are kept
+        self.env['INTERFERENCE_PERF'] = 'instructions'
+        (env, evaluated) = self.apply(self.env)
+        self.assertEqual(evaluated, 0)
+        self.assertEqual(env['LOADED'], 'yes')
+        self.assertEqual(env['INTERFERENCE_PERF'], 'instructions')
+
+    def test_invalidate(self):
+        self.apply(self.env)
+        with open(self.envfile, 'a') as f:
+            f.write('export LOADED=again\n')
+        (env, evaluated) = self.apply(self.env)
+        self.assertEqual(evaluated, 1)
+        self.assertEqual(env['LOADED'], 'again')
+
+        self.env['PATH'] = '/bin:' + self.env['PATH']
+        (env, evaluated) = self.apply(self.env)
+        self.assertEqual(evaluated, 1)
+
+
+    def test_failure(self):
+        with open(self.envfile, 'a') as f:
+            f.write('false\n')
+        with self.assertRaises(Exception):
+            self.apply(self.env)
+        self.assertFalse(os.path.exists(Environment(self.machine).name()))
+
+if __name__ == '__main__':
+    unittest.main()
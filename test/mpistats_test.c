@@ -0,0 +1,109 @@
+#include "mpistats.h"
+
+#include <assert.h>
+#include <pthread.h>
+#include <string.h>
+
+static void bucket_test(void)
+{
+  uint64_t ns;
+  int bucket;
+
+  for (ns = 0; ns < 4; ns++)
+    assert(mpistats_bucket(ns) == (int)ns);
+
+  assert(mpistats_bucket(4) == 4);
+  assert(mpistats_bucket(7) == 7);
+  assert(mpistats_bucket(8) == 8);
+  assert(mpistats_bucket(1ull << 50) == MPISTATS_BUCKETS - 1);
+
+  /* Every duration is below the limit of its bucket and not below the
+   * limit of the previous one */
+  for (ns = 1; ns < (1ull << 41); ns = ns * 5 / 4 + 1) {
+    bucket = mpistats_bucket(ns);
+    assert(bucket < MPISTATS_BUCKETS);
+    assert(mpistats_bucket_limit(bucket) > ns);
+    assert(mpistats_bucket_limit(bucket - 1) <= ns);
+  }
+
+  /* Limits grow with the buckets */
+  for (bucket = 1; bucket < MPISTATS_BUCKETS; bucket++)
+    assert(mpistats_bucket_limit(bucket) > mpistats_bucket_limit(bucket - 1));
+}
+
+static void accounting_test(void)
+{
+  struct mpistats total;
+  uint64_t start, hist;
+  int b;
+
+  /* Nothing is accounted before the start */
+  start = mpistats_begin();
+  assert(start == 0);
+  mpistats_end(MPISTATS_P2P, MPISTATS_OP(MPI_Send), start, 8);
+
+  mpistats_start();
+  start = mpistats_begin();
+  assert(start != 0);
+  mpistats_end(MPISTATS_P2P, MPISTATS_OP(MPI_Send), start, 8);
+  start = mpistats_begin();
+  mpistats_end(MPISTATS_P2P, MPISTATS_OP(MPI_Recv), start, 16);
+  start = mpistats_begin();
+  mpistats_end(MPISTATS_COLL, MPISTATS_OP(MPI_Barrier), start, 0);
+  mpistats_stop(&total);
+
+  assert(total.calls[MPISTATS_P2P] == 2);
+  assert(total.bytes[MPISTATS_P2P] == 24);
+  assert(total.calls[MPISTATS_COLL] == 1);
+  assert(total.calls[MPISTATS_WAIT] == 0);
+  assert(total.ns[MPISTATS_WAIT] == 0);
+
+  hist = 0;
+  for (b = 0; b < MPISTATS_BUCKETS; b++)
+    hist += total.hist[MPISTATS_OP(MPI_Send)][b];
+  assert(hist == 1);
+
+  /* A new start resets the counts */
+  mpistats_start();
+  mpistats_stop(&total);
+  assert(total.calls[MPISTATS_P2P] == 0);
+  assert(total.ns[MPISTATS_P2P] == 0);
+}
+
+static void *mark_iterations(void *arg)
+{
+  int i;
+
+  for (i = 0; i < 10; i++)
+    mpistats_mark(MPISTATS_OP(MPI_Barrier));
+  return NULL;
+}
+
+static void iteration_test(void)
+{
+  uint64_t times[2];
+  pthread_t thread;
+  int i;
+
+  /* Every second barrier ends an iteration, the first one starts it */
+  mpistats_iter_start(MPISTATS_OP(MPI_Barrier), 2, times, 2);
+  for (i = 0; i < 8; i++) {
+    mpistats_mark(MPISTATS_OP(MPI_Barrier));
+    mpistats_mark(MPISTATS_OP(MPI_Allreduce));
+  }
+
+  /* Other threads do not mark iterations */
+  pthread_create(&thread, NULL, mark_iterations, NULL);
+  pthread_join(thread, NULL);
+
+  assert(mpistats_iter_stop() == 3);
+  mpistats_mark(MPISTATS_OP(MPI_Barrier));
+}
+
+int main(int argc, char **argv)
+{
+  bucket_test();
+  accounting_test();
+  iteration_test();
+  return 0;
+}
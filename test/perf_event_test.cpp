@@ -0,0 +1,108 @@
+#include <string>
+#include <cassert>
+#include <stdexcept>
+
+#include <dirent.h>
+
+#include "perf.hpp"
+
+static bool fails(const std::string &event)
+{
+  struct perf_event_attr attr;
+  try {
+    build_perf_attr(&attr, event);
+  } catch (std::runtime_error &e) {
+    return true;
+  }
+  return false;
+}
+
+void perf_event_test()
+{
+  struct perf_event_attr attr;
+
+  {
+    build_perf_attr(&attr, "instructions");
+
+    assert(attr.type == PERF_TYPE_HARDWARE);
+    assert(attr.config == PERF_COUNT_HW_INSTRUCTIONS);
+    assert(attr.exclude_kernel && !attr.exclude_user);
+  }
+
+  {
+    build_perf_attr(&attr, "context_switches");
+
+    assert(attr.type == PERF_TYPE_SOFTWARE);
+    assert(!attr.exclude_kernel);
+  }
+
+  {
+    build_perf_attr(&attr, "LLC:read:miss");
+
+    assert(attr.type == PERF_TYPE_HW_CACHE);
+    assert(attr.config == (PERF_COUNT_HW_CACHE_LL |
+                           (PERF_COUNT_HW_CACHE_OP_READ << 8) |
+                           (PERF_COUNT_HW_CACHE_RESULT_MISS << 16)));
+  }
+
+  {
+    build_perf_attr(&attr, "L1D:write:access:k");
+
+    assert(attr.type == PERF_TYPE_HW_CACHE);
+    assert(attr.config == (PERF_COUNT_HW_CACHE_L1D |
+                           (PERF_COUNT_HW_CACHE_OP_WRITE << 8) |
+                           (PERF_COUNT_HW_CACHE_RESULT_ACCESS << 16)));
+    assert(!attr.exclude_kernel && attr.exclude_user);
+  }
+
+  {
+    build_perf_attr(&attr, "r1a2b:uk");
+
+    assert(attr.type == PERF_TYPE_RAW);
+    assert(attr.config == 0x1a2b);
+    assert(!attr.exclude_kernel && !attr.exclude_user);
+  }
+
+  {
+    build_perf_attr(&attr, "migrations:u");
+
+    assert(attr.exclude_kernel && !attr.exclude_user);
+  }
+
+  assert(fails("cycles"));
+  assert(fails("LLC:read"));
+  assert(fails("LLC:read:hit"));
+  assert(fails("L2:read:miss"));
+  assert(fails("r"));
+  assert(fails("rxyz"));
+  assert(fails("instructions:x"));
+}
+
+static int open_fds()
+{
+  int count = 0;
+  DIR *dir = opendir("/proc/self/fd");
+  while (readdir(dir))
+    count++;
+  closedir(dir);
+  return count;
+}
+
+void perf_group_test()
+{
+  int before = open_fds();
+
+  // The last event fails after the others were opened
+  try {
+    PerfCounter cnt(1, "PERF_SW", {"task_clock", "page_faults", "cycles"});
+    assert(false);
+  } catch (std::runtime_error &e) {
+  }
+  assert(open_fds() == before);
+}
+
+int main(int argc, char **argv)
+{
+  perf_event_test();
+  perf_group_test();
+}
@@ -4,17 +4,9 @@
 
 #include <unistd.h>
 
-class MyPerfCounter : public PerfCounter
-{
-protected:
-  using PerfCounter::PerfCounter;
-
-  void exchange() override {_values.push_back(_value);}
-};
-
 int main(int argc, char **argv)
 {
-  MyPerfCounter cnt(1, "migrations");
+  PerfCounter cnt(1, "PERF_SW", {"migrations", "context_switches"});
 
   cnt.start_accounting();
   for (int i = 0; i < 100; i++) {
@@ -29,7 +21,14 @@ int main(int argc, char **argv)
     usleep(1000);
   }
   cnt.end_accounting();
-  CounterMap map = cnt.emit();
+
+  size_t size = 0;
+  for (const auto &f : cnt.fields())
+    size += f.size;
+  std::vector<char> record(size);
+  cnt.pack(record.data());
+
+  CounterMap map = cnt.emit(record.data(), 1, size);
   for (const auto &i : map) {
     std::cout << i.first << ": ";
     for (const auto &j : i.second)
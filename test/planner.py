@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+import unittest
+
+from scripts.interference import CsvWriter, Planner
+
+
+class Bench:
+    def __init__(self, prog, nodes, size):
+        self.prog = prog
+        self.nodes = nodes
+        self.np = nodes * 16
+        self.size = size
+        self.oversub = 1
+        self.schedulers = 'cfs'
+        self.affinity = '0-15'
+
+
+def results(wtime):
+    return ['INTERFERENCE ,RANK: 0 ,CPU: -1 ,NODE: n0 ,ITER: 1'
+            ' ,UTIME: 10 ,WTIME: {} ,STIME: 1'.format(wtime)]
+
+
+class TestPlanner(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.out = os.path.join(self.dir.name, 'out.csv')
+
+        # Time halves with twice the nodes, class D takes 8 times longer
+        # and lu 4 times longer than ep
+        with CsvWriter(self.out) as writer:
+            for (prog, size, factor) in (('ep', 'C', 1), ('ep', 'D', 8),
+                                         ('lu', 'C', 4)):
+                for nodes in (2, 4, 8):
+                    bench = Bench(prog, nodes, size)
+                    for run in range(3):
+                        wtime = 64000 * factor // nodes + run
+                        writer.submit(run, bench, results(wtime))
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_predict(self):
+        planner = Planner([self.out])
+        self.assertAlmostEqual(planner.predict(Bench('ep', 4, 'C')), 16.001)
+        self.assertAlmostEqual(planner.predict(Bench('ep', 16, 'D')), 32,
+                               delta=0.1)
+        self.assertAlmostEqual(planner.predict(Bench('lu', 16, 'D')), 128,
+                               delta=0.5)
+        self.assertIsNone(planner.predict(Bench('ep', 16, 'E')))
+        self.assertIsNone(planner.predict(Bench('bt', 16, 'C')))
+        self.assertIsNone(Planner([]).predict(Bench('ep', 4, 'C')))
+
+    def test_chunks(self):
+        chunks = Planner([]).chunks([(5, 'a'), (3, 'b'), (4, 'c'), (2, 'd'),
+                                     (12, 'e')], 10)
+        self.assertEqual(chunks, [[12, ['e']], [9, ['a', 'c']],
+                                  [5, ['b', 'd']]])
+
+    def test_time(self):
+        self.assertEqual(Planner.parse_time('30'), 1800)
+        self.assertEqual(Planner.parse_time('1:30'), 90)
+        self.assertEqual(Planner.parse_time('2:00:10'), 7210)
+        self.assertEqual(Planner.parse_time('1-2'), 93600)
+        self.assertEqual(Planner.parse_time('1-00:00:01'), 86401)
+        self.assertEqual(Planner.format_time(93661), '1-02:01:01')
+
+
+if __name__ == '__main__':
+    unittest.main()
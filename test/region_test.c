@@ -0,0 +1,22 @@
+#include "mpi.h"
+
+#include "interference.h"
+
+int main(int argc, char **argv) {
+
+  MPI_Init(&argc, &argv);
+
+  interference_region_begin("setup");
+  MPI_Barrier(MPI_COMM_WORLD);
+  interference_region_end("setup");
+
+  for (int i = 0; i < 3; i++) {
+    interference_region_begin("solver");
+    MPI_Barrier(MPI_COMM_WORLD);
+    interference_region_end("solver");
+  }
+
+  MPI_Finalize();
+
+  return 0;
+}
@@ -0,0 +1,90 @@
+#include "regions.hpp"
+
+#include <cassert>
+#include <cstring>
+#include <stdexcept>
+
+#include "nlohmann/json.hpp"
+
+using json = nlohmann::json;
+
+// Cumulative counter, which grows by one with every read
+class Ticks : public Counter {
+  int64_t _ticks = 0;
+
+public:
+  Ticks() : Counter("TICKS") {}
+
+  void start_accounting() override {}
+  void end_accounting() override {}
+  Fields fields() override { return {{_name, Field::INT, sizeof(int64_t)}}; }
+  void pack(char *record) override { store<int64_t>(record, _ticks); }
+  bool cumulative() override { return true; }
+  void pack_current(char *record) override {
+    store<int64_t>(record, ++_ticks);
+  }
+};
+
+static bool throws(void (Regions::*call)(const char *, size_t),
+                   Regions &regions, const char *name)
+{
+  try {
+    (regions.*call)(name, strlen(name));
+  } catch (const std::runtime_error &) {
+    return true;
+  }
+  return false;
+}
+
+static CounterMap emit(Regions &regions)
+{
+  std::vector<char> record(regions.fields()[0].size);
+  regions.pack(record.data());
+  return regions.emit(record.data(), 1, record.size());
+}
+
+int main(int argc, char **argv)
+{
+  Ticks ticks;
+  Regions regions("REGIONS", {&ticks}, 3);
+
+  auto meta = json::parse(regions.fields()[0].meta);
+  assert(meta["slots"] == 3);
+  assert((meta["columns"] == json{"COUNT", "TICKS"}));
+
+  // Nothing is accounted outside of the run
+  regions.begin("setup", 5);
+  regions.end("setup", 5);
+  assert(emit(regions).empty());
+
+  regions.start_accounting();
+  regions.begin("setup", 5);
+  regions.end("setup", 5);
+  for (int i = 0; i < 3; i++) {
+    regions.begin("solver", 6);
+    regions.end("solver", 6);
+  }
+
+  // The name need not be terminated
+  regions.begin("solver loop", 6);
+  assert(throws(&Regions::begin, regions, "solver"));
+  regions.end("solver", 6);
+
+  // Ending an unknown region does not take a slot
+  assert(throws(&Regions::end, regions, "output"));
+  regions.begin("output", 6);
+  regions.end("output", 6);
+  assert(throws(&Regions::begin, regions, "extra"));
+  assert(throws(&Regions::begin, regions, ""));
+  regions.end_accounting();
+
+  auto map = emit(regions);
+  assert(map.size() == 6);
+  assert(map["output:COUNT"] == std::vector<std::string>{"1"});
+  assert(map["setup:COUNT"] == std::vector<std::string>{"1"});
+  assert(map["setup:TICKS"] == std::vector<std::string>{"1"});
+  assert(map["solver:COUNT"] == std::vector<std::string>{"4"});
+  assert(map["solver:TICKS"] == std::vector<std::string>{"4"});
+
+  return 0;
+}
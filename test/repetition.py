@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+
+import json
+import os
+import tempfile
+import unittest
+from argparse import Namespace
+
+from scripts.interference import Machine, NdjsonWriter, Repetition
+
+
+class TestRepetition(unittest.TestCase):
+    def run_times(self, rep, times):
+        for t in times:
+            self.assertTrue(rep.more())
+            rep.launch()
+            rep.add(t)
+        return rep.more()
+
+    def test_stable(self):
+        rep = Repetition(0.02, 3, 10, 0.25)
+        self.assertFalse(self.run_times(rep, [100, 101, 100]))
+        self.assertLess(rep.ci(), 0.02)
+
+    def test_noisy(self):
+        rep = Repetition(0.02, 3, 6, 0.5)
+        self.assertTrue(self.run_times(rep, [100, 120, 90, 110, 95]))
+        self.assertFalse(self.run_times(rep, [105]))
+        self.assertEqual(rep.launched, 6)
+
+    def test_outlier(self):
+        rep = Repetition(0.02, 3, 10, 0.25)
+        rep.launch()
+        rep.launch()
+        rep.launch()
+        self.assertTrue(rep.add(100))
+        self.assertTrue(rep.add(101))
+        self.assertFalse(rep.add(200))
+        self.assertEqual(rep.times, [100, 101])
+        self.assertTrue(rep.more())
+
+    def test_concurrent(self):
+        rep = Repetition(0.02, 3, 10, 0.25)
+        for i in range(3):
+            self.assertTrue(rep.more())
+            rep.launch()
+        # Wait for running runs before deciding on more
+        self.assertFalse(rep.more())
+        rep.add(100)
+        rep.add(130)
+        self.assertFalse(rep.more())
+        rep.add(90)
+        self.assertTrue(rep.more())
+
+
+    def test_failure(self):
+        rep = Repetition(0.02, 3, 10, 0.25)
+        rep.launch()
+        rep.launch()
+        self.assertTrue(rep.add(100))
+        self.assertFalse(rep.add(None))
+        self.assertTrue(rep.failed)
+        self.assertFalse(rep.more())
+
+    def test_resume(self):
+        rep = Repetition(0.02, 3, 10, 0.25)
+        for t in [100, 101, 100]:
+            rep.resume(t)
+        self.assertEqual(rep.launched, 3)
+        self.assertFalse(rep.more())
+
+
+class Bench:
+    def __init__(self):
+        self.prog = 'ep'
+        self.name = 'ep.C.2'
+        self.nodes = 1
+        self.np = 2
+        self.size = 'C'
+        self.oversub = 1
+        self.schedulers = 'cfs'
+        self.affinity = '0-1'
+        self.fail = False
+
+
+class TestAdaptive(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.out = os.path.join(self.dir.name, 'out.log')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_outlier_not_written(self):
+        machine = Machine.__new__(Machine)
+        machine.args = Namespace(adaptive=True, min_runs=3, max_runs=10,
+                                 ci_target=0.02, outlier=0.25,
+                                 run_order='consecutive', exclusive=False,
+                                 timeout=None, reduce=None, records=None)
+        machine.benchmarks = [Bench()]
+        machine.runs = range(3)
+        machine.nodelist = ['n0']
+        machine.exclusive = False
+        machine.prefix = ''
+        machine.env = {}
+
+        times = [100, 101, 200, 100]
+
+        async def run_benchmark(runner, cfg, nodes):
+            rows = [{'RANK': '0', 'WTIME': str(times.pop(0))}]
+            return [json.dumps({'INTERFERENCE': rows})]
+        machine.run_benchmark = run_benchmark
+
+        with NdjsonWriter(self.out) as writer:
+            machine.run_benchmarks(writer)
+
+        self.assertEqual(times, [])
+        rows = list(NdjsonWriter.read(self.out))
+        self.assertEqual([r['WTIME'] for r in rows], ['100', '101', '100'])
+        self.assertEqual([r['run'] for r in rows], [0, 1, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,17 @@
 #/bin/bash
 
+set -e
+
 BASE=$(dirname $0)
 
 export PYTHONPATH=$PYTHONPATH:$BASE/../scripts/:$BASE/../
 
-python3 $BASE/args.py
\ No newline at end of file
+python3 $BASE/args.py
+python3 $BASE/compile.py
+python3 $BASE/scheduler.py
+python3 $BASE/writer.py
+python3 $BASE/analysis.py
+python3 $BASE/repetition.py
+python3 $BASE/design.py
+python3 $BASE/planner.py
+python3 $BASE/environment.py
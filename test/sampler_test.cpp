@@ -0,0 +1,57 @@
+#include "sampler.hpp"
+
+#include <cassert>
+#include <cstdlib>
+
+#include <unistd.h>
+
+#include "nlohmann/json.hpp"
+
+using json = nlohmann::json;
+
+static json emit(Sampler &sampler, const std::vector<int64_t> &buffer)
+{
+  auto map = sampler.emit(reinterpret_cast<const char *>(buffer.data()), 1,
+                          buffer.size() * sizeof(int64_t));
+  return json::parse(map["SAMPLES"][0]);
+}
+
+int main(int argc, char **argv)
+{
+  setenv("INTERFERENCE_SAMPLE_SIZE", "4", 1);
+  Sampler sampler(1, "SAMPLES", 1, {});
+
+  auto fields = sampler.fields();
+  auto meta = json::parse(fields[0].meta);
+  assert(meta["capacity"] == 4);
+  assert((meta["columns"] == json{"TIME_US", "CPUTIME_US", "CPU"}));
+  assert(fields[0].size == (1 + 4 * 3) * sizeof(int64_t));
+
+  // Six samples in a ring of four, the first two are overwritten
+  std::vector<int64_t> buffer = {6};
+  for (int64_t s : {4, 5, 2, 3})
+    buffer.insert(buffer.end(), {10 * s, 20 * s, s});
+  auto samples = emit(sampler, buffer);
+  assert(samples["LOST"] == 2);
+  assert((samples["TIME_US"] == json{20, 30, 40, 50}));
+  assert((samples["CPUTIME_US"] == json{40, 60, 80, 100}));
+  assert((samples["CPU"] == json{2, 3, 4, 5}));
+
+  // Samples taken by the thread
+  sampler.start_accounting();
+  usleep(20000);
+  sampler.end_accounting();
+
+  sampler.pack(reinterpret_cast<char *>(buffer.data()));
+  samples = emit(sampler, buffer);
+  assert(buffer[0] > 4);
+  assert(samples["LOST"] == buffer[0] - 4);
+  auto times = samples["TIME_US"].get<std::vector<int64_t>>();
+  assert(times.size() == 4);
+  for (size_t i = 1; i < times.size(); i++)
+    assert(times[i] > times[i - 1]);
+  for (auto cpu : samples["CPU"])
+    assert(cpu >= 0);
+
+  return 0;
+}
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+
+import asyncio
+import unittest
+
+from scripts.interference import Runner, Scheduler
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class Bench:
+    def __init__(self, nodes):
+        self.nodes = nodes
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.nodelist = ['n{}'.format(i) for i in range(4)]
+        self.busy = set()
+        self.overlap = False
+        self.concurrent = 0
+        self.max_concurrent = 0
+
+    async def launch(self, cfg, nodes):
+        self.overlap |= bool(self.busy & set(nodes))
+        self.busy |= set(nodes)
+        self.concurrent += 1
+        self.max_concurrent = max(self.max_concurrent, self.concurrent)
+        await asyncio.sleep(0.01)
+        self.busy -= set(nodes)
+        self.concurrent -= 1
+        return nodes
+
+    def schedule(self, scheduler, confs):
+        async def collect():
+            return [i async for i in scheduler.run(confs, self.launch)]
+        return run(collect())
+
+    def confs(self, sizes):
+        return [(run, Bench(n), {}) for (run, n) in enumerate(sizes)]
+
+    def test_pack(self):
+        scheduler = Scheduler(self.nodelist)
+        done = self.schedule(scheduler, self.confs([1, 2, 1, 4, 2, 1]))
+
+        self.assertEqual(len(done), 6)
+        self.assertFalse(self.overlap)
+        self.assertGreater(self.max_concurrent, 1)
+        for (cfg, nodes) in done:
+            self.assertEqual(len(nodes), cfg[1].nodes)
+        self.assertEqual(scheduler.free, self.nodelist)
+
+    def test_order(self):
+        scheduler = Scheduler(self.nodelist)
+        order = list()
+
+        async def launch(cfg, nodes):
+            order.append(cfg[0])
+            return await self.launch(cfg, nodes)
+
+        async def collect():
+            confs = self.confs([1, 4, 1, 2])
+            return [i async for i in scheduler.run(confs, launch)]
+        run(collect())
+
+        # Smaller configurations backfill while the second one waits
+        self.assertEqual(order, [0, 2, 3, 1])
+
+    def test_exception(self):
+        scheduler = Scheduler(self.nodelist)
+
+        async def launch(cfg, nodes):
+            if cfg[0] == 1:
+                raise RuntimeError('no such binary')
+            return await self.launch(cfg, nodes)
+
+        async def collect():
+            confs = self.confs([1, 2, 1, 4])
+            return [i async for i in scheduler.run(confs, launch)]
+        done = run(collect())
+
+        self.assertEqual(len(done), 4)
+        self.assertEqual([nodes for (cfg, nodes) in done if cfg[0] == 1],
+                         [None])
+        self.assertEqual(scheduler.free, self.nodelist)
+
+    def test_exclusive(self):
+        scheduler = Scheduler(self.nodelist, exclusive=True)
+        done = self.schedule(scheduler, self.confs([1, 2, 8]))
+
+        self.assertEqual(self.max_concurrent, 1)
+        self.assertEqual([cfg[0] for (cfg, nodes) in done], [0, 1, 2])
+        self.assertEqual([nodes for (cfg, nodes) in done],
+                         [['n0'], ['n0', 'n1'], self.nodelist])
+
+
+class TestRunner(unittest.TestCase):
+    def test_prefix(self):
+        runner = Runner('INTERFERENCE', tail=2)
+        res = run(runner.run('echo a; echo INTERFERENCE 1; echo b; echo c',
+                             None, None))
+        self.assertEqual(res.returncode, 0)
+        self.assertFalse(res.timeout)
+        self.assertEqual(res.results, ['INTERFERENCE 1'])
+        self.assertEqual(list(res.tail), ['b', 'c'])
+
+    def test_timeout(self):
+        runner = Runner('INTERFERENCE', timeout=0.2)
+        res = run(runner.run('echo started; sleep 10 & sleep 10; wait',
+                             None, None))
+        self.assertTrue(res.timeout)
+        self.assertNotEqual(res.returncode, 0)
+        self.assertEqual(list(res.tail), ['started'])
+
+    def test_timeout_closed_output(self):
+        runner = Runner('INTERFERENCE', timeout=0.2)
+        res = run(runner.run('echo started; exec >&- 2>&-; sleep 10',
+                             None, None))
+        self.assertTrue(res.timeout)
+        self.assertNotEqual(res.returncode, 0)
+        self.assertEqual(list(res.tail), ['started'])
+
+    def test_concurrent(self):
+        runner = Runner('INTERFERENCE')
+
+        async def both():
+            return await asyncio.gather(
+                runner.run('sleep 0.3; echo INTERFERENCE 1', None, None),
+                runner.run('sleep 0.3; echo INTERFERENCE 2', None, None))
+        loop = asyncio.new_event_loop()
+        start = loop.time()
+        (a, b) = loop.run_until_complete(both())
+        self.assertLess(loop.time() - start, 0.55)
+        loop.close()
+        self.assertEqual(a.results + b.results,
+                         ['INTERFERENCE 1', 'INTERFERENCE 2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
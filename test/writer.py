@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+
+import asyncio
+import json
+import os
+import struct
+import tempfile
+import unittest
+from argparse import Namespace
+
+from scripts.interference import CsvWriter, JsonWriter, NdjsonWriter, NpzWriter, \
+    Machine, Records
+
+
+class Bench:
+    def __init__(self, prog, nodes, schedulers):
+        self.prog = prog
+        self.nodes = nodes
+        self.schedulers = schedulers
+        self.np = nodes
+        self.size = 'C'
+        self.oversub = 1
+        self.affinity = '0-7'
+        self.wd = '/tmp'
+
+
+def results(ranks):
+    rows = [{'RANK': str(i), 'WTIME': str(100 + i)} for i in range(ranks)]
+    return [json.dumps({'INTERFERENCE': rows})]
+
+
+def csv_results(ranks):
+    return ['INTERFERENCE ,RANK: {} ,CPU: -1 ,NODE: n0 ,ITER: 1'
+            ' ,UTIME: 10 ,WTIME: 100 ,STIME: 1'.format(i)
+            for i in range(ranks)]
+
+
+class TestNdjsonWriter(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.out = os.path.join(self.dir.name, 'out.log')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_stream(self):
+        with NdjsonWriter(self.out) as writer:
+            writer.submit(0, Bench('ep', 2, 'cfs'), results(2))
+            # Rows are on disk before the writer is closed
+            self.assertEqual(len(list(NdjsonWriter.read(self.out))), 2)
+            writer.submit(1, Bench('ep', 2, 'cfs'), results(2))
+
+        rows = list(NdjsonWriter.read(self.out))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[3]['run'], 1)
+        self.assertEqual(rows[3]['schedulers'], 'cfs')
+        self.assertEqual(rows[3]['RANK'], '1')
+        self.assertEqual(rows[3]['WTIME'], '101')
+
+
+class TestNpzWriter(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.out = os.path.join(self.dir.name, 'out.npz')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_columns(self):
+        with NpzWriter(self.out, chunk=3) as writer:
+            for run in range(3):
+                writer.submit(run, Bench('ep', 2, 'cfs'), results(2))
+            # First two runs fill a chunk and are already on disk
+            self.assertEqual(len(NpzWriter.read(self.out)['run']), 4)
+            rows = json.loads(results(2)[0])
+            rows['INTERFERENCE'][0]['instructions'] = '42'
+            writer.submit(3, Bench('ep', 2, 'cfs'), [json.dumps(rows)])
+
+        columns = NpzWriter.read(self.out)
+        self.assertEqual(list(columns['run']), [0, 0, 1, 1, 2, 2, 3, 3])
+        self.assertEqual(columns['WTIME'].dtype.kind, 'i')
+        self.assertEqual(columns['prog'].dtype.kind, 'U')
+        self.assertEqual(columns['instructions'][6], 42)
+        self.assertEqual(sum(columns['instructions'] == 42), 1)
+
+
+    def test_array(self):
+        self.assertEqual(NpzWriter.array(['1', 2]).dtype.kind, 'i')
+        floats = NpzWriter.array([0.5, 1.5])
+        self.assertEqual(floats.dtype.kind, 'f')
+        self.assertEqual(list(floats), [0.5, 1.5])
+        self.assertEqual(list(NpzWriter.array(['0.5', '2'])), [0.5, 2.0])
+        self.assertEqual(NpzWriter.array([1.0, 2.0]).dtype.kind, 'f')
+        self.assertEqual(NpzWriter.array(['ep', None])[1], '')
+
+def write_records(filename, ranks, summary=None):
+    """ Write a file the way lib/interference.cpp does """
+    fields = [{'name': 'WTIME', 'kind': 'int', 'size': 8, 'offset': 0},
+              {'name': 'NODE', 'kind': 'string', 'size': 4, 'offset': 8},
+              {'name': 'SCALE', 'kind': 'double', 'size': 8, 'offset': 12},
+              {'name': 'SAMPLES', 'kind': 'blob', 'size': 40, 'offset': 20,
+               'meta': {'format': 'samples', 'capacity': 2,
+                        'columns': ['TIME_US', 'CPU']}}]
+    header = json.dumps({'prefix': 'INTERFERENCE', 'ranks': ranks,
+                         'record_size': 60, 'fields': fields})
+    header += ' ' * (7 - len(header) % 8) + '\n'
+    with open(filename, 'wb') as f:
+        f.write(header.encode())
+        for rank in range(ranks):
+            f.write(struct.pack('=q4sd', 100 + rank, b'n0', 0.5))
+            # Three samples were taken, the first one is overwritten
+            f.write(struct.pack('=5q', 3, 30, 3, 20, 2))
+        if summary is not None:
+            f.write((json.dumps(summary) + '\n').encode())
+
+
+class TestRecords(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.records = os.path.join(self.dir.name, 'run.rec')
+        self.out = os.path.join(self.dir.name, 'out.log')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_read(self):
+        write_records(self.records, 2)
+        rows = Records.read(self.records).rows
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1]['WTIME'], '101')
+        self.assertEqual(rows[1]['NODE'], 'n0')
+        self.assertEqual(rows[1]['SCALE'], '0.500000')
+        self.assertEqual(json.loads(rows[1]['SAMPLES']),
+                         {'LOST': 1, 'TIME_US': [20, 30], 'CPU': [2, 3]})
+
+    def test_summary(self):
+        summary = {'MPI_ALLREDUCE_P99_US': '20.480000'}
+        write_records(self.records, 2, summary)
+        rows = Records.read(self.records).rows
+        self.assertEqual(rows[0]['MPI_ALLREDUCE_P99_US'], '20.480000')
+        self.assertEqual(rows[1]['WTIME'], '101')
+
+        output = json.loads(results(2)[0])
+        output['INTERFERENCE_SUMMARY'] = summary
+        rows = JsonWriter(self.out).parse([json.dumps(output)])
+        self.assertEqual([r['MPI_ALLREDUCE_P99_US'] for r in rows],
+                         ['20.480000'] * 2)
+
+    def test_regions(self):
+        fields = [{'name': 'WTIME', 'kind': 'int', 'size': 8, 'offset': 0},
+                  {'name': 'REGIONS', 'kind': 'blob', 'size': 96, 'offset': 8,
+                   'meta': {'format': 'regions', 'slots': 2, 'name_size': 32,
+                            'columns': ['COUNT', 'WTIME']}}]
+        header = json.dumps({'prefix': 'INTERFERENCE', 'ranks': 2,
+                             'record_size': 104, 'fields': fields})
+        header += ' ' * (7 - len(header) % 8) + '\n'
+        with open(self.records, 'wb') as f:
+            f.write(header.encode())
+            f.write(struct.pack('=q32s2q32s2q', 100, b'setup', 1, 5,
+                                b'solver', 3, 90))
+            # The second rank entered only the solver
+            f.write(struct.pack('=q32s2q48x', 101, b'solver', 3, 80))
+
+        rows = Records.read(self.records).rows
+        self.assertEqual(rows[0]['setup:WTIME'], '5')
+        self.assertEqual(rows[0]['solver:COUNT'], '3')
+        self.assertEqual(rows[1]['solver:WTIME'], '80')
+        self.assertEqual(rows[1]['setup:WTIME'], '0')
+        self.assertNotIn('REGIONS', rows[1])
+
+    def test_truncated(self):
+        write_records(self.records, 2)
+        with open(self.records, 'r+b') as f:
+            f.truncate(os.path.getsize(self.records) - 1)
+        with self.assertRaises(ValueError):
+            Records.read(self.records)
+
+    def test_writers(self):
+        write_records(self.records, 2)
+        with NdjsonWriter(self.out) as writer:
+            results = Records.read(self.records)
+            self.assertEqual(writer.wtime(results), 101)
+            writer.submit(0, Bench('ep', 2, 'cfs'), results)
+        rows = list(NdjsonWriter.read(self.out))
+        self.assertEqual([r['WTIME'] for r in rows], ['100', '101'])
+
+        rows = CsvWriter(self.out).parse(Records.read(self.records))
+        self.assertEqual([r['RANK'] for r in rows], ['0', '1'])
+
+
+    def test_run_removes_file(self):
+        class Context:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                pass
+
+        class Runner:
+            timeout = None
+
+            async def run(self, command, wd, env):
+                write_records(env['INTERFERENCE_OUTPUT_FILE'], 2)
+                return Namespace(timeout=False, returncode=0, results=[],
+                                 tail=[])
+
+        machine = Machine.__new__(Machine)
+        machine.args = Namespace(records=self.dir.name)
+        machine.create_context = lambda machine, cfg: Context()
+        machine.format_command = lambda context: 'true'
+        bench = Bench('ep', 2, 'cfs')
+        bench.name = 'ep.C.2'
+        cfg = (0, bench, {})
+
+        loop = asyncio.new_event_loop()
+        try:
+            results = loop.run_until_complete(
+                machine.run_benchmark(Runner(), cfg, ['n0']))
+        finally:
+            loop.close()
+        self.assertEqual([r['WTIME'] for r in results.rows], ['100', '101'])
+        self.assertEqual(os.listdir(self.dir.name), [])
+
+
+class TestResume(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.out = os.path.join(self.dir.name, 'out.log')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def check(self, Writer, results):
+        ep = Bench('ep', 2, 'cfs')
+        with Writer(self.out, resume=True) as writer:
+            self.assertFalse(writer.done(0, ep))
+            writer.submit(0, ep, results(2))
+
+        with Writer(self.out, resume=True) as writer:
+            self.assertTrue(writer.done(0, Bench('ep', 2, 'cfs')))
+            self.assertFalse(writer.done(1, ep))
+            self.assertFalse(writer.done(0, Bench('ep', 2, 'fifo_cyclic')))
+            writer.submit(1, ep, results(2))
+            self.assertEqual(writer.done_wtime(0, ep), writer.wtime(results(2)))
+            self.assertIsNone(writer.done_wtime(1, ep))
+
+        with Writer(self.out, resume=True) as writer:
+            self.assertTrue(writer.done(0, ep))
+            self.assertTrue(writer.done(1, ep))
+            return list(writer.load())
+
+    def test_csv(self):
+        rows = self.check(CsvWriter, csv_results)
+        self.assertEqual(len(rows), 4)
+
+    def test_json(self):
+        rows = self.check(JsonWriter, results)
+        self.assertEqual(len(rows), 4)
+
+    def test_ndjson(self):
+        rows = self.check(NdjsonWriter, results)
+        self.assertEqual(len(rows), 4)
+
+    def test_npz(self):
+        self.out += '.npz'
+        rows = self.check(NpzWriter, results)
+        self.assertEqual(len(rows), 4)
+
+    def test_csv_empty(self):
+        # Left by a campaign killed before the first run completed
+        open(self.out, 'w').close()
+        with CsvWriter(self.out, resume=True) as writer:
+            self.assertFalse(writer.resume)
+        with open(self.out, 'r') as f:
+            self.assertEqual(f.readline().strip(), ','.join(CsvWriter.header))
+        rows = self.check(CsvWriter, csv_results)
+        self.assertEqual(len(rows), 4)
+
+    def test_csv_design(self):
+        ep = Bench('ep', 2, 'cfs')
+        ep.design = 'lhs:4'
+        with CsvWriter(self.out) as writer:
+            writer.submit(0, ep, csv_results(1))
+        rows = list(CsvWriter(self.out).load())
+        self.assertEqual(rows[0]['design'], 'lhs:4')
+
+    def test_csv_legacy(self):
+        # Written before the design column existed
+        with open(self.out, 'w') as f:
+            f.write(','.join(CsvWriter.header[:-1]) + '\n')
+        rows = self.check(CsvWriter, csv_results)
+        self.assertEqual(len(rows), 4)
+        self.assertNotIn('design', rows[0])
+
+    def test_csv_headerless(self):
+        with open(self.out, 'w') as f:
+            f.write('ep,2,2,C,1,0,cfs,0-7,-1,0,n0,1,10,100,1\n')
+        with self.assertRaises(Exception):
+            CsvWriter(self.out, resume=True)
+
+    def test_ndjson_truncated(self):
+        with open(self.out, 'w') as f:
+            f.write('{"run": 0, "prog": "ep", "RA')
+        rows = self.check(NdjsonWriter, results)
+        self.assertEqual(len(rows), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()